@@ -0,0 +1,67 @@
+""" Benchmark for the FastAPI auth and exception middlewares
+
+Measures requests/sec on a trivial endpoint behind the auth and
+exception middlewares, installed as `@app.middleware("http")` functions
+(BaseHTTPMiddleware) and as pure ASGI middlewares. Requests are sent
+in-process through httpx's ASGI transport, so only the framework and
+middleware overhead is measured. The token is pre-loaded in the token
+cache to leave the JWKS verification out.
+
+    pip install httpx
+    python benchmarks/fastapi_middlewares.py
+"""
+
+from time import perf_counter, time
+import asyncio
+
+from fastapi import FastAPI
+import httpx
+
+from styler_rest_framework.middlewares.fastapi.auth_middleware import add_auth_middleware
+from styler_rest_framework.middlewares.fastapi.exception_middleware import (
+    add_exception_middleware,
+)
+
+
+REQUESTS = 3000
+CONCURRENCY = 50
+TOKEN = "aaa.bbb.ccc"
+
+
+def create_app(asgi):
+    app = FastAPI()
+    token_cache = add_auth_middleware(app, "development", jwks_url="http://jwks", asgi=asgi)
+    token_cache.set(TOKEN, {"user_id": "1234", "exp": time() + 3600})
+    add_exception_middleware(app, asgi=asgi)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def measure(app):
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def worker(count):
+            for _ in range(count):
+                response = await client.get("/ping", headers=headers)
+                assert response.status_code == 200
+
+        await worker(100)  # warm up
+        start = perf_counter()
+        await asyncio.gather(*[worker(REQUESTS // CONCURRENCY) for _ in range(CONCURRENCY)])
+        return REQUESTS / (perf_counter() - start)
+
+
+def run():
+    print(f"{'middlewares':<22} {'requests/sec':>12}")
+    for label, asgi in (("@app.middleware", False), ("pure ASGI", True)):
+        rps = asyncio.run(measure(create_app(asgi)))
+        print(f"{label:<22} {rps:>12.0f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,59 @@
+""" Throughput benchmark for the GCSHandler bulk operations
+
+Runs against the in-memory fake storage with a simulated round trip
+latency, comparing one-blob-at-a-time loops with the bulk methods.
+
+    python benchmarks/gcs_bulk.py
+"""
+
+from time import perf_counter
+
+from styler_rest_framework.helpers.fake_gcs import FakeClient
+from styler_rest_framework.helpers.gcs_handler import GCSHandler
+
+
+BLOBS = 200
+SIZE = 64 * 1024
+LATENCY = 0.01
+
+
+def timed(label, func):
+    start = perf_counter()
+    func()
+    elapsed = perf_counter() - start
+    print(f"{label:<32} {elapsed:>8.2f}s {BLOBS / elapsed:>10.0f} blobs/s")
+
+
+def run():
+    handler = GCSHandler("bench", client=FakeClient(latency=LATENCY))
+    names = [f"folder/{i}.bin" for i in range(BLOBS)]
+    files = {name: b"x" * SIZE for name in names}
+    print(f"{BLOBS} blobs of {SIZE // 1024} KiB, {LATENCY * 1000:.0f} ms per request")
+
+    timed("upload one by one", lambda: [
+        handler.put_as_string(name, data, "application/octet-stream")
+        for name, data in files.items()
+    ])
+    timed("upload_many (8 workers)", lambda: handler.upload_many(files))
+    timed("upload_many (32 workers)", lambda: handler.upload_many(files, max_workers=32))
+
+    timed("download one by one", lambda: [
+        handler.download_file_as_string(name) for name in names
+    ])
+    timed("download_many (8 workers)", lambda: handler.download_many(names))
+    timed("download_many (32 workers)", lambda: handler.download_many(names, max_workers=32))
+
+    timed("copy one by one", lambda: [
+        handler.bucket.copy_blob(blob, handler.bucket, "copy/" + blob.name)
+        for blob in handler.get_files_from_folder("folder/")
+    ])
+    timed("copy_prefix (8 workers)", lambda: handler.copy_prefix("folder/", "copy2/"))
+
+    timed("delete one by one", lambda: [
+        handler.delete_file(blob.name) for blob in handler.get_files_from_folder("copy/")
+    ])
+    timed("delete_prefix (batches of 100)", lambda: handler.delete_prefix("copy2/"))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,83 @@
+""" Benchmark for the HTTPHandler response body handling on 1 MB JSON
+
+Serves a ~1 MB JSON document from a local aiohttp server and compares
+the previous body handling (`resp.text()` for the log, then
+`resp.json()`) with HTTPHandler.get, using the standard library and the
+orjson backends, with and without the request log. The log rows are
+built but not published.
+
+    python benchmarks/http_json_body.py
+"""
+
+from time import perf_counter
+import asyncio
+import json
+
+from aiohttp import web
+
+from styler_rest_framework.config import defaults
+from styler_rest_framework.services import HTTPHandler
+from styler_rest_framework.services.session import close_session, get_session
+
+
+REQUESTS = 50
+
+
+def document():
+    items = [
+        {"id": f"{i:08d}", "name": f"ショップ {i}", "price": i * 1.5, "tags": ["a", "b", "c"]}
+        for i in range(10500)
+    ]
+    return json.dumps({"items": items}).encode("utf-8")
+
+
+async def legacy_get(url, log):
+    """Body handling of HTTPHandler.get before the single pass"""
+    async with get_session().get(url) as resp:
+        log_params = [defaults.SERVICE_NAME, url, "GET", None, "", ""]
+        log_params.extend([resp.status, await resp.text()])
+        result = await resp.json()
+    if log:
+        HTTPHandler.log_request(None, *log_params)
+    return result
+
+
+async def timed(label, size, get):
+    await get()
+    start = perf_counter()
+    for _ in range(REQUESTS):
+        await get()
+    elapsed = (perf_counter() - start) / REQUESTS
+    print(f"{label:<32} {elapsed * 1000:>8.2f} ms {size / elapsed / 2 ** 20:>8.1f} MB/s")
+
+
+async def run():
+    body = document()
+    app = web.Application()
+    app.router.add_get(
+        "/doc", lambda request: web.Response(body=body, content_type="application/json")
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/doc"
+    print(f"{len(body) / 2 ** 20:.2f} MB JSON, {REQUESTS} requests")
+
+    # Build the log rows without publishing them
+    HTTPHandler.log_request = lambda self, *args: None
+    for log in (True, False):
+        await timed(f"legacy (log={log})", len(body), lambda: legacy_get(url, log))
+        for backend in ("json", "auto"):
+            defaults.HTTP_JSON_BACKEND = backend
+            handler = HTTPHandler(log=log)
+            name = "orjson" if backend == "auto" else backend
+            await timed(f"HTTPHandler {name} (log={log})", len(body), lambda: handler.get(url))
+
+    await close_session()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
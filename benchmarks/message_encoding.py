@@ -0,0 +1,58 @@
+""" Micro-benchmark for the Pub/Sub message encoding
+
+Compares the previous pretty-printed encoding with the compact one
+(standard library and orjson backends) and its gzip variant.
+
+    python benchmarks/message_encoding.py
+"""
+
+import gzip
+import json
+import timeit
+
+from styler_rest_framework.pubsub.publishers import messages
+from styler_rest_framework.pubsub.publishers.messages.logme_message import LogMeMessage
+from styler_rest_framework.pubsub.publishers.messages.save_data_message import SaveDataMessage
+from styler_rest_framework.pubsub.publishers.messages.send_mail_message import SendMailMessage
+
+
+NUMBER = 2000
+
+
+def legacy_encoded(msg):
+    json_string = json.dumps(msg, default=lambda o: o.__dict__, indent=4)
+    return json_string.encode("utf-8")
+
+
+def sample_messages():
+    rows = [
+        ("svc", f"https://shops/{i}", "GET", "Bearer aaa.bbb.ccc", "", i, "{}", 200, '{"id": "1234"}')
+        for i in range(100)
+    ]
+    data = {str(k): {"value": k, "label": f"ラベル{k}", "tags": ["a", "b"]} for k in range(50)}
+    return {
+        "LogMeMessage": LogMeMessage("logging", "internal-requests", rows),
+        "SaveDataMessage": SaveDataMessage("userEvents", "module.func", "1#module.func#1", data),
+        "SendMailMessage": SendMailMessage("user@mail.com", "件名", "<p>本文</p>" * 50),
+    }
+
+
+def run():
+    encoders = {
+        "legacy indent=4": legacy_encoded,
+        "compact json": lambda msg: msg.encoded(),
+        "compact orjson": lambda msg: msg.encoded(),
+        "compact + gzip": lambda msg: gzip.compress(msg.encoded()),
+    }
+    backends = {"compact json": "json"}
+    print(f"{'message':<16} {'encoder':<16} {'bytes':>8} {'usec/op':>9}")
+    for name, msg in sample_messages().items():
+        for label, encoder in encoders.items():
+            messages.defaults.PUBSUB_JSON_BACKEND = backends.get(label, "auto")
+            size = len(encoder(msg))
+            elapsed = timeit.timeit(lambda: encoder(msg), number=NUMBER)
+            print(f"{name:<16} {label:<16} {size:>8} {elapsed / NUMBER * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    run()
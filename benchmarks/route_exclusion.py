@@ -0,0 +1,54 @@
+""" Micro-benchmark for the auth middleware route exclusions
+
+Compares the per-request cost of the previous exclusion check (list
+lookup plus one `re.match` per pattern) with PathMatcher, for 1, 10 and
+100 exclusions (half exact paths, half patterns). The path is not
+excluded, which is the worst case and the common one.
+
+    python benchmarks/route_exclusion.py
+"""
+
+import re
+import timeit
+
+from styler_rest_framework.middlewares.path_matcher import PathMatcher
+
+
+NUMBER = 20000
+PATH = "/shops/f1225763-3eef-4067-b1ab-17d99b126eab/products"
+
+
+def legacy_excluded(path, excludes, excludes_regex):
+    paths = [] if excludes is None else excludes
+    regex_paths = [] if excludes_regex is None else excludes_regex
+    if path in paths:
+        return True
+    for regex_path in regex_paths:
+        if re.match(regex_path, path):
+            return True
+    return False
+
+
+def exclusions(count):
+    paths = [f"/health/{i}" for i in range(max(1, count // 2))]
+    patterns = [rf"/webhooks/{i}/[0-9a-f\-]{{36}}$" for i in range(count // 2)]
+    return paths, patterns
+
+
+def run():
+    print(f"{'exclusions':>10} {'legacy usec':>12} {'matcher usec':>13}")
+    for count in (1, 10, 100):
+        paths, patterns = exclusions(count)
+        matcher = PathMatcher(paths, patterns)
+        legacy = timeit.timeit(
+            lambda: legacy_excluded(PATH, paths, patterns), number=NUMBER
+        )
+        compiled = timeit.timeit(lambda: matcher.match(PATH), number=NUMBER)
+        print(
+            f"{count:>10} {legacy / NUMBER * 1e6:>12.2f} "
+            f"{compiled / NUMBER * 1e6:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    run()
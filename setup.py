@@ -23,7 +23,7 @@ requirements = [
     'google-cloud-core',
     'google-cloud-monitoring',
     'google-cloud-pubsub',
-    'google-cloud-storage',
+    'google-cloud-storage >= 2.0.0',
     'google-cloud-trace >= 0.20.0, < 1.0.0',
     'googleapis-common-protos',
     'grpcio',
@@ -49,6 +49,10 @@ requirements = [
     'firebase-admin',
 ]
 
+extra_requirements = {
+    'fast': ['orjson'],
+}
+
 setup_requirements = ['pytest-runner', ]
 
 test_requirements = ['pytest>=3', ]
@@ -67,6 +71,7 @@ setup(
     ],
     description="Standards used in REST services",
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="MIT license",
     long_description=readme,
     include_package_data=True,
@@ -3,24 +3,33 @@ from functools import wraps
 import asyncio
 
 from fastapi.responses import JSONResponse
-from styler_rest_framework.api.request_scope import RequestScope
+from styler_rest_framework.api.request_scope import (
+    Identity,
+    RequestScope,
+    Role,
+    highest_role,
+    stored_identity,
+)
 
 
-class Role:
-    SYSADMIN = 4
-    ADMIN = 2
-    STAFF = 1
+def find_identity(kwargs):
+    """Find the identity of the endpoint arguments
 
-
-def highest_role(roles):
-    if 'sysadmin' in roles:
-        return Role.SYSADMIN
-    elif 'admin' in roles:
-        return Role.ADMIN
-    elif 'staff' in roles:
-        return Role.STAFF
-    else:
-        return 0
+    Looks for an Identity argument (e.g. injected with get_request_scope),
+    then for the identity stored by the auth middleware in the `request`
+    argument, and only decodes the `authorization` argument as a last resort.
+    """
+    for value in kwargs.values():
+        if isinstance(value, Identity):
+            return value
+    request = kwargs.get('request')
+    identity = stored_identity(request) if request is not None else None
+    if identity is not None:
+        return identity
+    token = kwargs.get('authorization')
+    if not token:
+        return None
+    return RequestScope(authorization=token)
 
 
 def authorize(role: int):
@@ -32,21 +41,19 @@ def authorize(role: int):
     def has_roles(func):
         @wraps(func)
         async def awrapper(*args, **kwargs):
-            token = kwargs.get('authorization')
-            if not token:
+            identity = find_identity(kwargs)
+            if identity is None:
                 return JSONResponse(status_code=403, content="Forbidden")
-            identity = RequestScope(authorization=token)
-            if highest_role(identity._roles()) < role:
+            if identity.highest_role() < role:
                 return JSONResponse(status_code=403, content="Forbidden")
             return await func(*args, **kwargs)
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-            token = kwargs.get('authorization')
-            if not token:
+            identity = find_identity(kwargs)
+            if identity is None:
                 return JSONResponse(status_code=403, content="Forbidden")
-            identity = RequestScope(authorization=token)
-            if highest_role(identity._roles()) < role:
+            if identity.highest_role() < role:
                 return JSONResponse(status_code=403, content="Forbidden")
             return func(*args, **kwargs)
 
@@ -2,20 +2,78 @@
 """
 
 from typing import Dict, Callable
+import time
 
+from fastapi import Request
 from jwt.exceptions import InvalidTokenError
 import jwt
 
+from styler_rest_framework.api.responses import unauthorized
+from styler_rest_framework.config import defaults
+
+
+# Key used by the auth middlewares to store the identity in the request
+IDENTITY_KEY = "identity"
+# Key used by the tracing middlewares to store the propagation headers
+TRACE_HEADER_KEY = "trace_header"
+
+
+class Role:
+    SYSADMIN = 4
+    ADMIN = 2
+    STAFF = 1
+
+
+_ROLE_LEVELS = {
+    "sysadmin": Role.SYSADMIN,
+    "admin": Role.ADMIN,
+    "staff": Role.STAFF,
+}
+
+
+def highest_role(roles):
+    """Returns the level of the highest known role in `roles`"""
+    return max((_ROLE_LEVELS.get(role, 0) for role in roles), default=0)
+
 
 class Identity:
-    """Holds the identity of the logged user"""
+    """Holds the identity of the logged user
+
+    Roles, the highest role and the shop and organization ids are indexed
+    once when the identity is built, so the permission checks are O(1).
+
+    Args:
+        token: JWT
+        decoded: the already decoded token data, to skip decoding it again
+    """
 
-    def __init__(self, token):
+    __slots__ = (
+        "_token",
+        "_decoded",
+        "_role_set",
+        "_highest_role",
+        "_shop_ids",
+        "_organization_ids",
+    )
+
+    def __init__(self, token, decoded=None):
         self._token = token
-        try:
-            self._decoded = jwt.decode(self._token, options={"verify_signature": False})
-        except InvalidTokenError:
-            raise ValueError("Invalid JWT token")
+        if decoded is None:
+            try:
+                decoded = jwt.decode(self._token, options={"verify_signature": False})
+            except InvalidTokenError:
+                raise ValueError("Invalid JWT token")
+        self._decoded = decoded
+        self._build_index()
+
+    def __getstate__(self):
+        """Returns the token and its data (used to serialize the identity)"""
+        return {"_token": self._token, "_decoded": self._decoded}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._build_index()
 
     def user_id(self):
         """Returns the user_id provided by firebase"""
@@ -23,19 +81,23 @@ class Identity:
 
     def is_system_admin(self):
         """Returns a boolean identifying the user as a system administrator"""
-        return "sysadmin" in self._roles()
+        return "sysadmin" in self._role_set
 
     def is_admin(self):
         """Returns a boolean identifying the user
         as an organization administrator
         """
-        return "admin" in self._roles()
+        return "admin" in self._role_set
 
     def is_staff(self):
         """Returns a boolean identifying the user
         as a shop staff
         """
-        return "staff" in self._roles()
+        return "staff" in self._role_set
+
+    def highest_role(self):
+        """Returns the level of the highest role of the user (see Role)"""
+        return self._highest_role
 
     def shops(self):
         """Returns a list of shop_ids that the user has access to"""
@@ -45,6 +107,16 @@ class Identity:
         """Returns a list of organization_ids that the user has access to"""
         return self._custom_claims().get("organization", [])
 
+    def has_shop(self, shop_id):
+        """Returns a boolean identifying if the user has access to the shop"""
+        return shop_id in self._shop_ids
+
+    def has_organization(self, organization_id):
+        """Returns a boolean identifying if the user has access
+        to the organization
+        """
+        return organization_id in self._organization_ids
+
     def data(self):
         """Return the entire data from the token"""
         return self._decoded
@@ -65,20 +137,50 @@ class Identity:
             return {}
         return self._decoded["claims"]
 
+    def _build_index(self):
+        claims = self._custom_claims()
+        self._role_set = frozenset(self._roles() or ())
+        self._highest_role = highest_role(self._role_set)
+        self._shop_ids = frozenset(claims.get("shop") or ())
+        self._organization_ids = frozenset(claims.get("organization") or ())
+
 
 class RequestScope(Identity):
-    """Carries information about the request scope"""
+    """Carries information about the request scope
+
+    `deadline` is the `time.monotonic()` at which the caller stops
+    waiting for the response. It is read from the DEADLINE_HEADER header
+    (remaining milliseconds) and HTTPHandler only gives the remaining
+    time to the outbound calls made with this scope.
+    """
+
+    __slots__ = ("accept_language", "trace", "deadline")
 
     def __init__(
         self,
         authorization: str = None,
         accept_language: str = "ja",
         trace: Dict = None,
+        decoded: Dict = None,
+        deadline: float = None,
     ) -> Callable:
         self.accept_language = accept_language
         self.trace = trace or {}
+        self.deadline = deadline
         token = get_token(authorization)
-        super().__init__(token)
+        super().__init__(token, decoded=decoded)
+
+    def __setstate__(self, state):
+        # The deadline is relative to the clock of the process
+        self.deadline = None
+        super().__setstate__(state)
+
+    def __getstate__(self):
+        return {
+            "accept_language": self.accept_language,
+            "trace": self.trace,
+            **super().__getstate__(),
+        }
 
     def localization(self):
         # Also 'ja' when None is passed.
@@ -87,16 +189,108 @@ class RequestScope(Identity):
     def trace_header(self):
         return self.trace
 
+    def remaining_time(self):
+        """Returns the seconds left before the deadline or None"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
     @classmethod
     def from_request(cls, request):
-        auth_header = request.headers.get("Authorization")
-        accept_language = request.headers.get("Accept-Language", "ja")
-        trace = request.headers.get("trace_header", {})
+        """Returns the identity stored by the auth middleware or
+        builds it from the request headers
+
+        The propagation headers stored by the tracing middleware replace
+        the trace of the identity.
+        """
+        identity = stored_identity(request)
+        if not isinstance(identity, cls):
+            identity = cls.from_headers(request.headers)
+        trace = stored_trace_header(request)
+        if trace:
+            identity.trace = trace
+        return identity
+
+    @classmethod
+    def from_headers(cls, headers, decoded=None):
+        auth_header = headers.get("Authorization")
+        accept_language = headers.get("Accept-Language", "ja")
+        trace = headers.get("trace_header", {})
         return cls(
-            authorization=auth_header, accept_language=accept_language, trace=trace
+            authorization=auth_header,
+            accept_language=accept_language,
+            trace=trace,
+            decoded=decoded,
+            deadline=parse_deadline(headers.get(defaults.DEADLINE_HEADER)),
         )
 
 
+def parse_deadline(timeout_ms):
+    """Returns the deadline of a DEADLINE_HEADER value (milliseconds left)
+
+    Returns None if the value is missing or invalid.
+    """
+    try:
+        return time.monotonic() + int(timeout_ms) / 1000
+    except (TypeError, ValueError):
+        return None
+
+
+def verified_identity(headers, jwt_data):
+    """Build the RequestScope of a verified token without decoding it again
+
+    Returns None if the Authorization header is not a Bearer token.
+    """
+    try:
+        return RequestScope.from_headers(headers, decoded=jwt_data)
+    except ValueError:
+        return None
+
+
+def stored_identity(request):
+    """Returns the identity stored in an aiohttp or Starlette request, if any"""
+    state = getattr(request, "state", None)
+    identity = getattr(state, IDENTITY_KEY, None)
+    if isinstance(identity, Identity):
+        return identity
+    try:
+        identity = request.get(IDENTITY_KEY)
+    except AttributeError:
+        return None
+    return identity if isinstance(identity, Identity) else None
+
+
+def stored_trace_header(request):
+    """Returns the propagation headers stored in an aiohttp or Starlette
+    request by the tracing middleware, if any
+    """
+    state = getattr(request, "state", None)
+    trace = getattr(state, TRACE_HEADER_KEY, None)
+    if isinstance(trace, dict):
+        return trace
+    try:
+        trace = request.get(TRACE_HEADER_KEY)
+    except AttributeError:
+        return None
+    return trace if isinstance(trace, dict) else None
+
+
+def get_request_scope(request: Request) -> RequestScope:
+    """FastAPI dependency that yields the RequestScope of the request
+
+    Reuses the identity stored by the auth middleware, so the token is
+    not decoded again.
+
+        @app.get("/items")
+        def items(scope: RequestScope = Depends(get_request_scope)):
+            ...
+    """
+    try:
+        return RequestScope.from_request(request)
+    except ValueError:
+        unauthorized()
+
+
 def get_token(authorization: str) -> str:
     """Obtains the Access Token from the Authorization Header value"""
     if not authorization:
@@ -24,8 +24,89 @@ EMAIL_TYPE = os.getenv("EMAIL_TYPE") or "text/html"
 
 # JWKS
 JWKS_URL = os.getenv("JWKS_URL") or "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+JWKS_REFRESH_MARGIN = int(os.getenv("JWKS_REFRESH_MARGIN") or 300)
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL") or 60)
+JWKS_DEFAULT_MAX_AGE = int(os.getenv("JWKS_DEFAULT_MAX_AGE") or 3600)
+JWT_CACHE_MAX_SIZE = int(os.getenv("JWT_CACHE_MAX_SIZE") or 10000)
 
 # Internal requests - logging
 INTERNAL_REQUESTS_DATASET = os.getenv("INTERNAL_REQUESTS_DATASET") or "logging"
 INTERNAL_REQUESTS_TABLE = os.getenv("INTERNAL_REQUESTS_TABLE") or "internal-requests"
 INTERNAL_REQUESTS_LOG_ALL = bool(os.getenv("INTERNAL_REQUESTS_LOG_ALL")) or True
+INTERNAL_REQUESTS_LOG_MAX_BODY = int(os.getenv("INTERNAL_REQUESTS_LOG_MAX_BODY") or 65536)
+
+# Internal requests - connection pool
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT") or 100)
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST") or 20)
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL") or 300)
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT") or 30)
+
+# Internal requests - timeouts and deadline propagation
+HTTP_TIMEOUT_TOTAL = float(os.getenv("HTTP_TIMEOUT_TOTAL") or 30)
+HTTP_TIMEOUT_CONNECT = float(os.getenv("HTTP_TIMEOUT_CONNECT") or 5)
+HTTP_TIMEOUT_READ = float(os.getenv("HTTP_TIMEOUT_READ") or 15)
+DEADLINE_HEADER = os.getenv("DEADLINE_HEADER") or "X-Request-Timeout-Ms"
+HTTP_JSON_BACKEND = os.getenv("HTTP_JSON_BACKEND") or "auto"
+HTTP_GATHER_CONCURRENCY = int(os.getenv("HTTP_GATHER_CONCURRENCY") or 10)
+
+# Internal requests - GET response cache
+HTTP_CACHE_MAX_SIZE = int(os.getenv("HTTP_CACHE_MAX_SIZE") or 1000)
+HTTP_CACHE_DEFAULT_TTL = float(os.getenv("HTTP_CACHE_DEFAULT_TTL") or 0)
+
+# LogMe - batching queue
+LOGME_QUEUE_MAX_SIZE = int(os.getenv("LOGME_QUEUE_MAX_SIZE") or 10000)
+LOGME_BATCH_SIZE = int(os.getenv("LOGME_BATCH_SIZE") or 500)
+LOGME_FLUSH_INTERVAL = float(os.getenv("LOGME_FLUSH_INTERVAL") or 5)
+
+# Pub/Sub - publisher batching
+PUBSUB_BATCH_MAX_MESSAGES = int(os.getenv("PUBSUB_BATCH_MAX_MESSAGES") or 100)
+PUBSUB_BATCH_MAX_BYTES = int(os.getenv("PUBSUB_BATCH_MAX_BYTES") or 1000000)
+PUBSUB_BATCH_MAX_LATENCY = float(os.getenv("PUBSUB_BATCH_MAX_LATENCY") or 0.01)
+PUBSUB_JSON_BACKEND = os.getenv("PUBSUB_JSON_BACKEND") or "auto"
+
+# Pub/Sub - async message router
+PUBSUB_ROUTE_CONCURRENCY = int(os.getenv("PUBSUB_ROUTE_CONCURRENCY") or 100)
+
+# Google Cloud Storage
+GCS_MAX_WORKERS = int(os.getenv("GCS_MAX_WORKERS") or 8)
+GCS_DOWNLOAD_CHUNK_SIZE = int(os.getenv("GCS_DOWNLOAD_CHUNK_SIZE") or 8 * 1024 * 1024)
+GCS_UPLOAD_CHUNK_SIZE = int(os.getenv("GCS_UPLOAD_CHUNK_SIZE") or 8 * 1024 * 1024)
+GCS_COMPOSITE_THRESHOLD = int(os.getenv("GCS_COMPOSITE_THRESHOLD") or 150 * 1024 * 1024)
+
+# Retry policy - exponential back-off with full jitter
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY") or 0.1)
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY") or 5)
+
+# Circuit breaker - per host, for the outbound HTTP calls
+CIRCUIT_BREAKER_ENABLED = (os.getenv("CIRCUIT_BREAKER_ENABLED") or "true").lower() != "false"
+CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE") or 0.5)
+CIRCUIT_BREAKER_MINIMUM_CALLS = int(os.getenv("CIRCUIT_BREAKER_MINIMUM_CALLS") or 10)
+CIRCUIT_BREAKER_WINDOW = int(os.getenv("CIRCUIT_BREAKER_WINDOW") or 20)
+CIRCUIT_BREAKER_COOL_DOWN = float(os.getenv("CIRCUIT_BREAKER_COOL_DOWN") or 30)
+
+# Tracing - sampling and excluded routes
+TRACE_SAMPLER = os.getenv("TRACE_SAMPLER") or "probability"
+TRACE_SAMPLING_RATE = float(os.getenv("TRACE_SAMPLING_RATE") or 0.1)
+TRACE_RATE_LIMIT = float(os.getenv("TRACE_RATE_LIMIT") or 10)
+TRACE_SAMPLE_ERRORS = (os.getenv("TRACE_SAMPLE_ERRORS") or "true").lower() != "false"
+# Paths not traced, e.g. "/" for a health check route (none by default)
+TRACE_EXCLUDES = [path for path in (os.getenv("TRACE_EXCLUDES") or "").split(",") if path]
+# Names of the handlers not traced, as before TRACE_EXCLUDES; set it to
+# an empty string to skip the health checks by path only
+TRACE_EXCLUDES_HANDLERS = [
+    name for name in os.getenv("TRACE_EXCLUDES_HANDLERS", "health_check").split(",") if name
+]
+
+# Tracing - child spans of the SQL queries
+TRACE_SQLALCHEMY = (os.getenv("TRACE_SQLALCHEMY") or "true").lower() != "false"
+TRACE_SQL_MAX_LENGTH = int(os.getenv("TRACE_SQL_MAX_LENGTH") or 2048)
+
+# Metrics - Prometheus text exposition
+METRICS_PATH = os.getenv("METRICS_PATH") or "/metrics"
+METRICS_BUCKETS = [
+    float(bound)
+    for bound in (
+        os.getenv("METRICS_BUCKETS")
+        or "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+    ).split(",")
+]
@@ -6,15 +6,19 @@ sql alchemy session within the given engine (connection).
 """
 
 from contextlib import contextmanager
+from time import monotonic
 
 from sqlalchemy import orm
 
+from styler_rest_framework.metrics import metrics
+
 
 @contextmanager
 def create(engine):
     """Creates a context with a sql alchemy session"""
     session_maker = orm.sessionmaker(bind=engine)
     session = session_maker()
+    start = monotonic()
     try:
         yield session
     except Exception:
@@ -22,3 +26,4 @@ def create(engine):
         raise
     finally:
         session.close()
+        metrics.DB_SESSION_DURATION.observe(monotonic() - start)
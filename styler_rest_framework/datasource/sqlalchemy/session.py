@@ -1,10 +1,15 @@
 """ Session management tools
 """
+from time import monotonic
 from typing import Generator
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from styler_rest_framework.config import defaults
+from styler_rest_framework.datasource.sqlalchemy.tracing import trace_engine
+from styler_rest_framework.metrics import metrics
+
 
 _engine = None
 _session_local = None
@@ -13,12 +18,17 @@ _session_local = None
 def get_session(database_uri: str) -> Generator:
     global _engine
     global _session_local
-    _engine = _engine or create_engine(database_uri, pool_pre_ping=True)
+    if _engine is None:
+        _engine = create_engine(database_uri, pool_pre_ping=True)
+        if defaults.TRACE_SQLALCHEMY:
+            trace_engine(_engine)
     _session_local = _session_local or sessionmaker(
         autocommit=False, autoflush=False, bind=_engine
     )
+    start = monotonic()
     try:
         session_instance = _session_local()
         yield session_instance
     finally:
         session_instance.close()
+        metrics.DB_SESSION_DURATION.observe(monotonic() - start)
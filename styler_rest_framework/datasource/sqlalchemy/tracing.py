@@ -0,0 +1,70 @@
+""" Child spans of the SQLAlchemy queries
+
+    Every statement executed by a traced engine, while a request is
+traced, gets a child span of the request span named after its verb
+(`SQL SELECT`) with the database system and the statement:
+
+    engine = create_engine(database_uri)
+    trace_engine(engine)
+
+The engine of `session.get_session` is traced unless TRACE_SQLALCHEMY is
+false.
+"""
+
+from opencensus.trace.span import SpanKind
+from sqlalchemy import event
+
+from styler_rest_framework.config import defaults
+from styler_rest_framework.helpers.spans import ERROR_MESSAGE, ERROR_NAME, current_tracer
+
+
+DB_SYSTEM = "db.system"
+DB_STATEMENT = "db.statement"
+
+_SPAN_KEY = "_trace_span"
+
+
+def trace_engine(engine):
+    """Create a child span for the statements of the engine
+
+    Calling it again for the same engine has no effect.
+    """
+    if event.contains(engine, "before_cursor_execute", _before_execute):
+        return engine
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    tracer = current_tracer()
+    if tracer is None:
+        return
+    verb = statement.split(None, 1)[0].upper() if statement.strip() else "SQL"
+    span = tracer.start_span(f"SQL {verb}")
+    span.span_kind = SpanKind.CLIENT
+    span.add_attribute(DB_SYSTEM, conn.dialect.name)
+    span.add_attribute(DB_STATEMENT, statement[:defaults.TRACE_SQL_MAX_LENGTH])
+    setattr(context, _SPAN_KEY, tracer)
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    _end_span(context)
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    tracer = getattr(context, _SPAN_KEY, None)
+    if tracer is not None:
+        error = exception_context.original_exception
+        tracer.add_attribute_to_current_span(ERROR_NAME, type(error).__name__)
+        tracer.add_attribute_to_current_span(ERROR_MESSAGE, str(error))
+    _end_span(context)
+
+
+def _end_span(context):
+    tracer = getattr(context, _SPAN_KEY, None)
+    if tracer is not None:
+        setattr(context, _SPAN_KEY, None)
+        tracer.end_span()
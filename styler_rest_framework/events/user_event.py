@@ -11,7 +11,7 @@ from styler_rest_framework.pubsub.publishers import publisher_for_message
 from styler_rest_framework.config import defaults
 
 
-handler = publisher_for_message(SaveDataMessage, defaults.TOPIC_NAME)
+handler = publisher_for_message(SaveDataMessage, defaults.TOPIC_NAME, wait=False)
 
 _TABLE = f"userEvents-{defaults.ENVIRONMENT}"
 
@@ -42,7 +42,9 @@ def extract_args(args):
     inputs = {}
     for arg in args:
         try:
-            if "__dict__" in dir(arg):
+            if isinstance(arg, Identity):
+                value = json.dumps(arg.__getstate__())
+            elif "__dict__" in dir(arg):
                 value = json.dumps(arg.__dict__)
             elif type(arg) in (int, str, float, bool):
                 value = arg
@@ -61,7 +63,9 @@ def extract_named_args(kwargs):
         return inputs
     for k, kwarg in kwargs.items():
         try:
-            if "__dict__" in dir(kwarg):
+            if isinstance(kwarg, Identity):
+                value = json.dumps(kwarg.__getstate__())
+            elif "__dict__" in dir(kwarg):
                 value = json.dumps(kwarg.__dict__)
             elif type(kwarg) in (int, str, float, bool):
                 value = kwarg
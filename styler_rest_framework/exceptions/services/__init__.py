@@ -52,3 +52,13 @@ class InternalServerError(ServiceError):  # pragma: no coverage
 
 class UnexpectedError(ServiceError):  # pragma: no coverage
     """Error raised when the service returns an unexpected status code"""
+
+
+class CircuitOpenError(ServiceError):
+    """Error raised without calling the service while its circuit is open"""
+
+
+class DeadlineExceededError(ServiceError):
+    """Error raised when the deadline of the request is reached before the
+    service responds
+    """
@@ -8,6 +8,9 @@ from styler_rest_framework.config import defaults
 from styler_rest_framework.logging import setup_logging
 from styler_rest_framework.logging.error_reporting import google_error_reporting_handler
 from styler_rest_framework.logging.logging_filter import EndpointFilter
+from styler_rest_framework.metrics.middleware import config_metrics
+from styler_rest_framework.pubsub.publishers import pubsub_handler
+from styler_rest_framework.services import internal_requests_log, session
 
 
 def add_auth_middleware(*args, **kwargs):
@@ -53,6 +56,32 @@ def add_middlewares(
     )
 
 
+def add_http_session_hooks(app):
+    """Open the shared HTTP client session on startup, flush the internal
+    requests log and close the session on cleanup
+    """
+    app.on_startup.append(session.open_session)
+    app.on_cleanup.append(internal_requests_log.close)
+    app.on_cleanup.append(session.close_session)
+
+
+def add_pubsub_hooks(app):
+    """Send the pending Pub/Sub batches and stop the publishers on cleanup"""
+    app.on_cleanup.append(pubsub_handler.close)
+
+
+def add_metrics(app, expose=True, **kwargs):
+    """Record the request metrics and serve them on METRICS_PATH
+
+    Args:
+        app: aiohttp app
+        expose: serve the metrics endpoint
+        kwargs: path, excludes or excludes_regex
+            (see `metrics.middleware.config_metrics`)
+    """
+    config_metrics(app, expose=expose, **kwargs)
+
+
 def set_logging(level=logging.INFO):  # pragma: no coverage
     setup_logging(level)
     logging.getLogger("aiohttp.access").addFilter(EndpointFilter())
@@ -61,3 +90,5 @@ def set_logging(level=logging.INFO):  # pragma: no coverage
 def default_configuration(app):  # pragma: no coverage
     set_logging()
     add_middlewares(app)
+    add_http_session_hooks(app)
+    add_pubsub_hooks(app)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""asyncio counterpart of the google cloud storage handler"""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import StringIO
+import asyncio
+
+from google.cloud import storage
+from styler_rest_framework.config import defaults
+from styler_rest_framework.helpers.gcs_handler import default_retry_policy
+
+
+class AsyncGCSHandler:
+    """The asyncio handler of google cloud storage (GCS)
+
+    Exposes the operations of GCSHandler as coroutines. The blocking
+    client calls run in a bounded thread pool and the retries wait with
+    `asyncio.sleep`, so the event loop is never blocked.
+
+    Args:
+        bucket_name (str): target bucket name of gs
+        client: storage client (defaults to `storage.Client()`)
+        back_off (float): upper bound of the first delay between retries
+        retry_policy (RetryPolicy): replaces the default retry policy
+        max_workers (int): size of the thread pool (GCS_MAX_WORKERS)
+        executor: executor to use instead of creating a thread pool
+
+    Attributes:
+        bucket : a gs bucket instance
+    """
+
+    def __init__(
+        self,
+        bucket_name,
+        *args,
+        client=None,
+        back_off=3,
+        retry_policy=None,
+        max_workers=None,
+        executor=None,
+        **kwargs,
+    ):
+        client = client or storage.Client()
+        # Unlike get_bucket, this does not send a request
+        self.bucket = client.bucket(bucket_name)
+        self.retry_policy = retry_policy or default_retry_policy(back_off)
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers or defaults.GCS_MAX_WORKERS,
+            thread_name_prefix="gcs",
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self, *args):
+        """Shutdown the thread pool created by the handler
+
+        Accepts and ignores positional arguments so it can be registered
+        both as an aiohttp signal and as a FastAPI event handler.
+        """
+        if self._own_executor:
+            await asyncio.get_running_loop().run_in_executor(
+                None, partial(self._executor.shutdown, wait=True)
+            )
+
+    async def get_files_from_folder(self, folder_name, retry=3):
+        """Return the list of blobs in the folder.
+
+        Args:
+            folder_name (str): folder name or prefix path
+
+        Returns:
+            a list of blobs
+        """
+        return await self._run(
+            lambda: list(self.bucket.list_blobs(prefix=folder_name)), retry
+        )
+
+    async def download_file_as_string_with_formatter(self, file_path, retry=3):
+        """Download the contents of this blob as a list of lines.
+
+        Args:
+            file_path (str): path of file
+
+        Returns:
+            The data stored in this blob.
+        """
+        data = await self.download_file_as_string(file_path, retry=retry)
+        return data.decode("utf-8").splitlines()
+
+    async def download_file_as_stream(self, file_path, retry=3):
+        """Download the contents of this blob as a StringIO object.
+
+        Args:
+            file_path (str): path of file
+
+        Returns:
+            The data stored in this blob.
+        """
+        data = await self.download_file_as_string(file_path, retry=retry)
+        return StringIO(data.decode("utf-8"))
+
+    async def download_file_as_string(self, file_path, retry=3):
+        """Download the contents of this blob as a bytes object.
+
+        Args:
+            file_path (str): path of file
+
+        Returns:
+            The data stored in this blob.
+        """
+        return await self._run(
+            lambda: self.bucket.blob(file_path).download_as_bytes(), retry
+        )
+
+    async def upload_file(self, file_obj, file_name, retry=3):
+        """upload a file to the bucket.
+
+        Args:
+            file_obj (file object): A file handle open for reading.
+            file_name (str): file name
+
+        Raises:
+            GoogleCloudError if the upload response returns an error status.
+        """
+        position = _position(file_obj)
+
+        def upload():
+            # A failed attempt may have read part of the file
+            if position is not None:
+                file_obj.seek(position)
+            return self.bucket.blob(file_name).upload_from_file(file_obj)
+
+        return await self._run(upload, retry)
+
+    async def rename_file(self, old_file_name, new_file_name, retry=3):
+        """rename a file from the bucket.
+
+        Args:
+            old_file_name (str): old file name
+            new_file_name (str): new file name
+
+        Raises:
+            GoogleCloudError if the upload response returns an error status.
+        """
+        return await self._run(
+            lambda: self.bucket.rename_blob(
+                self.bucket.blob(old_file_name), new_file_name
+            ),
+            retry,
+        )
+
+    async def put_as_string(
+        self, filename: str, file_string: bytes, content_type: str, retry=3
+    ):
+        """Method to upload objects."""
+        return await self._run(
+            lambda: self.bucket.blob(filename).upload_from_string(
+                file_string, content_type
+            ),
+            retry,
+        )
+
+    async def delete_file(self, filename, retry=3):
+        """Deletes a file from the bucket"""
+        return await self._run(lambda: self.bucket.blob(filename).delete(), retry)
+
+    async def is_exist(self, filename, retry=3):
+        """Check if a file exists in the bucket"""
+        return await self._run(lambda: self.bucket.blob(filename).exists(), retry)
+
+    async def _run(self, func, retry):
+        loop = asyncio.get_running_loop()
+        return await self.retry_policy.call_async(
+            loop.run_in_executor, self._executor, func, max_retries=retry
+        )
+
+
+def _position(file_obj):
+    """Position of a seekable file, or None"""
+    try:
+        return file_obj.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""In-memory fake of the google cloud storage client
+
+Implements the subset of `google.cloud.storage` used by GCSHandler and
+AsyncGCSHandler so they can be used offline, in tests and benchmarks:
+
+    client = FakeClient()
+    handler = GCSHandler("bucket", client=client)
+
+Failures and latency can be injected to exercise retries and
+concurrency.
+"""
+
+from threading import Lock
+import time
+
+from google.api_core.exceptions import (
+    BadGateway,
+    GatewayTimeout,
+    InternalServerError,
+    NotFound,
+    ServiceUnavailable,
+    TooManyRequests,
+)
+
+
+# Errors retried by the client in the chunks of a resumable upload
+_TRANSIENT_ERRORS = (
+    BadGateway,
+    GatewayTimeout,
+    InternalServerError,
+    ServiceUnavailable,
+    TooManyRequests,
+    ConnectionError,
+)
+
+
+class FakeBlob:
+    """In-memory blob
+
+    Args:
+        bucket (FakeBucket): parent bucket
+        name (str): blob name
+        chunk_size (int): when set, files larger than it are uploaded in
+            chunks, as in a resumable session of the client
+    """
+
+    def __init__(self, bucket, name, chunk_size=None):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = chunk_size
+        self._content_type = None
+
+    @property
+    def size(self):
+        obj = self.bucket._objects.get(self.name)
+        return None if obj is None else len(obj[0])
+
+    @property
+    def content_type(self):
+        obj = self.bucket._objects.get(self.name)
+        return self._content_type if obj is None else obj[1]
+
+    @content_type.setter
+    def content_type(self, value):
+        self._content_type = value
+
+    def exists(self, *args, **kwargs):
+        self.bucket._call("exists")
+        return self.name in self.bucket._objects
+
+    def reload(self, *args, **kwargs):
+        self.bucket._call("reload")
+        self._data()
+
+    def download_as_bytes(self, *args, start=None, end=None, **kwargs):
+        self.bucket._call("download")
+        data = self._data()
+        # `end` is inclusive, as in the GCS client
+        return data[start or 0:None if end is None else end + 1]
+
+    download_as_string = download_as_bytes
+
+    def download_to_file(self, file_obj, *args, start=None, end=None, **kwargs):
+        file_obj.write(self.download_as_bytes(start=start, end=end))
+
+    def download_to_filename(self, filename, *args, **kwargs):
+        with open(filename, "wb") as file_obj:
+            self.download_to_file(file_obj)
+
+    def upload_from_string(self, data, content_type="text/plain", *args, **kwargs):
+        self.bucket._call("upload")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bucket._store(self.name, bytes(data), content_type)
+
+    def upload_from_file(
+        self, file_obj, *args, size=None, content_type=None, retry=None, **kwargs
+    ):
+        content_type = content_type or "application/octet-stream"
+        if self.chunk_size is None or (size is not None and size <= self.chunk_size):
+            data = file_obj.read() if size is None else file_obj.read(size)
+            self.upload_from_string(data, content_type)
+            return
+        self._call_retried("create_session", retry)
+        data = bytearray()
+        while size is None or len(data) < size:
+            length = self.chunk_size if size is None else min(self.chunk_size, size - len(data))
+            chunk = file_obj.read(length)
+            if not chunk:
+                break
+            # The client keeps the chunk in memory and sends it again
+            self._call_retried("upload_chunk", retry)
+            data.extend(chunk)
+        self.bucket._store(self.name, bytes(data), content_type)
+
+    def upload_from_filename(self, filename, content_type=None, *args, **kwargs):
+        with open(filename, "rb") as file_obj:
+            self.upload_from_file(file_obj, content_type=content_type)
+
+    def compose(self, sources, *args, **kwargs):
+        self.bucket._call("compose")
+        data = b"".join(source._data() for source in sources)
+        self.bucket._store(self.name, data, self._content_type)
+
+    def delete(self, *args, **kwargs):
+        self.bucket.delete_blob(self.name)
+
+    def _call_retried(self, operation, retry):
+        while True:
+            try:
+                return self.bucket._call(operation)
+            except _TRANSIENT_ERRORS:
+                if retry is None:
+                    raise
+
+    def _data(self):
+        obj = self.bucket._objects.get(self.name)
+        if obj is None:
+            raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+        return obj[0]
+
+
+class FakeBucket:
+    """In-memory bucket
+
+    Args:
+        name (str): bucket name
+        latency (float): seconds every operation sleeps (simulated network)
+        client (FakeClient): parent client
+
+    Attributes:
+        calls: number of operations performed, by name
+    """
+
+    def __init__(self, name, latency=0, client=None):
+        self.name = name
+        self.latency = latency
+        self.client = client
+        self.calls = {}
+        self._objects = {}
+        self._failures = []
+        self._lock = Lock()
+
+    def fail(self, *exceptions):
+        """Raise the exceptions, in order, in the next operations"""
+        with self._lock:
+            self._failures.extend(exceptions)
+
+    def blob(self, blob_name, chunk_size=None, *args, **kwargs):
+        return FakeBlob(self, blob_name, chunk_size=chunk_size)
+
+    def get_blob(self, blob_name, *args, **kwargs):
+        self._call("reload")
+        if blob_name not in self._objects:
+            return None
+        return FakeBlob(self, blob_name)
+
+    def list_blobs(self, *args, prefix=None, **kwargs):
+        self._call("list")
+        names = sorted(self._objects)
+        return iter([
+            FakeBlob(self, name) for name in names
+            if not prefix or name.startswith(prefix)
+        ])
+
+    def copy_blob(self, blob, destination_bucket, new_name=None, *args, **kwargs):
+        self._call("copy")
+        data = blob._data()
+        name = new_name or blob.name
+        destination_bucket._store(name, data, blob.content_type)
+        return FakeBlob(destination_bucket, name)
+
+    def rename_blob(self, blob, new_name, *args, **kwargs):
+        new_blob = self.copy_blob(blob, self, new_name)
+        self.delete_blob(blob.name)
+        return new_blob
+
+    def delete_blob(self, blob_name, *args, **kwargs):
+        batch = getattr(self.client, "current_batch", None)
+        if batch is not None:
+            batch._defer(self, blob_name)
+            return
+        self._call("delete")
+        with self._lock:
+            if self._objects.pop(blob_name, None) is None:
+                raise NotFound(f"No such object: {self.name}/{blob_name}")
+
+    def delete_blobs(self, blobs, on_error=None, *args, **kwargs):
+        for blob in blobs:
+            name = getattr(blob, "name", blob)
+            try:
+                self.delete_blob(name)
+            except NotFound:
+                if on_error is None:
+                    raise
+                on_error(blob)
+
+    def _call(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            failure = self._failures.pop(0) if self._failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if failure is not None:
+            raise failure
+
+    def _store(self, name, data, content_type):
+        with self._lock:
+            self._objects[name] = (data, content_type)
+
+
+class FakeBatch:
+    """Batch request: the deletes are deferred and sent in one call
+
+    As in the client, a failed call raises an error once all the calls
+    are done.
+
+    Args:
+        client (FakeClient): parent client
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._deferred = []
+
+    def __enter__(self):
+        self._client.current_batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._client.current_batch = None
+        if exc_type is None:
+            self.finish()
+
+    def finish(self):
+        if not self._deferred:
+            raise ValueError("No deferred requests")
+        self._deferred[0][0]._call("batch")
+        missing = []
+        for bucket, blob_name in self._deferred:
+            with bucket._lock:
+                if bucket._objects.pop(blob_name, None) is None:
+                    missing.append(blob_name)
+        if missing:
+            raise NotFound(f"No such object: {missing[-1]}")
+
+    def _defer(self, bucket, blob_name):
+        self._deferred.append((bucket, blob_name))
+
+
+class FakeClient:
+    """In-memory storage client
+
+    Args:
+        latency (float): latency of the buckets created by the client
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.current_batch = None
+        self._buckets = {}
+
+    def bucket(self, bucket_name, *args, **kwargs):
+        if bucket_name not in self._buckets:
+            self._buckets[bucket_name] = FakeBucket(
+                bucket_name, latency=self.latency, client=self
+            )
+        return self._buckets[bucket_name]
+
+    def batch(self, *args, **kwargs):
+        return FakeBatch(self)
+
+    def get_bucket(self, bucket_or_name, *args, **kwargs):
+        return self.bucket(getattr(bucket_or_name, "name", bucket_or_name))
@@ -14,6 +14,10 @@ from styler_rest_framework.middlewares.fastapi import exception_middleware
 from styler_rest_framework.middlewares.fastapi.auth_middleware import add_auth_middleware
 from styler_rest_framework.logging.error_reporting import google_error_reporting_handler
 from styler_rest_framework.logging.logging_filter import EndpointFilter
+from styler_rest_framework.metrics.asgi import config_asgi_metrics
+from styler_rest_framework.pubsub.publishers import pubsub_handler
+from styler_rest_framework.services import internal_requests_log, session
+from styler_rest_framework.tracing import config_asgi_tracer
 
 
 def api_error_reporting_handler(service=None):  # pragma: no coverage
@@ -36,7 +40,7 @@ def api_error_reporting_handler(service=None):  # pragma: no coverage
 
 
 def add_middlewares(app, error_handler=None, service=None, handle_exceptions_args=None):
-    """Append default exception middleware
+    """Append default exception middleware and the lifecycle hooks
 
     Args:
         app: FastAPI app
@@ -51,9 +55,50 @@ def add_middlewares(app, error_handler=None, service=None, handle_exceptions_arg
         app, error_handler=error_handler, **handle_exceptions_args
     )
 
+    add_http_session_hooks(app)
+    add_pubsub_hooks(app)
+
     logging.getLogger("uvicorn.access").addFilter(EndpointFilter())
 
 
+def add_http_session_hooks(app):
+    """Open the shared HTTP client session on startup, flush the internal
+    requests log and close the session on shutdown
+    """
+    app.add_event_handler("startup", session.open_session)
+    app.add_event_handler("shutdown", internal_requests_log.close)
+    app.add_event_handler("shutdown", session.close_session)
+
+
+def add_pubsub_hooks(app):
+    """Send the pending Pub/Sub batches and stop the publishers on shutdown"""
+    app.add_event_handler("shutdown", pubsub_handler.close)
+
+
+def add_tracing(app, project_id, **kwargs):
+    """Trace the requests, and their outbound calls and SQL queries
+
+    Args:
+        app: FastAPI app
+        project_id: Google Cloud project of the traces
+        kwargs: sampler, sample_errors, excludes, excludes_regex or
+            exporter (see `tracing.config_asgi_tracer`)
+    """
+    return config_asgi_tracer(app, project_id, **kwargs)
+
+
+def add_metrics(app, expose=True, **kwargs):
+    """Record the request metrics and serve them on METRICS_PATH
+
+    Args:
+        app: FastAPI app
+        expose: serve the metrics endpoint
+        kwargs: path, excludes or excludes_regex
+            (see `metrics.asgi.config_asgi_metrics`)
+    """
+    config_asgi_metrics(app, expose=expose, **kwargs)
+
+
 def setup_validation_handler(
     app, validation_error_code=422, validation_code="validation_error"
 ):  # pragma: no coverage
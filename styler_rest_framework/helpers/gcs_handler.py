@@ -1,11 +1,43 @@
 # -*- coding: utf-8 -*-
 """This is the class of handling google cloud storage"""
 
-from io import StringIO
-import time
+from io import SEEK_CUR, SEEK_END, SEEK_SET
+from io import BufferedReader, BytesIO, RawIOBase, StringIO, TextIOWrapper
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, NamedTuple
+import os
+import uuid
 
 from google.cloud import storage
-from google.api_core.exceptions import ServiceUnavailable
+from google.cloud.storage.retry import DEFAULT_RETRY
+from google.api_core.exceptions import NotFound, ServiceUnavailable
+from styler_rest_framework.config import defaults
+from styler_rest_framework.helpers.retry import RetryPolicy
+
+
+# Maximum number of calls in a GCS batch request
+BATCH_MAX_SIZE = 100
+
+# Maximum number of sources of a compose request
+COMPOSE_MAX_SOURCES = 32
+
+
+class TransferResult(NamedTuple):
+    """Result of one item of a bulk operation
+
+    Attributes:
+        name: blob name
+        result: value returned by the operation
+        error: exception raised by the operation, if any
+    """
+
+    name: str
+    result: Any = None
+    error: Exception = None
+
+    @property
+    def ok(self):
+        return self.error is None
 
 
 class GCSHandler:
@@ -14,16 +46,22 @@ class GCSHandler:
     Args:
         bucket_name (str): target bucket name of gs
         *args: placeholder
-        **kwargs: placeholder
+        **kwargs: placeholder (`client`: storage client to use,
+            `back_off`: upper bound of the first delay between retries,
+            `retry_policy`: RetryPolicy replacing the default one)
 
     Attributes:
+        client : the storage client
         bucket : a gs bucket instance
+        retry_policy : RetryPolicy of the handler
     """
 
     def __init__(self, bucket_name, *args, **kwargs):
-        client = storage.Client()
-        self.bucket = client.get_bucket(bucket_name)
-        self._BACKOFF = kwargs.get("back_off", 3)
+        self.client = kwargs.get("client") or storage.Client()
+        self.bucket = self.client.get_bucket(bucket_name)
+        self.retry_policy = kwargs.get("retry_policy") or default_retry_policy(
+            kwargs.get("back_off", 3)
+        )
 
     def get_files_from_folder(self, folder_name, retry=3):
         """Return an iterator used to find blobs in the bucket.
@@ -34,17 +72,12 @@ class GCSHandler:
         Returns:
             an iterator used to find blobs in the bucket
         """
-        try:
-            return self.bucket.list_blobs(prefix=folder_name)
-        except ServiceUnavailable:
-            if retry > 0:
-                time.sleep(self._BACKOFF)
-                return self.get_files_from_folder(folder_name, retry=retry - 1)
-            else:
-                raise
+        return self._retry(lambda: self.bucket.list_blobs(prefix=folder_name), retry)
 
     def download_file_as_string_with_formatter(self, file_path, retry=3):
-        """Download the contents of this blob as a bytes object.
+        """Download the contents of this blob as a list of lines.
+
+        The whole blob is loaded in memory, use `iter_lines` for large files.
 
         Args:
             file_path (str): path of file
@@ -52,36 +85,67 @@ class GCSHandler:
         Returns:
             The data stored in this blob.
         """
-        try:
-            blob = self.bucket.blob(file_path)
-            return blob.download_as_string().decode("utf-8").splitlines()
-        except ServiceUnavailable:
-            if retry > 0:
-                time.sleep(self._BACKOFF)
-                return self.download_file_as_string_with_formatter(
-                    file_path, retry=retry - 1
-                )
-            else:
-                raise
+        data = self.download_file_as_string(file_path, retry=retry)
+        return data.decode("utf-8").splitlines()
 
     def download_file_as_stream(self, file_path, retry=3):
         """Download the contents of this blob as a StringIO object.
 
+        The whole blob is loaded in memory, use `open_file` or `iter_lines`
+        for large files.
+
         Args:
             file_path (str): path of file
 
         Returns:
             The data stored in this blob.
         """
-        try:
-            blob = self.bucket.blob(file_path)
-            return StringIO(blob.download_as_bytes().decode("utf-8"))
-        except ServiceUnavailable:
-            if retry > 0:
-                time.sleep(self._BACKOFF)
-                return self.download_file_as_stream(file_path, retry=retry - 1)
-            else:
-                raise
+        data = self._retry(
+            lambda: self.bucket.blob(file_path).download_as_bytes(), retry
+        )
+        return StringIO(data.decode("utf-8"))
+
+    def open_file(self, file_path, chunk_size=None, retry=3):
+        """Open the blob as a binary file-like object read in chunks.
+
+        Each chunk is downloaded with a ranged request when it is needed,
+        so the memory used does not depend on the size of the blob.
+
+        Args:
+            file_path (str): path of file
+            chunk_size (int): bytes per request (GCS_DOWNLOAD_CHUNK_SIZE)
+            retry (int): retries of each request
+
+        Returns:
+            A buffered binary reader
+        """
+        chunk_size = chunk_size or defaults.GCS_DOWNLOAD_CHUNK_SIZE
+        reader = BlobReader(
+            self.bucket.blob(file_path),
+            chunk_size=chunk_size,
+            retry=retry,
+            retry_policy=self.retry_policy,
+        )
+        return BufferedReader(reader, buffer_size=chunk_size)
+
+    def iter_lines(self, file_path, chunk_size=None, encoding="utf-8", retry=3):
+        """Iterate over the lines of the blob without loading it in memory.
+
+        The text is decoded incrementally, so multi-byte characters split
+        between chunks are handled.
+
+        Args:
+            file_path (str): path of file
+            chunk_size (int): bytes per request (GCS_DOWNLOAD_CHUNK_SIZE)
+            encoding (str): text encoding
+
+        Returns:
+            An iterator of lines, without the line break
+        """
+        binary = self.open_file(file_path, chunk_size=chunk_size, retry=retry)
+        with TextIOWrapper(binary, encoding=encoding) as text:
+            for line in text:
+                yield line.rstrip("\n")
 
     def download_file_as_string(self, file_path, retry=3):
         """Download the contents of this blob as a bytes object.
@@ -92,35 +156,73 @@ class GCSHandler:
         Returns:
             The data stored in this blob.
         """
-        try:
-            blob = self.bucket.blob(file_path)
-            return blob.download_as_string()
-        except ServiceUnavailable:
-            if retry > 0:
-                time.sleep(self._BACKOFF)
-                return self.download_file_as_string(file_path, retry=retry - 1)
-            else:
-                raise
-
-    def upload_file(self, file_obj, file_name, retry=3):
+        return self._retry(
+            lambda: self.bucket.blob(file_path).download_as_string(), retry
+        )
+
+    def download_file(self, file_path, filename, retry=3):
+        """Download the contents of this blob to a local file.
+
+        Args:
+            file_path (str): path of file
+            filename (str): local path to write to
+        """
+        return self._retry(
+            lambda: self.bucket.blob(file_path).download_to_filename(filename), retry
+        )
+
+    def upload_file(
+        self,
+        file_obj,
+        file_name,
+        retry=3,
+        content_type=None,
+        chunk_size=None,
+        composite=False,
+    ):
         """upload a file to the bucket.
 
+        Files larger than `chunk_size` are sent by the storage client in a
+        resumable session, one chunk per request; the client retries a
+        failed chunk (with its default retry, disabled by `retry=0`) instead
+        of restarting the upload. With `composite=True`, local files of at
+        least GCS_COMPOSITE_THRESHOLD bytes are split in parts uploaded
+        concurrently and composed into the final blob (composite objects
+        have a CRC32C checksum but no MD5 hash).
+
         Args:
             file_obj (file object): A file handle open for reading.
             file_name (str): file name
+            content_type (str): content type of the blob
+            chunk_size (int): bytes per request, a multiple of 256 KiB
+                (GCS_UPLOAD_CHUNK_SIZE)
+            composite (bool): allow parallel composite uploads
 
         Raises:
             GoogleCloudError if the upload response returns an error status.
         """
-        try:
+        chunk_size = chunk_size or defaults.GCS_UPLOAD_CHUNK_SIZE
+        size = _remaining_size(file_obj)
+        if size is not None and size > chunk_size:
+            path = getattr(file_obj, "name", None)
+            if composite and size >= defaults.GCS_COMPOSITE_THRESHOLD and _is_file(path):
+                return self._composite_upload(
+                    path, file_obj.tell(), size, file_name, content_type, chunk_size, retry
+                )
+            return self._resumable_upload(
+                file_obj, size, file_name, content_type, chunk_size, retry
+            )
+        position = file_obj.tell() if size is not None else None
+
+        def upload():
+            if position is not None:
+                file_obj.seek(position)
             blob = self.bucket.blob(file_name)
-            return blob.upload_from_file(file_obj)
-        except ServiceUnavailable:
-            if retry > 0:
-                time.sleep(self._BACKOFF)
-                return self.upload_file(file_obj, file_name, retry=retry - 1)
-            else:
-                raise
+            if content_type is None:
+                return blob.upload_from_file(file_obj)
+            return blob.upload_from_file(file_obj, content_type=content_type)
+
+        return self._retry(upload, retry)
 
     def rename_file(self, old_file_name, new_file_name, retry=3):
         """rename a file from the bucket.
@@ -132,52 +234,308 @@ class GCSHandler:
         Raises:
             GoogleCloudError if the upload response returns an error status.
         """
-        try:
-            blob = self.bucket.blob(old_file_name)
-            return self.bucket.rename_blob(blob, new_file_name)
-        except ServiceUnavailable:
-            if retry > 0:
-                time.sleep(self._BACKOFF)
-                return self.rename_file(old_file_name, new_file_name, retry=retry - 1)
-            else:
-                raise
+        return self._retry(
+            lambda: self.bucket.rename_blob(
+                self.bucket.blob(old_file_name), new_file_name
+            ),
+            retry,
+        )
 
     def put_as_string(
         self, filename: str, file_string: bytes, content_type: str, retry=3
     ):
-        """Method to upload objects."""
-        try:
-            blob = self.bucket.blob(filename)
-            return blob.upload_from_string(file_string, content_type)
-        except ServiceUnavailable:
-            if retry > 0:
-                time.sleep(self._BACKOFF)
-                return self.put_as_string(
-                    filename, file_string, content_type, retry=retry - 1
-                )
-            else:
-                raise
+        """Method to upload objects.
+
+        Payloads larger than GCS_UPLOAD_CHUNK_SIZE are sent in a resumable
+        session (see `upload_file`).
+        """
+        if len(file_string) > defaults.GCS_UPLOAD_CHUNK_SIZE:
+            if isinstance(file_string, str):
+                file_string = file_string.encode("utf-8")
+            return self.upload_file(
+                BytesIO(file_string), filename, retry=retry, content_type=content_type
+            )
+        return self._retry(
+            lambda: self.bucket.blob(filename).upload_from_string(
+                file_string, content_type
+            ),
+            retry,
+        )
 
     def delete_file(self, filename, retry=3):
         """Deletes a file from the bucket"""
-        try:
-            blob = self.bucket.blob(filename)
-            return blob.delete()
-        except ServiceUnavailable:
-            if retry > 0:
-                time.sleep(self._BACKOFF)
-                return self.delete_file(filename, retry=retry - 1)
-            else:
-                raise
+        return self._retry(lambda: self.bucket.blob(filename).delete(), retry)
 
     def is_exist(self, filename, retry=3):
         """Check if a file exists in the bucket"""
+        return self._retry(lambda: self.bucket.blob(filename).exists(), retry)
+
+    def download_many(self, file_paths, destination_dir=None, max_workers=None, retry=3):
+        """Download many blobs concurrently.
+
+        Args:
+            file_paths (list): paths of the files
+            destination_dir (str): local directory to write the files to,
+                keeping their paths. When None the contents are returned.
+            max_workers (int): concurrent downloads (GCS_MAX_WORKERS)
+
+        Returns:
+            A list of TransferResult, in the order of `file_paths`, with the
+            contents or the local path of each file
+        """
+        def download(file_path):
+            if destination_dir is None:
+                return self.download_file_as_string(file_path, retry=retry)
+            filename = os.path.join(destination_dir, file_path)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            self.download_file(file_path, filename, retry=retry)
+            return filename
+
+        return self._map(download, file_paths, max_workers)
+
+    def upload_many(self, files, content_type=None, max_workers=None, retry=3):
+        """Upload many files concurrently.
+
+        Args:
+            files (dict or list of tuples): file name -> bytes, str or
+                file object open for reading
+            content_type (str): content type of bytes and str data
+            max_workers (int): concurrent uploads (GCS_MAX_WORKERS)
+
+        Returns:
+            A list of TransferResult, in the order of `files`
+        """
+        items = dict(files)
+
+        def upload(file_name):
+            data = items[file_name]
+            if isinstance(data, (bytes, str)):
+                return self.put_as_string(
+                    file_name,
+                    data,
+                    content_type or "application/octet-stream",
+                    retry=retry,
+                )
+            return self.upload_file(data, file_name, retry=retry)
+
+        return self._map(upload, items, max_workers)
+
+    def delete_prefix(self, prefix, retry=3):
+        """Delete every blob whose name starts with `prefix`.
+
+        Deletes are sent in GCS batch requests of up to BATCH_MAX_SIZE
+        calls, so a folder is deleted with one request per 100 blobs. When
+        a batch fails, its blobs are deleted one by one; blobs that are
+        already gone count as deleted.
+
+        Args:
+            prefix (str): folder name or prefix path
+
+        Returns:
+            A list of TransferResult, one per blob
+        """
+        names = [blob.name for blob in self._list(prefix, retry)]
+        results = []
+        for start in range(0, len(names), BATCH_MAX_SIZE):
+            results.extend(self._delete_batch(names[start:start + BATCH_MAX_SIZE], retry))
+        return results
+
+    def copy_prefix(
+        self,
+        prefix,
+        destination_prefix,
+        destination_bucket=None,
+        max_workers=None,
+        retry=3,
+    ):
+        """Copy every blob whose name starts with `prefix` concurrently.
+
+        Args:
+            prefix (str): folder name or prefix path
+            destination_prefix (str): replaces `prefix` in the new names
+            destination_bucket (str): bucket name (defaults to the same bucket)
+            max_workers (int): concurrent copies (GCS_MAX_WORKERS)
+
+        Returns:
+            A list of TransferResult, one per blob, with the new names
+        """
+        bucket = self.bucket
+        if destination_bucket is not None:
+            bucket = self.client.bucket(destination_bucket)
+        blobs = {blob.name: blob for blob in self._list(prefix, retry)}
+
+        def copy(name):
+            new_name = destination_prefix + name[len(prefix):]
+            self._retry(
+                lambda: self.bucket.copy_blob(blobs[name], bucket, new_name), retry
+            )
+            return new_name
+
+        return self._map(copy, blobs, max_workers)
+
+    def _resumable_upload(self, file_obj, size, file_name, content_type, chunk_size, retry):
+        blob = self.bucket.blob(file_name, chunk_size=chunk_size)
+        blob.upload_from_file(
+            file_obj,
+            size=size,
+            content_type=content_type,
+            retry=DEFAULT_RETRY if retry else None,
+        )
+
+    def _composite_upload(
+        self, filename, start, size, file_name, content_type, chunk_size, retry
+    ):
+        count = min(COMPOSE_MAX_SOURCES, max(2, defaults.GCS_MAX_WORKERS))
+        part_size = -(-size // count)
+        token = uuid.uuid4().hex[:8]
+        parts = {
+            f"{file_name}.part-{token}-{index}": start + offset
+            for index, offset in enumerate(range(0, size, part_size))
+        }
+
+        def upload_part(name):
+            offset = parts[name]
+            with open(filename, "rb") as part_file:
+                part_file.seek(offset)
+                self._resumable_upload(
+                    part_file,
+                    min(part_size, start + size - offset),
+                    name,
+                    content_type,
+                    chunk_size,
+                    retry,
+                )
+
         try:
-            blob = self.bucket.blob(filename)
-            return blob.exists()
-        except ServiceUnavailable:
-            if retry > 0:
-                time.sleep(self._BACKOFF)
-                return self.is_exist(filename, retry=retry - 1)
-            else:
-                raise
+            results = self._map(upload_part, parts, len(parts))
+            for result in results:
+                if not result.ok:
+                    raise result.error
+            blob = self.bucket.blob(file_name)
+            blob.content_type = content_type
+            sources = [self.bucket.blob(name) for name in parts]
+            self._retry(lambda: blob.compose(sources), retry)
+        finally:
+            self._delete_batch(list(parts), retry)
+
+    def _list(self, prefix, retry):
+        return self._retry(lambda: list(self.bucket.list_blobs(prefix=prefix)), retry)
+
+    def _delete_batch(self, names, retry):
+        def delete():
+            with self.client.batch():
+                for name in names:
+                    self.bucket.delete_blob(name)
+
+        try:
+            self._retry(delete, retry)
+        except Exception:
+            # The batch raises one error for all its calls: the blobs left
+            # are deleted one by one to get the result of each
+            return self._map(lambda name: self._delete_blob(name, retry), names, None)
+        return [TransferResult(name) for name in names]
+
+    def _delete_blob(self, name, retry):
+        try:
+            self._retry(lambda: self.bucket.delete_blob(name), retry)
+        except NotFound:
+            # Already deleted, e.g. by the failed batch
+            pass
+
+    def _map(self, func, items, max_workers):
+        def run(name):
+            try:
+                return TransferResult(name, result=func(name))
+            except Exception as ex:
+                return TransferResult(name, error=ex)
+
+        with ThreadPoolExecutor(max_workers=max_workers or defaults.GCS_MAX_WORKERS) as executor:
+            return list(executor.map(run, items))
+
+    def _retry(self, func, retry):
+        return self.retry_policy.call(func, max_retries=retry)
+
+
+def default_retry_policy(back_off=3):
+    """Retry policy of the GCS handlers: ServiceUnavailable errors are
+    retried with a jittered delay starting below `back_off` seconds
+    """
+    return RetryPolicy(
+        base_delay=back_off,
+        max_delay=back_off * 4,
+        retry_on=(ServiceUnavailable,),
+    )
+
+
+def _remaining_size(file_obj):
+    """Bytes left to read in a seekable file, or None"""
+    try:
+        position = file_obj.tell()
+        size = file_obj.seek(0, SEEK_END) - position
+        file_obj.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _is_file(path):
+    return isinstance(path, str) and os.path.isfile(path)
+
+
+class BlobReader(RawIOBase):
+    """Raw binary reader of a blob using ranged requests
+
+    Args:
+        blob: a gs blob instance
+        chunk_size (int): maximum bytes per request
+        retry (int): retries of each request
+        retry_policy (RetryPolicy): retried errors and back-off
+    """
+
+    def __init__(self, blob, chunk_size=None, retry=3, retry_policy=None):
+        self.blob = blob
+        self.chunk_size = chunk_size or defaults.GCS_DOWNLOAD_CHUNK_SIZE
+        self.retry_policy = retry_policy or default_retry_policy()
+        self._retry = retry
+        self._size = None
+        self._position = 0
+
+    @property
+    def size(self):
+        """Size of the blob, loaded with the first read"""
+        if self._size is None:
+            self._call(self.blob.reload)
+            self._size = self.blob.size
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=SEEK_SET):
+        if whence == SEEK_CUR:
+            offset += self._position
+        elif whence == SEEK_END:
+            offset += self.size
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, buffer):
+        if self._position >= self.size:
+            return 0
+        end = min(self._position + len(buffer), self._position + self.chunk_size, self.size)
+        data = self._call(
+            self.blob.download_as_bytes, start=self._position, end=end - 1
+        )
+        length = len(data)
+        buffer[:length] = data
+        self._position += length
+        return length
+
+    def _call(self, func, **kwargs):
+        return self.retry_policy.call(func, max_retries=self._retry, **kwargs)
@@ -0,0 +1,25 @@
+""" Checks of the values encoded as JSON
+
+orjson writes NaN and Infinity as null, where the standard library
+writes NaN and Infinity. The encoders of the messages and of the request
+bodies use `has_non_finite` to fall back to the standard library for
+those values, so both backends send the same numbers.
+"""
+
+import math
+
+
+def has_non_finite(obj):
+    """True if the value contains a NaN or infinite float
+
+    Looks into dicts, lists, tuples and the `__dict__` of objects.
+    """
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(has_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(has_non_finite(value) for value in obj)
+    if isinstance(obj, (str, bytes, int)) or not hasattr(obj, "__dict__"):
+        return False
+    return has_non_finite(vars(obj))
@@ -1,5 +1,9 @@
+from calendar import timegm
+from collections import OrderedDict
 from datetime import datetime
 from time import time
+import asyncio
+import hashlib
 import logging
 
 try:
@@ -11,9 +15,149 @@ try:
 except Exception:
     logging.error('Missing libraries:  try  pipenv install "pyjwt[crypto]"')
 
+from styler_rest_framework.config import defaults
+from styler_rest_framework.services.session import get_session
 
-CURRENT_JWKS = None
-EXPIRATION = None
+
+_caches = {}
+
+
+class JWKSCache:
+    """Keeps the public keys of a JWKS endpoint ready to verify tokens
+
+    Certificates are parsed once per refresh and stored by `kid`. Once the
+    keys get close to their expiration they keep being served while a
+    single background task fetches the new ones. Concurrent refreshes are
+    merged into one request.
+
+    Args:
+        url: x509 certificates endpoint
+        fetcher: coroutine function receiving the url and returning
+            a tuple (dict of kid -> PEM certificate, expiration timestamp)
+        refresh_margin: seconds before the expiration to start refreshing
+    """
+
+    def __init__(self, url, fetcher=None, refresh_margin=None):
+        self.url = url
+        self.fetcher = fetcher or fetch_x509
+        if refresh_margin is None:
+            refresh_margin = defaults.JWKS_REFRESH_MARGIN
+        self.refresh_margin = refresh_margin
+        self.expiration = None
+        self._keys = {}
+        self._refreshing = None
+        self._last_refresh = 0
+
+    def is_expired(self):
+        """Returns True if the keys were never loaded or have expired"""
+        return not self.expiration or self.expiration <= time()
+
+    def is_stale(self):
+        """Returns True if the keys should be refreshed"""
+        return self.is_expired() or self.expiration - self.refresh_margin <= time()
+
+    def update(self, certificates, expiration):
+        """Replace the keys with the given x509 certificates"""
+        self._keys = {kid: public_key(x509) for kid, x509 in certificates.items()}
+        self.expiration = expiration
+        self._last_refresh = time()
+
+    def get_key_nowait(self, kid):
+        """Returns the cached public key of `kid` without refreshing"""
+        return self._keys.get(kid)
+
+    async def get_key(self, kid):
+        """Returns the public key of `kid`
+
+        Waits for a refresh only when no key is loaded or `kid` is unknown
+        (key rotation). Stale keys are returned while they are refreshed
+        in the background.
+        """
+        if self.is_expired() or (kid not in self._keys and self._can_force_refresh()):
+            await self.refresh()
+        elif self.is_stale():
+            self._start_refresh()
+        return self._keys.get(kid)
+
+    async def refresh(self):
+        """Fetch the keys, joining a refresh already in progress"""
+        await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self):
+        task = self._refreshing
+        loop = asyncio.get_running_loop()
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = self._refreshing = loop.create_task(self._refresh())
+        return task
+
+    async def _refresh(self):
+        try:
+            certificates, expiration = await self.fetcher(self.url)
+            self.update(certificates, expiration)
+        except Exception as ex:
+            logging.warning(f"Could not refresh JWKS: {str(ex)}")
+
+    def _can_force_refresh(self):
+        return time() - self._last_refresh >= defaults.JWKS_MIN_REFRESH_INTERVAL
+
+
+class TokenCache:
+    """LRU cache of the data of already verified tokens
+
+    Entries are keyed by the SHA-256 digest of the token and expire
+    together with the token (`exp` claim).
+
+    Args:
+        max_size: maximum number of tokens kept
+
+    Attributes:
+        hits: lookups answered from the cache
+        misses: lookups that required a full verification
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or defaults.JWT_CACHE_MAX_SIZE
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, token):
+        """Returns the cached token data or None"""
+        key = _token_key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        data, expiration = entry
+        if expiration <= time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def set(self, token, data):
+        """Store the data of a verified token"""
+        key = _token_key(token)
+        self._entries[key] = (data, data.get('exp', 0))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+def _token_key(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+
+def get_jwks_cache(url):
+    """Returns the shared JWKSCache of the url"""
+    if url not in _caches:
+        _caches[url] = JWKSCache(url)
+    return _caches[url]
 
 
 def retrieve_kid(token):  # pragma: no coverage
@@ -25,9 +169,23 @@ def public_key(x509):  # pragma: no coverage
     return cert_obj.public_key();
 
 
+def parse_expires(expires):
+    """Converts an Expires header to a timestamp"""
+    if not expires:
+        return time() + defaults.JWKS_DEFAULT_MAX_AGE
+    return timegm(datetime.strptime(expires, '%a, %d %b %Y %H:%M:%S GMT').timetuple())
+
+
 def google_x509(url):  # pragma: no coverage
     response = requests.get(url)
-    return response.json(), datetime.strptime(response.headers['Expires'], '%a, %d %b %Y %H:%M:%S GMT')
+    return response.json(), parse_expires(response.headers.get('Expires'))
+
+
+async def fetch_x509(url):  # pragma: no coverage
+    async with get_session().get(url) as response:
+        response.raise_for_status()
+        certificates = await response.json()
+        return certificates, parse_expires(response.headers.get('Expires'))
 
 
 def verify_token(tk_json):  # pragma: no coverage
@@ -38,32 +196,71 @@ def verify_token(tk_json):  # pragma: no coverage
     if tk_json['auth_time'] > time():
         raise ValueError('Invalid authentication time')
 
+
+def decode(token, pub, env):
+    """Verify the token signature and claims with the public key"""
+    data = jwt.decode(
+        token,
+        pub,
+        algorithms=["RS256"],
+        audience=f'facy-{env}',
+        issuer=f'https://securetoken.google.com/facy-{env}',
+        options={'verify_exp': True}
+    )
+    verify_token(data)
+    return data
+
+
 def validate(token, env, jwks_url):  # pragma: no coverage
-    global CURRENT_JWKS
-    global EXPIRATION
+    """Validate the token, refreshing the keys with a blocking request
+
+    Prefer `validate_async` inside the event loop.
+    """
+    cache = get_jwks_cache(jwks_url)
 
     # Verify if the keys have expired
-    if not EXPIRATION or EXPIRATION < datetime.utcnow():
+    if cache.is_expired():
         # Refresh JWKS
-        CURRENT_JWKS, EXPIRATION = google_x509(jwks_url)
+        cache.update(*google_x509(jwks_url))
     try:
         # Retrieve the kid from the token
         kid = retrieve_kid(token)
 
-        # Retrieve the public key from the x509 certificate
-        pub = public_key(CURRENT_JWKS[kid])
+        # Retrieve the already parsed public key
+        pub = cache.get_key_nowait(kid)
 
         # Validate JWT using the public key
+        return decode(token, pub, env)
+    except Exception as ex:
+        logging.warning(str(ex))
+        return None
+
+
+async def validate_async(token, env, jwks_url, cache=None, token_cache=None):
+    """Validate the token without blocking the event loop
 
-        data = jwt.decode(
-            token,
-            pub,
-            algorithms=["RS256"],
-            audience=f'facy-{env}',
-            issuer=f'https://securetoken.google.com/facy-{env}',
-            options={'verify_exp': True}
-        )
-        verify_token(data)
+    Args:
+        token: JWT
+        env: environment used in the audience and issuer
+        jwks_url: x509 certificates endpoint
+        cache: JWKSCache (defaults to the shared cache of jwks_url)
+        token_cache: TokenCache of tokens already verified for this env
+    Returns:
+        The token data or None if the token is invalid
+    """
+    if token_cache is not None:
+        data = token_cache.get(token)
+        if data is not None:
+            return data
+    cache = cache or get_jwks_cache(jwks_url)
+    try:
+        kid = retrieve_kid(token)
+        pub = await cache.get_key(kid)
+        if pub is None:
+            raise ValueError(f'Unknown kid: {kid}')
+        data = decode(token, pub, env)
+        if token_cache is not None:
+            token_cache.set(token, data)
         return data
     except Exception as ex:
         logging.warning(str(ex))
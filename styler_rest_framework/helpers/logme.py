@@ -1,10 +1,14 @@
+from collections import deque
+import asyncio
 import logging
+import weakref
 
 from styler_rest_framework.pubsub.publishers.messages.logme_message import (
     LogMeMessage,
 )
 from styler_rest_framework.pubsub.publishers import publisher_for_message
 from styler_rest_framework.config import defaults
+from styler_rest_framework.metrics import metrics
 
 
 if defaults.ENVIRONMENT in ('staging', 'production'):
@@ -12,3 +16,142 @@ if defaults.ENVIRONMENT in ('staging', 'production'):
 else:
     def logme(*args, **kwargs):
         logging.info(f'Logme called with args: {args}, kwargs: {kwargs}')
+
+
+class LogMeQueue:
+    """Buffers LogMe rows in memory and publishes them in batches
+
+    Rows are appended without blocking. A background task sends them as
+    a single LogMe message whenever `batch_size` rows are waiting or
+    `flush_interval` seconds have passed; the publish itself runs in the
+    default executor. Each event loop putting rows has its own task, so
+    the queue can be shared by the app and e.g. a message router loop.
+
+    Args:
+        dataset: target dataset
+        table: target table
+        max_size: maximum number of rows waiting to be published
+        batch_size: number of rows sent per message
+        flush_interval: maximum seconds a row waits before being sent
+        drop_oldest: when full, discard the oldest row instead of the new one
+
+    Attributes:
+        dropped: rows discarded because the queue was full
+        published: rows handed over to logme
+        failed: rows lost because logme raised an error
+    """
+
+    def __init__(
+        self,
+        dataset,
+        table,
+        max_size=None,
+        batch_size=None,
+        flush_interval=None,
+        drop_oldest=False,
+    ):
+        self.dataset = dataset
+        self.table = table
+        self.max_size = max_size or defaults.LOGME_QUEUE_MAX_SIZE
+        self.batch_size = batch_size or defaults.LOGME_BATCH_SIZE
+        self.flush_interval = flush_interval or defaults.LOGME_FLUSH_INTERVAL
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self.published = 0
+        self.failed = 0
+        self._rows = deque()
+        # Event loop -> (flusher task, wake-up event)
+        self._flushers = weakref.WeakKeyDictionary()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def put(self, row) -> bool:
+        """Enqueue a row without blocking
+
+        Returns False when the row was dropped because the queue is full.
+        """
+        if len(self._rows) >= self.max_size:
+            self.dropped += 1
+            if not self.drop_oldest:
+                return False
+            self._rows.popleft()
+        self._rows.append(row)
+        wakeup = self._ensure_flusher()
+        if wakeup is not None and len(self._rows) >= self.batch_size:
+            wakeup.set()
+        return True
+
+    async def flush(self):
+        """Publish every row waiting in the queue"""
+        loop = asyncio.get_running_loop()
+        while True:
+            rows = self._take(self.batch_size)
+            if not rows:
+                return
+            await loop.run_in_executor(None, self._publish, rows)
+
+    async def close(self, *args):
+        """Stop the background task of the running loop and publish the
+        remaining rows
+
+        Accepts and ignores positional arguments so it can be registered
+        as an application shutdown hook.
+        """
+        task, _ = self._flushers.pop(asyncio.get_running_loop(), (None, None))
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def _ensure_flusher(self):
+        """Returns the wake-up event of the flusher of the running loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop: rows wait for the next flush
+            return None
+        task, wakeup = self._flushers.get(loop, (None, None))
+        if task is None or task.done():
+            self._drop_closed_loops()
+            wakeup = asyncio.Event()
+            self._flushers[loop] = (loop.create_task(self._run(wakeup)), wakeup)
+        return wakeup
+
+    def _drop_closed_loops(self):
+        # The flusher tasks hold their loop, so the weak keys of the
+        # closed loops are never released on their own. Their rows stay in
+        # the queue for the flushers of the other loops.
+        for loop in [loop for loop in self._flushers if loop.is_closed()]:
+            del self._flushers[loop]
+
+    async def _run(self, wakeup):
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            await self.flush()
+
+    def _take(self, count):
+        rows = []
+        while len(rows) < count:
+            try:
+                rows.append(self._rows.popleft())
+            except IndexError:
+                # Emptied by the flusher of another loop
+                break
+        return rows
+
+    def _publish(self, rows):
+        metrics.LOGME_BATCH_SIZE.observe(len(rows))
+        try:
+            logme(self.dataset, self.table, rows)
+            self.published += len(rows)
+        except Exception as ex:
+            self.failed += len(rows)
+            logging.warning(f"Could not log {len(rows)} rows: {str(ex)}")
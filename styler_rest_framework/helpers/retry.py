@@ -0,0 +1,169 @@
+""" Retry policy with exponential back-off and full jitter
+
+Shared by GCSHandler, AsyncGCSHandler and HTTPHandler so that clients of
+a degraded dependency spread their retries over time instead of retrying
+in lockstep:
+
+    policy = RetryPolicy(retry_on=(ServiceUnavailable,), max_elapsed=30)
+    policy.call(blob.download_as_bytes)
+    await policy.call_async(fetch, url)
+"""
+
+from collections import deque
+from threading import Lock
+import asyncio
+import random
+import time
+
+from styler_rest_framework.config import defaults
+
+
+class RetryBudget:
+    """Limits the number of retries in a sliding time window
+
+    When the dependency is failing for every client, the budget runs out
+    and the calls fail at the first error instead of multiplying the load.
+
+    Args:
+        max_retries: retries allowed in the window
+        window: length of the window in seconds
+    """
+
+    def __init__(self, max_retries, window=60):
+        self.max_retries = max_retries
+        self.window = window
+        self._retries = deque()
+        self._lock = Lock()
+
+    def acquire(self):
+        """Take one retry from the budget, returns False when it is spent"""
+        now = time.monotonic()
+        with self._lock:
+            while self._retries and self._retries[0] <= now - self.window:
+                self._retries.popleft()
+            if len(self._retries) >= self.max_retries:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class RetryPolicy:
+    """Exponential back-off with full jitter
+
+    The delay before the retry `n` (starting at 0) is a random value
+    between 0 and `min(max_delay, base_delay * multiplier ** n)`.
+
+    Args:
+        max_retries: retries after the first attempt
+        base_delay: upper bound of the first delay, in seconds
+        max_delay: maximum delay, in seconds
+        multiplier: growth of the delay upper bound
+        max_elapsed: seconds after the first attempt after which no
+            retry is started (None for no limit)
+        retry_on: exception types or a predicate receiving the exception
+        budget: RetryBudget shared by the calls using this policy
+
+    Attributes:
+        attempts: calls to the wrapped function
+        retries: attempts that were retries
+        give_ups: calls that failed after retrying or because the retries
+            were not allowed (elapsed time or budget spent)
+    """
+
+    def __init__(
+        self,
+        max_retries=None,
+        base_delay=None,
+        max_delay=None,
+        multiplier=2,
+        max_elapsed=None,
+        retry_on=(Exception,),
+        budget=None,
+    ):
+        self.max_retries = 3 if max_retries is None else max_retries
+        self.base_delay = defaults.RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = defaults.RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.multiplier = multiplier
+        self.max_elapsed = max_elapsed
+        self.retry_on = retry_on
+        self.budget = budget
+        self.attempts = 0
+        self.retries = 0
+        self.give_ups = 0
+
+    def is_retryable(self, ex):
+        """Returns True if the exception can be retried"""
+        if isinstance(self.retry_on, (type, tuple)):
+            return isinstance(ex, self.retry_on)
+        return self.retry_on(ex)
+
+    def delay(self, retry):
+        """Returns the random delay before the retry number `retry`"""
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** retry)
+        return random.uniform(0, cap)
+
+    def call(
+        self, func, *args, max_retries=None, retry_if=None, deadline=None, **kwargs
+    ):
+        """Call `func`, sleeping between the retries
+
+        Args:
+            func: function to call with the args and kwargs
+            max_retries: overrides the max_retries of the policy
+            retry_if: overrides retry_on with a predicate
+            deadline: `time.monotonic()` after which no retry is started
+        """
+        start = time.monotonic()
+        retry = 0
+        while True:
+            self.attempts += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as ex:
+                delay = self._next_delay(
+                    ex, retry, start, max_retries, retry_if, deadline
+                )
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            retry += 1
+
+    async def call_async(
+        self, func, *args, max_retries=None, retry_if=None, deadline=None, **kwargs
+    ):
+        """Await `func(*args, **kwargs)`, waiting with asyncio.sleep between
+        the retries (see `call`)
+        """
+        start = time.monotonic()
+        retry = 0
+        while True:
+            self.attempts += 1
+            try:
+                return await func(*args, **kwargs)
+            except Exception as ex:
+                delay = self._next_delay(
+                    ex, retry, start, max_retries, retry_if, deadline
+                )
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            retry += 1
+
+    def _next_delay(self, ex, retry, start, max_retries, retry_if, deadline):
+        """Returns the delay before the next retry or None to give up"""
+        retryable = retry_if(ex) if retry_if is not None else self.is_retryable(ex)
+        if not retryable:
+            return None
+        max_retries = self.max_retries if max_retries is None else max_retries
+        delay = self.delay(retry)
+        now = time.monotonic()
+        if (
+            retry >= max_retries
+            or (self.max_elapsed is not None and now - start + delay > self.max_elapsed)
+            or (deadline is not None and now + delay >= deadline)
+            or (self.budget is not None and not self.budget.acquire())
+        ):
+            self.give_ups += 1
+            return None
+        self.retries += 1
+        return delay
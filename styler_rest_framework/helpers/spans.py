@@ -0,0 +1,86 @@
+""" Child spans of the traced requests
+
+    The tracing middlewares keep the tracer of the request in the
+opencensus execution context. `child_span` opens a span under the
+current span of that tracer, and does nothing outside a traced request:
+
+    with child_span("load items") as span:
+        items = load_items()
+        if span is not None:
+            span.add_attribute("items", len(items))
+
+This module only depends on opencensus, so the services and datasources
+can create spans without importing the exporters.
+"""
+
+from contextlib import contextmanager
+
+from opencensus.trace import attributes_helper, execution_context
+from opencensus.trace.span import SpanKind
+from opencensus.trace.span_context import SpanContext
+from opencensus.trace.status import Status
+from opencensus.trace.tracers import context_tracer
+
+
+HTTP_HOST = attributes_helper.COMMON_ATTRIBUTES["HTTP_HOST"]
+HTTP_METHOD = attributes_helper.COMMON_ATTRIBUTES["HTTP_METHOD"]
+HTTP_PATH = attributes_helper.COMMON_ATTRIBUTES["HTTP_PATH"]
+HTTP_ROUTE = attributes_helper.COMMON_ATTRIBUTES["HTTP_ROUTE"]
+HTTP_REQUEST_SIZE = attributes_helper.COMMON_ATTRIBUTES["HTTP_REQUEST_SIZE"]
+HTTP_RESPONSE_SIZE = attributes_helper.COMMON_ATTRIBUTES["HTTP_RESPONSE_SIZE"]
+HTTP_URL = attributes_helper.COMMON_ATTRIBUTES["HTTP_URL"]
+HTTP_STATUS_CODE = attributes_helper.COMMON_ATTRIBUTES["HTTP_STATUS_CODE"]
+ERROR_NAME = attributes_helper.COMMON_ATTRIBUTES["ERROR_NAME"]
+ERROR_MESSAGE = attributes_helper.COMMON_ATTRIBUTES["ERROR_MESSAGE"]
+HTTP_RETRY_COUNT = "http.retry_count"
+
+
+def current_tracer():
+    """Returns the tracer of the request being traced, or None"""
+    tracer = execution_context.get_opencensus_tracer()
+    if not isinstance(getattr(tracer, "tracer", None), context_tracer.ContextTracer):
+        return None
+    if execution_context.get_current_span() is None:
+        # The request span already ended
+        return None
+    return tracer
+
+
+@contextmanager
+def child_span(name, kind=SpanKind.CLIENT):
+    """Open a child span of the current span, yields None when the
+    request is not traced
+
+    The exceptions raised in the block are recorded in the span.
+    """
+    tracer = current_tracer()
+    if tracer is None:
+        yield None
+        return
+    span = tracer.start_span(name)
+    span.span_kind = kind
+    try:
+        yield span
+    except Exception as ex:
+        span.add_attribute(ERROR_NAME, type(ex).__name__)
+        span.add_attribute(ERROR_MESSAGE, str(ex))
+        span.set_status(Status.from_exception(ex))
+        raise
+    finally:
+        tracer.end_span()
+
+
+def propagation_headers(span):
+    """Returns the headers propagating a span of the current tracer to a
+    downstream service, in the format of the tracer (X-Cloud-Trace-Context
+    for the middlewares)
+    """
+    tracer = current_tracer()
+    if tracer is None or span is None:
+        return {}
+    span_context = SpanContext(
+        trace_id=tracer.span_context.trace_id,
+        span_id=span.span_id,
+        trace_options=tracer.span_context.trace_options,
+    )
+    return tracer.propagator.to_headers(span_context)
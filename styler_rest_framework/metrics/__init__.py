@@ -0,0 +1,7 @@
+""" Metrics in the Prometheus text exposition format
+
+    The middlewares are in `metrics.middleware` (aiohttp) and
+`metrics.asgi` (FastAPI), so recording the metrics of the services and
+publishers does not import the web frameworks.
+"""
+from styler_rest_framework.metrics.metrics import Counter, Gauge, Histogram, expose  # NOQA
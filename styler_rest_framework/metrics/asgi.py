@@ -0,0 +1,81 @@
+""" Request metrics of the FastAPI (ASGI) apps
+
+    config_asgi_metrics(app)
+
+records the same metrics as the aiohttp middleware of `config_metrics`
+and serves them on METRICS_PATH.
+"""
+
+from time import monotonic
+
+from starlette.responses import Response
+
+from styler_rest_framework.config import defaults
+from styler_rest_framework.metrics import metrics
+from styler_rest_framework.metrics.middleware import UNMATCHED
+from styler_rest_framework.middlewares.path_matcher import PathMatcher
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording the request metrics
+
+    Args:
+        app: ASGI application
+        excludes: paths not measured (METRICS_PATH by default)
+        excludes_regex: regex of the paths not measured
+    """
+
+    def __init__(self, app, excludes=None, excludes_regex=None):
+        self.app = app
+        if excludes is None:
+            excludes = [defaults.METRICS_PATH]
+        self.excluded = PathMatcher(excludes, excludes_regex)
+        self.in_flight = metrics.REQUESTS_IN_FLIGHT.labels()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.excluded.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        start = monotonic()
+        self.in_flight.inc()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            self.in_flight.dec()
+            route = scope.get("route")
+            if route is not None:
+                route = getattr(route, "path_format", None) or route.path
+            metrics.REQUEST_DURATION.labels(
+                scope["method"], route or UNMATCHED, status
+            ).observe(monotonic() - start)
+
+
+async def metrics_endpoint(request):
+    """Serves the metrics in the text exposition format"""
+    return Response(metrics.expose(), media_type=metrics.CONTENT_TYPE)
+
+
+def config_asgi_metrics(app, expose=True, path=None, excludes=None, excludes_regex=None):
+    """Record the request metrics of a FastAPI app
+
+    Args:
+        app: FastAPI app
+        expose: serve the metrics on `path`
+        path: path of the metrics endpoint (METRICS_PATH)
+        excludes: paths not measured (the metrics endpoint by default)
+        excludes_regex: regex of the paths not measured
+    """
+    path = path or defaults.METRICS_PATH
+    if excludes is None:
+        excludes = [path]
+    app.add_middleware(MetricsMiddleware, excludes=excludes, excludes_regex=excludes_regex)
+    if expose:
+        app.add_route(path, metrics_endpoint, include_in_schema=False)
@@ -0,0 +1,294 @@
+""" Metrics of the framework in the Prometheus text exposition format
+
+    Counters, gauges and histograms keep one value per label set. The
+value of a label set is bound once with `labels()` and can be kept by
+the caller, so recording is an attribute update:
+
+    REQUESTS = Counter("requests_total", "Requests", ["route"])
+    items_requests = REQUESTS.labels("/items")
+    items_requests.inc()
+
+The updates are not locked. On the event loop they are exact; from
+several threads an update may rarely be lost, which is acceptable for
+monitoring and keeps the recording cost negligible.
+
+The metrics recorded by the framework are defined at the end of this
+module and `expose()` returns all of them as text.
+"""
+
+from bisect import bisect_left
+import math
+
+from styler_rest_framework.config import defaults
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metrics = []
+_collectors = []
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # Not cumulative, the last count is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    """Base of the metrics: the values of the label sets
+
+    Args:
+        name: metric name
+        documentation: help text
+        labelnames: names of the labels
+        register: add the metric to the ones returned by `expose()`
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), register=True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        if register:
+            _metrics.append(self)
+
+    def labels(self, *values):
+        """Returns the value of a label set, created on the first call
+
+        The label values are exposed with `str()`; a label must always be
+        given with the same type (e.g. the status as an int).
+        """
+        value = self._values.get(values)
+        if value is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            # setdefault keeps the value created first by a concurrent call
+            value = self._values.setdefault(values, self._new_value())
+        return value
+
+    def clear(self):
+        """Forget the values of all the label sets"""
+        self._values.clear()
+
+    def expose(self):
+        """Returns the metric in the text exposition format"""
+        lines = [
+            f"# HELP {self.name} {_escape_help(self.documentation)}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for values, value in list(self._values.items()):
+            lines.extend(self._samples(_labels(self.labelnames, values), value))
+        return "\n".join(lines)
+
+    def _new_value(self):
+        raise NotImplementedError()
+
+    def _samples(self, labels, value):
+        return [f"{self.name}{_braces(labels)} {_number(value.value)}"]
+
+
+class Counter(Metric):
+    """Value that only goes up"""
+
+    type = "counter"
+
+    def inc(self, amount=1):
+        """Increment the counter without labels"""
+        self.labels().inc(amount)
+
+    def _new_value(self):
+        return _CounterValue()
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+
+    type = "gauge"
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def _new_value(self):
+        return _GaugeValue()
+
+
+class Histogram(Metric):
+    """Distribution of the observed values in buckets
+
+    Args:
+        buckets: upper bounds of the buckets (METRICS_BUCKETS)
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=None, register=True):
+        self.buckets = tuple(sorted(buckets or defaults.METRICS_BUCKETS))
+        super().__init__(name, documentation, labelnames, register)
+
+    def observe(self, value):
+        """Observe a value without labels"""
+        self.labels().observe(value)
+
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+
+    def _samples(self, labels, value):
+        samples = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), list(value.counts)):
+            cumulative += count
+            bucket_labels = [*labels, f'le="{_number(bound)}"']
+            samples.append(f"{self.name}_bucket{_braces(bucket_labels)} {cumulative}")
+        samples.append(f"{self.name}_sum{_braces(labels)} {_number(value.sum)}")
+        samples.append(f"{self.name}_count{_braces(labels)} {cumulative}")
+        return samples
+
+
+def add_collector(collector):
+    """Register a function returning metrics built when they are exposed"""
+    _collectors.append(collector)
+
+
+def expose():
+    """Returns the registered metrics in the text exposition format"""
+    metrics = list(_metrics)
+    for collector in _collectors:
+        metrics.extend(collector())
+    return "".join(f"{metric.expose()}\n" for metric in metrics)
+
+
+def reset():
+    """Forget the values of the registered metrics"""
+    for metric in _metrics:
+        metric.clear()
+
+
+def _labels(names, values):
+    return [f'{name}="{_escape_label(str(value))}"' for name, value in zip(names, values)]
+
+
+def _braces(labels):
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+# Metrics recorded by the framework
+
+REQUEST_DURATION = Histogram(
+    "http_server_request_duration_seconds",
+    "Duration of the requests handled by the app",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_server_requests_in_flight",
+    "Requests being handled by the app",
+)
+CLIENT_DURATION = Histogram(
+    "http_client_request_duration_seconds",
+    "Duration of the HTTPHandler requests, per attempt",
+    ["method", "host", "status"],
+)
+CLIENT_RETRIES = Counter(
+    "http_client_retries_total",
+    "Attempts of the HTTPHandler requests after the first one",
+    ["host"],
+)
+PUBSUB_PUBLISH_DURATION = Histogram(
+    "pubsub_publish_duration_seconds",
+    "Time from publishing a Pub/Sub message to its acknowledgement",
+    ["topic", "result"],
+)
+LOGME_BATCH_SIZE = Histogram(
+    "logme_batch_rows",
+    "Rows per LogMe message published by LogMeQueue",
+    buckets=[1, 5, 10, 50, 100, 250, 500, 1000, 5000],
+)
+DB_SESSION_DURATION = Histogram(
+    "db_session_duration_seconds",
+    "Time from opening a SQLAlchemy session to closing it",
+)
+
+
+def circuit_breaker_metrics():
+    """Returns the metrics of the circuit breakers of the hosts"""
+    # Imported here, the services record their metrics with this module
+    from styler_rest_framework.services import circuit_breaker as breakers
+
+    states = {breakers.CLOSED: 0, breakers.HALF_OPEN: 1, breakers.OPEN: 2}
+    state = Gauge(
+        "http_client_circuit_state",
+        "State of the circuit breaker (0 closed, 1 half-open, 2 open)",
+        ["host"],
+        register=False,
+    )
+    opened = Counter(
+        "http_client_circuit_opened_total",
+        "Times the circuit breaker was opened",
+        ["host"],
+        register=False,
+    )
+    rejected = Counter(
+        "http_client_circuit_rejected_total",
+        "Requests refused while the circuit breaker was open",
+        ["host"],
+        register=False,
+    )
+    for host, breaker in list(breakers._breakers.items()):
+        state.labels(host).set(states[breaker.state])
+        opened.labels(host).inc(breaker.opened)
+        rejected.labels(host).inc(breaker.rejected)
+    return [state, opened, rejected]
+
+
+add_collector(circuit_breaker_metrics)
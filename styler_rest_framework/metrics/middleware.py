@@ -0,0 +1,83 @@
+""" Request metrics of the aiohttp apps
+
+    config_metrics(app)
+
+records the duration of the requests by method, route template and
+status, and the requests in flight, and serves the metrics on
+METRICS_PATH.
+"""
+
+from time import monotonic
+
+from aiohttp import web
+
+from styler_rest_framework.config import defaults
+from styler_rest_framework.metrics import metrics
+from styler_rest_framework.middlewares.path_matcher import PathMatcher
+
+
+# Route label of the requests matching no route, instead of their path
+UNMATCHED = "unmatched"
+
+
+def metrics_middleware(excludes=None, excludes_regex=None):
+    """Returns an aiohttp middleware recording the request metrics
+
+    Args:
+        excludes: paths not measured (METRICS_PATH by default)
+        excludes_regex: regex of the paths not measured
+    """
+    if excludes is None:
+        excludes = [defaults.METRICS_PATH]
+    excluded = PathMatcher(excludes, excludes_regex)
+    in_flight = metrics.REQUESTS_IN_FLIGHT.labels()
+
+    @web.middleware
+    async def middleware(request, handler):
+        if excluded.match(request.path):
+            return await handler(request)
+        start = monotonic()
+        in_flight.inc()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as ex:
+            status = ex.status
+            raise
+        finally:
+            in_flight.dec()
+            resource = request.match_info.route.resource
+            route = resource.canonical if resource is not None else UNMATCHED
+            metrics.REQUEST_DURATION.labels(request.method, route, status).observe(
+                monotonic() - start
+            )
+
+    return middleware
+
+
+async def metrics_handler(request):
+    """Serves the metrics in the text exposition format"""
+    return web.Response(
+        body=metrics.expose().encode("utf-8"),
+        headers={"Content-Type": metrics.CONTENT_TYPE},
+    )
+
+
+def config_metrics(app, expose=True, path=None, excludes=None, excludes_regex=None):
+    """Record the request metrics of an aiohttp app
+
+    Args:
+        app: aiohttp app
+        expose: serve the metrics on `path`
+        path: path of the metrics endpoint (METRICS_PATH)
+        excludes: paths not measured (the metrics endpoint by default)
+        excludes_regex: regex of the paths not measured
+    """
+    path = path or defaults.METRICS_PATH
+    if excludes is None:
+        excludes = [path]
+    app.middlewares.append(metrics_middleware(excludes, excludes_regex))
+    if expose:
+        app.router.add_get(path, metrics_handler)
@@ -1,10 +1,11 @@
 """ Middleware to handle exceptions
 """
 from typing import List
-import re
 
 from aiohttp import web
-from styler_rest_framework.helpers.jwt_validator import validate
+from styler_rest_framework.api.request_scope import IDENTITY_KEY, verified_identity
+from styler_rest_framework.helpers.jwt_validator import TokenCache, validate_async
+from styler_rest_framework.middlewares.path_matcher import PathMatcher
 from styler_rest_framework.config import defaults
 
 
@@ -14,35 +15,47 @@ def add_auth_middleware(
     jwks_url: str = None,
     excludes: List[str] = None,
     excludes_regex: List[str] = None,
+    token_cache_size: int = None,
 ):
+    """Validate the JWT of every request not excluded
+
+    The data of the verified token is stored in `request["jwt_data"]` and
+    its RequestScope in `request["identity"]`.
+    Verified tokens are kept in an LRU cache of `token_cache_size`
+    entries until they expire; exposed as `middleware.token_cache`.
+    """
     if not jwks_url:  # pragma: no coverage
         jwks_url = defaults.JWKS_URL
+    token_cache = TokenCache(token_cache_size)
+    excluded = PathMatcher(excludes, excludes_regex)
 
     @web.middleware
     async def middleware(request, handler):
         try:
-            paths = [] if excludes is None else excludes
-            regex_paths = [] if excludes_regex is None else excludes_regex
-            if request.path in paths:
+            if excluded.match(request.path):
                 return await handler(request)
-            for regex_path in regex_paths:
-                if re.match(regex_path, request.path):
-                    return await handler(request)
             jwt_token = request.headers.get('AUTHORIZATION')
             if not jwt_token:
                 return web.json_response(
                     {'error': 'Missing JWT token'},
                     status=401
                 )
-            jwt_data = validate(jwt_token.split()[-1], env, jwks_url)
+            jwt_data = await validate_async(
+                jwt_token.split()[-1], env, jwks_url, token_cache=token_cache
+            )
             if not jwt_data:
                 return web.json_response(
                     {'error': 'Invalid JWT token'},
                     status=401
                 )
+            request['jwt_data'] = jwt_data
+            identity = verified_identity(request.headers, jwt_data)
+            if identity is not None:
+                request[IDENTITY_KEY] = identity
             return await handler(request)
         except web.HTTPException:
             raise
 
+    middleware.token_cache = token_cache
     app.middlewares.append(middleware)
     return middleware
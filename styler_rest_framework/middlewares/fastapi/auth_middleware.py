@@ -2,7 +2,6 @@
 """
 from typing import List
 import logging
-import re
 
 try:
     from fastapi import FastAPI, Request, HTTPException
@@ -10,7 +9,9 @@ try:
 except Exception:
     logging.exception(f'Missing libraries: pipenv install fastapi')
 
-from styler_rest_framework.helpers.jwt_validator import validate
+from styler_rest_framework.api.request_scope import IDENTITY_KEY, verified_identity
+from styler_rest_framework.helpers.jwt_validator import TokenCache, validate_async
+from styler_rest_framework.middlewares.path_matcher import PathMatcher
 from styler_rest_framework.config import defaults
 
 
@@ -20,27 +21,110 @@ def add_auth_middleware(
     jwks_url: str = None,
     excludes: List[str] = None,
     excludes_regex: List[str] = None,
+    token_cache_size: int = None,
+    asgi: bool = False,
 ):
+    """Validate the JWT of every request not excluded
+
+    The data of the verified token is stored in `request.state.jwt_data` and
+    its RequestScope in `request.state.identity`.
+    Verified tokens are kept in an LRU cache of `token_cache_size`
+    entries until they expire; the cache is returned.
+
+    With `asgi=True` the pure ASGI AuthMiddleware is installed instead of
+    an `@app.middleware("http")` function, avoiding the overhead of
+    BaseHTTPMiddleware and keeping streaming responses intact.
+    """
     if not jwks_url:  # pragma: no coverage
         jwks_url = defaults.JWKS_URL
+    token_cache = TokenCache(token_cache_size)
+    if asgi:
+        app.add_middleware(
+            AuthMiddleware,
+            env=env,
+            jwks_url=jwks_url,
+            excludes=excludes,
+            excludes_regex=excludes_regex,
+            token_cache=token_cache,
+        )
+        return token_cache
+    excluded = PathMatcher(excludes, excludes_regex)
 
     @app.middleware("http")
     async def validate_jwt(request: Request, call_next):
         try:
-            paths = [] if excludes is None else excludes
-            regex_paths = [] if excludes_regex is None else excludes_regex
-            if request.url.path in paths:
+            if excluded.match(request.url.path):
                 return await call_next(request)
-            for regex_path in regex_paths:
-                if re.match(regex_path, request.url.path):
-                    return await call_next(request)
             jwt_token = request.headers.get('Authorization')
             if not jwt_token:
                 return JSONResponse(status_code=401, content={'error': 'Missing JWT token'})
-            jwt_data = validate(jwt_token.split()[-1], env, jwks_url)
+            jwt_data = await validate_async(
+                jwt_token.split()[-1], env, jwks_url, token_cache=token_cache
+            )
             if not jwt_data:
                 return JSONResponse(status_code=401, content={'error': 'Invalid JWT token'})
+            request.state.jwt_data = jwt_data
+            identity = verified_identity(request.headers, jwt_data)
+            if identity is not None:
+                setattr(request.state, IDENTITY_KEY, identity)
 
             return await call_next(request)
         except HTTPException:  # pragma: no coverage
             raise
+
+    return token_cache
+
+
+class AuthMiddleware:
+    """Pure ASGI middleware validating the JWT of every request not excluded
+
+    Same behavior as the middleware installed by `add_auth_middleware`.
+    Install it with `app.add_middleware(AuthMiddleware, env=...)`.
+
+    Args:
+        app: ASGI application
+        env: environment used in the audience and issuer
+        jwks_url: x509 certificates endpoint
+        excludes: paths without authentication
+        excludes_regex: patterns of paths without authentication
+        token_cache: TokenCache of verified tokens
+    """
+
+    def __init__(
+        self,
+        app,
+        env: str,
+        jwks_url: str = None,
+        excludes: List[str] = None,
+        excludes_regex: List[str] = None,
+        token_cache: TokenCache = None,
+    ):
+        self.app = app
+        self.env = env
+        self.jwks_url = jwks_url or defaults.JWKS_URL
+        self.excluded = PathMatcher(excludes, excludes_regex)
+        self.token_cache = token_cache or TokenCache()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.excluded.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        jwt_token = request.headers.get('Authorization')
+        if not jwt_token:
+            response = JSONResponse(status_code=401, content={'error': 'Missing JWT token'})
+            await response(scope, receive, send)
+            return
+        jwt_data = await validate_async(
+            jwt_token.split()[-1], self.env, self.jwks_url, token_cache=self.token_cache
+        )
+        if not jwt_data:
+            response = JSONResponse(status_code=401, content={'error': 'Invalid JWT token'})
+            await response(scope, receive, send)
+            return
+        # The state is kept in the scope, shared with the endpoint request
+        request.state.jwt_data = jwt_data
+        identity = verified_identity(request.headers, jwt_data)
+        if identity is not None:
+            setattr(request.state, IDENTITY_KEY, identity)
+        await self.app(scope, receive, send)
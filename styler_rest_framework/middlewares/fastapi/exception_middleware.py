@@ -11,6 +11,7 @@ def add_exception_middleware(
     generic_message="An error has occurred",
     status_code=500,
     error_handler=None,
+    asgi=False,
 ):
     """Generate a middleware that logs unexpected exceptions
     and returns a JSON response.
@@ -22,7 +23,17 @@ def add_exception_middleware(
         generic_message: The message that will be send as an error
         status_code: The HTTP status code (default = 500)
         error_handler: Callable(request, exception)
+        asgi: install the pure ASGI ExceptionMiddleware instead of an
+            `@app.middleware("http")` function
     """
+    if asgi:
+        app.add_middleware(
+            ExceptionMiddleware,
+            generic_message=generic_message,
+            status_code=status_code,
+            error_handler=error_handler,
+        )
+        return
 
     @app.middleware("http")
     async def handle_exception(request: Request, call_next):
@@ -40,3 +51,61 @@ def add_exception_middleware(
                 status_code=status_code,
                 content={"error": generic_message},
             )
+
+
+class ExceptionMiddleware:
+    """Pure ASGI middleware that logs unexpected exceptions
+    and returns a JSON response.
+
+    Same behavior as the middleware installed by `add_exception_middleware`.
+    When the response has already started the exception is logged and
+    raised again, as the JSON response can no longer be sent.
+
+    Args:
+        app: ASGI application
+        generic_message: The message that will be send as an error
+        status_code: The HTTP status code (default = 500)
+        error_handler: Callable(request, exception)
+    """
+
+    def __init__(
+        self,
+        app,
+        generic_message="An error has occurred",
+        status_code=500,
+        error_handler=None,
+    ):
+        self.app = app
+        self.generic_message = generic_message
+        self.status_code = status_code
+        self.error_handler = error_handler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except HTTPException:
+            raise
+        except Exception as ex:
+            message = str(ex)
+            if self.error_handler:
+                self.error_handler(Request(scope), ex)
+            logging.exception("Error: %s", message)
+            if response_started:
+                raise
+            response = JSONResponse(
+                status_code=self.status_code,
+                content={"error": self.generic_message},
+            )
+            await response(scope, receive, send)
@@ -0,0 +1,55 @@
+""" Route exclusion matcher shared by the middlewares
+"""
+from typing import Iterable
+import re
+
+
+# Numbered back references would point to another pattern once combined
+_BACKREFERENCE = re.compile(r"\\[1-9]")
+# Global inline flags would apply to every pattern once combined (Python
+# before 3.11 only warns about them when they are not at the start)
+_INLINE_FLAGS = re.compile(r"\(\?[aiLmsux]+[):-]")
+
+
+class PathMatcher:
+    """Matches request paths against exact paths and regex patterns
+
+    Everything is compiled once: exact paths go into a set and the
+    patterns are joined into a single regex, so each lookup costs one
+    set lookup and one regex match.
+
+    Patterns keep the `re.match` semantics (anchored at the start of the
+    path). Patterns that cannot be combined (e.g. inline flags, numbered
+    back references or repeated group names) are matched one by one
+    after the combined regex.
+
+    Args:
+        paths: exact paths
+        patterns: regex patterns
+    """
+
+    __slots__ = ("paths", "_regex", "_fallback")
+
+    def __init__(self, paths: Iterable[str] = None, patterns: Iterable[str] = None):
+        self.paths = frozenset(paths or ())
+        patterns = list(patterns or ())
+        self._regex = None
+        self._fallback = ()
+        if not patterns:
+            return
+        separate = [p for p in patterns if _BACKREFERENCE.search(p) or _INLINE_FLAGS.search(p)]
+        combined = [p for p in patterns if p not in separate]
+        if combined:
+            try:
+                self._regex = re.compile("|".join(f"(?:{p})" for p in combined))
+            except re.error:
+                separate = patterns
+        self._fallback = tuple(re.compile(p) for p in separate)
+
+    def match(self, path: str) -> bool:
+        """Returns True if the path is excluded"""
+        if path in self.paths:
+            return True
+        if self._regex is not None and self._regex.match(path) is not None:
+            return True
+        return any(regex.match(path) for regex in self._fallback)
@@ -1,12 +1,17 @@
 """ Message handling module
 """
 
+from concurrent import futures
 from typing import Any, Callable, Dict
-import json
+import asyncio
 import logging
+import threading
+
+from google.cloud import pubsub_v1
 
 from styler_rest_framework.logging import error_reporting
 from styler_rest_framework.config import defaults
+from styler_rest_framework.pubsub.publishers.messages import decompress, loads
 
 
 class MessageRouter:
@@ -30,7 +35,8 @@ class MessageRouter:
         logging.info("Received message: %s", message)
 
         try:
-            body = self._validate_envelope(message.data)
+            data = decompress(message.data, message.attributes)
+            body = self._validate_envelope(data)
 
             message_name = body["name"]
             if message_name in self._routes:
@@ -63,7 +69,176 @@ class MessageRouter:
         Returns:
             The JSON parsed body data
         """
-        body = json.loads(data)
+        body = loads(data)
         if "name" not in body or "arg" not in body:
             raise KeyError("Missing name or arg in the message body")
         return body
+
+
+class AsyncMessageRouter(MessageRouter):
+    """Routes the incoming messages to coroutine handlers
+
+    `handle_message` only schedules the message on the event loop of the
+    router, run by a dedicated thread, and returns, so the subscriber
+    threads are not held while the handlers run. At most
+    `max_concurrency` messages of a route are handled at the same time;
+    the others wait for their turn.
+
+    Each message is acked when its handler succeeds and nacked, for an
+    immediate redelivery, when the handler or the envelope fails.
+    Handlers that are not coroutine functions run in the default
+    executor of the loop.
+
+        router = AsyncMessageRouter()
+        router.add_route("shop_created", on_shop_created, max_concurrency=20)
+        streaming_pull = router.subscribe(subscription_path)
+
+    Args:
+        error_handler: called when a message fails
+        max_concurrency: messages handled at the same time per route
+            (PUBSUB_ROUTE_CONCURRENCY)
+
+    Attributes:
+        acked: messages acked
+        nacked: messages nacked
+    """
+
+    def __init__(self, error_handler=None, max_concurrency=None):
+        super().__init__(error_handler)
+        self.max_concurrency = max_concurrency or defaults.PUBSUB_ROUTE_CONCURRENCY
+        self.acked = 0
+        self.nacked = 0
+        self._limits = {}
+        self._semaphores = {}
+        self._pending = set()
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add_route(
+        self,
+        message_name: str,
+        message_handler: Callable[[Any], Any],
+        max_concurrency: int = None,
+    ) -> None:
+        """Register a message route
+
+        Args:
+            message_name: expected message name.
+            message_handler: coroutine function (or function) that
+                receives the args of the message.
+            max_concurrency: messages of the route handled at the same
+                time (the router max_concurrency by default)
+        """
+        super().add_route(message_name, message_handler)
+        self._limits[message_name] = max_concurrency or self.max_concurrency
+
+    def flow_control(self, **kwargs):
+        """Returns the FlowControl of a subscriber feeding the router
+
+        The subscriber leases at most as many messages as the routes can
+        handle at the same time, so the messages do not wait in memory
+        while their lease runs.
+
+        Args:
+            kwargs: other FlowControl settings (e.g. max_bytes)
+        """
+        max_messages = sum(self._limits.values()) or self.max_concurrency
+        return pubsub_v1.types.FlowControl(max_messages=max_messages, **kwargs)
+
+    def subscribe(self, subscription, subscriber=None, flow_control=None):
+        """Handle the messages of a subscription
+
+        Args:
+            subscription: full subscription path
+            subscriber: SubscriberClient (one is created otherwise)
+            flow_control: FlowControl (`self.flow_control()` by default)
+        Returns:
+            The StreamingPullFuture of the subscription
+        """
+        subscriber = subscriber or pubsub_v1.SubscriberClient()
+        self.start()
+        return subscriber.subscribe(
+            subscription,
+            callback=self.handle_message,
+            flow_control=flow_control or self.flow_control(),
+        )
+
+    def start(self):
+        """Start the event loop of the router, returns the loop"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="message-router", daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def stop(self, timeout=None) -> bool:
+        """Wait for the messages being handled and stop the event loop
+
+        Args:
+            timeout: maximum seconds to wait for the messages
+        Returns:
+            True if every message was handled before the timeout
+        """
+        _, not_done = futures.wait(list(self._pending), timeout=timeout)
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        self._semaphores.clear()
+        return not not_done
+
+    def handle_message(self, message: Any) -> futures.Future:
+        """Schedule the message on the event loop of the router
+
+        Args:
+            message: message received from pull
+        Returns:
+            The future of the handling of the message
+        """
+        logging.info("Received message: %s", message)
+        future = asyncio.run_coroutine_threadsafe(self.process(message), self.start())
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return future
+
+    async def process(self, message: Any) -> None:
+        """Route the message to its handler, then ack or nack it"""
+        try:
+            data = decompress(message.data, message.attributes)
+            body = self._validate_envelope(data)
+
+            message_name = body["name"]
+            if message_name in self._routes:
+                async with self._semaphore(message_name):
+                    await self._call(self._routes[message_name], body["arg"])
+            else:
+                logging.info("Unknown message name: %s", message_name)
+        except Exception:
+            if self.error_handler:
+                self.error_handler()
+            logging.exception("Error when handling the message")
+            message.nack()
+            self.nacked += 1
+            return
+        message.ack()
+        self.acked += 1
+
+    def _semaphore(self, message_name):
+        semaphore = self._semaphores.get(message_name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._limits[message_name])
+            self._semaphores[message_name] = semaphore
+        return semaphore
+
+    @staticmethod
+    async def _call(handler, arg):
+        if asyncio.iscoroutinefunction(handler):
+            return await handler(arg)
+        return await asyncio.get_running_loop().run_in_executor(None, handler, arg)
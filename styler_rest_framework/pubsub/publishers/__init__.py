@@ -1,14 +1,35 @@
 """ Publishing module
 """
 
-from styler_rest_framework.pubsub.publishers.pubsub_handler import publish_message
+from styler_rest_framework.pubsub.publishers.pubsub_handler import (
+    publish_message,
+    publish_message_async,
+)
 
 
-def publisher_for_message(message_type, topic):
-    """Returns a callable to handle publishing a message"""
+def publisher_for_message(message_type, topic, wait=True, compress=False):
+    """Returns a callable to handle publishing a message
+
+    Args:
+        message_type: Message subclass
+        topic: full topic path
+        wait: block until each message is sent. When False the callable
+            returns the publish future and the message is sent with its batch.
+        compress: gzip the encoded messages
+    """
 
     def wrapper(*args, **kwargs):
         msg = message_type(*args, **kwargs)
-        publish_message(topic, msg.encoded())
+        return publish_message(topic, msg.encoded(), wait=wait, compress=compress)
+
+    return wrapper
+
+
+def async_publisher_for_message(message_type, topic, compress=False):
+    """Returns a coroutine function to handle publishing a message"""
+
+    async def wrapper(*args, **kwargs):
+        msg = message_type(*args, **kwargs)
+        return await publish_message_async(topic, msg.encoded(), compress=compress)
 
     return wrapper
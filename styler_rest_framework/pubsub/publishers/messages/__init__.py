@@ -1,13 +1,94 @@
 """ Handles creation of messages
 """
 
+from datetime import date, time
+from uuid import UUID
+import gzip
 import json
 
+from styler_rest_framework.config import defaults
+from styler_rest_framework.helpers.json_values import has_non_finite
+
+try:
+    import orjson
+except ImportError:  # pragma: no coverage
+    orjson = None
+
+
+CONTENT_ENCODING = "content_encoding"
+GZIP = "gzip"
+
+if orjson is not None:
+    # Dates and dataclasses go through `_default`, as with the standard library
+    _ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
 
 class Message:
     """Base message"""
 
     def encoded(self):
         """Return a encoded data for pub sub"""
-        json_string = json.dumps(self, default=lambda o: o.__dict__, indent=4)
-        return json_string.encode("utf-8")
+        return dumps(self.__dict__)
+
+
+def dumps(obj) -> bytes:
+    """Serialize to compact UTF-8 JSON
+
+    Uses orjson when it is installed (unless PUBSUB_JSON_BACKEND is "json")
+    and falls back to the standard library for the values orjson rejects
+    or would change (NaN and Infinity, written as null by orjson). Both
+    backends encode the same values; only the spelling of some floats
+    differs (1e16 and 1e+16).
+    """
+    if orjson is not None and defaults.PUBSUB_JSON_BACKEND != "json":
+        try:
+            data = orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+        else:
+            if b"null" not in data or not has_non_finite(obj):
+                return data
+    json_string = json.dumps(
+        obj, default=_default, separators=(",", ":"), ensure_ascii=False
+    )
+    return json_string.encode("utf-8")
+
+
+def loads(data):
+    """Parse JSON from bytes or str
+
+    Uses orjson when it is installed (unless PUBSUB_JSON_BACKEND is "json")
+    and falls back to the standard library for the documents orjson
+    rejects, so the same messages are accepted with both backends.
+    """
+    if orjson is not None and defaults.PUBSUB_JSON_BACKEND != "json":
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # e.g. NaN: let the standard library accept it or raise its error
+            pass
+    return json.loads(data)
+
+
+def compress(data: bytes) -> bytes:
+    """Gzip an encoded message"""
+    return gzip.compress(data)
+
+
+def decompress(data: bytes, attributes=None) -> bytes:
+    """Reverse `compress` when the message attributes flag gzip content"""
+    if attributes and attributes.get(CONTENT_ENCODING) == GZIP:
+        return gzip.decompress(data)
+    return data
+
+
+def _default(obj):
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    if isinstance(obj, UUID):
+        return str(obj)
+    return obj.__dict__
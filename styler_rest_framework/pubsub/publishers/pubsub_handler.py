@@ -1,9 +1,25 @@
 """ Handler for pubsub
 """
 from concurrent import futures
+from time import monotonic
+import asyncio
 import logging
+import threading
 
 from google.cloud import pubsub_v1
+from styler_rest_framework.config import defaults
+from styler_rest_framework.metrics import metrics
+from styler_rest_framework.pubsub.publishers.messages import (
+    CONTENT_ENCODING,
+    GZIP,
+    compress as gzip_compress,
+)
+
+
+_publishers = {}
+_batch_settings = {}
+_pending = set()
+_lock = threading.Lock()
 
 
 def get_callback(data):
@@ -23,14 +39,124 @@ def get_callback(data):
     return callback
 
 
-def publish_message(topic_name, data):  # pragma: no coverage
-    """Publishes a message to a Pub/Sub topic."""
-    # Initialize a Publisher client.
-    client = pubsub_v1.PublisherClient()
+def get_latency_callback(topic_name):
+    """Records the time from the publish call to the acknowledgement"""
+    topic = topic_name.rsplit("/", 1)[-1]
+    start = monotonic()
+
+    def callback(api_future):
+        result = "error" if api_future.exception() else "ok"
+        metrics.PUBSUB_PUBLISH_DURATION.labels(topic, result).observe(monotonic() - start)
+
+    return callback
+
+
+def configure_batching(
+    topic_name, max_messages=None, max_bytes=None, max_latency=None
+):
+    """Set the batch settings used by the publisher of a topic
+
+    Must be called before the first message is published to the topic.
+
+    Args:
+        topic_name: full topic path
+        max_messages: maximum number of messages per batch
+        max_bytes: maximum size of a batch in bytes
+        max_latency: maximum seconds a message waits for its batch
+    """
+    _batch_settings[topic_name] = pubsub_v1.types.BatchSettings(
+        max_messages=max_messages or defaults.PUBSUB_BATCH_MAX_MESSAGES,
+        max_bytes=max_bytes or defaults.PUBSUB_BATCH_MAX_BYTES,
+        max_latency=max_latency or defaults.PUBSUB_BATCH_MAX_LATENCY,
+    )
+
+
+def get_publisher(topic_name):
+    """Returns the shared publisher client of a topic"""
+    client = _publishers.get(topic_name)
+    if client is None:
+        with _lock:
+            client = _publishers.get(topic_name)
+            if client is None:
+                if topic_name not in _batch_settings:
+                    configure_batching(topic_name)
+                client = pubsub_v1.PublisherClient(
+                    batch_settings=_batch_settings[topic_name]
+                )
+                _publishers[topic_name] = client
+    return client
+
+
+def publish_message(topic_name, data, wait=True, compress=False):
+    """Publishes a message to a Pub/Sub topic.
+
+    Args:
+        topic_name: full topic path
+        data: encoded message
+        wait: block until the message is sent. When False the message is
+            queued in the current batch and the future is returned.
+        compress: gzip the data and flag it in the message attributes
+    Returns:
+        The publish future
+    """
     metadata = {"version": "1"}
+    if compress:
+        data = gzip_compress(data)
+        metadata[CONTENT_ENCODING] = GZIP
 
     # When you publish a message, the client returns a future.
-    api_future = client.publish(topic_name, data=data, **metadata)
+    latency_callback = get_latency_callback(topic_name)
+    api_future = get_publisher(topic_name).publish(topic_name, data=data, **metadata)
+    api_future.add_done_callback(latency_callback)
     api_future.add_done_callback(get_callback(data))
+    _pending.add(api_future)
+    api_future.add_done_callback(_pending.discard)
+
+    if wait:
+        futures.wait([api_future], return_when=futures.ALL_COMPLETED)
+    return api_future
+
+
+async def publish_message_async(topic_name, data, compress=False):
+    """Publishes a message and awaits the result without blocking the loop
+
+    Returns:
+        The message id
+    """
+    api_future = publish_message(topic_name, data, wait=False, compress=compress)
+    return await asyncio.wrap_future(api_future)
+
+
+def flush(timeout=None):
+    """Wait for every message published so far to be sent
+
+    Args:
+        timeout: maximum seconds to wait
+    Returns:
+        True if every message was sent before the timeout
+    """
+    _, not_done = futures.wait(
+        list(_pending), timeout=timeout, return_when=futures.ALL_COMPLETED
+    )
+    return not not_done
+
+
+def shutdown():
+    """Send the pending batches and stop every publisher client"""
+    with _lock:
+        clients = list(_publishers.values())
+        _publishers.clear()
+    for client in clients:
+        try:
+            client.stop()
+        except Exception:
+            logging.exception("Could not stop the publisher client")
+
+
+async def close(*args):
+    """Shutdown hook: stops the publishers without blocking the loop
 
-    futures.wait([api_future], return_when=futures.ALL_COMPLETED)
+    Accepts and ignores positional arguments so it can be registered
+    both as an aiohttp signal and as a FastAPI event handler.
+    """
+    await asyncio.get_running_loop().run_in_executor(None, shutdown)
@@ -1,14 +1,20 @@
 """ Services module
 """
 
-from time import time
+from time import monotonic, time
+import asyncio
 import json
 import logging
+import re
+
+from aiohttp import ClientError, ClientTimeout, ContentTypeError
+from yarl import URL
 
-from aiohttp import ClientSession
 from styler_rest_framework.exceptions.services import (
     AuthenticationError,
     AuthorizationError,
+    CircuitOpenError,
+    DeadlineExceededError,
     InternalServerError,
     InvalidDataError,
     NotFoundError,
@@ -17,18 +23,133 @@ from styler_rest_framework.exceptions.services import (
     UnexpectedError,
     ConflictError,
 )
-from styler_rest_framework.helpers.logme import logme
+from styler_rest_framework.helpers.json_values import has_non_finite
+from styler_rest_framework.helpers.logme import LogMeQueue
+from styler_rest_framework.helpers.retry import RetryPolicy
+from styler_rest_framework.helpers.spans import (
+    HTTP_HOST,
+    HTTP_METHOD,
+    HTTP_REQUEST_SIZE,
+    HTTP_RESPONSE_SIZE,
+    HTTP_RETRY_COUNT,
+    HTTP_ROUTE,
+    HTTP_STATUS_CODE,
+    HTTP_URL,
+    child_span,
+    propagation_headers,
+)
+from styler_rest_framework.metrics import metrics
+from styler_rest_framework.services import circuit_breaker as breakers
+from styler_rest_framework.services import response_cache
+from styler_rest_framework.services.session import get_session
 from styler_rest_framework.config import defaults
 
+try:
+    import orjson
+except ImportError:  # pragma: no coverage
+    orjson = None
+
+if orjson is not None:
+    # Dates and dataclasses are rejected, as by the standard library
+    _ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+internal_requests_log = LogMeQueue(
+    defaults.INTERNAL_REQUESTS_DATASET, defaults.INTERNAL_REQUESTS_TABLE
+)
+
+_JSON_CONTENT_TYPE = re.compile(r"^application/(?:[\w.+-]+?\+)?json")
+# Numbers, UUIDs and hashes, and long generated ids (e.g. Firestore)
+_ID_SEGMENT = re.compile(
+    r"^(?:\d+|[0-9a-fA-F-]{16,}|(?=[^/]*\d)[\w-]{20,})$"
+)
+TRUNCATED = "...(truncated)"
+_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+
+
+def retry_on_status(statuses):
+    """Returns a retry predicate for the ServiceErrors with one of the statuses
+
+    CircuitOpenError and DeadlineExceededError are never retried.
+    """
+    def retryable(ex):
+        return (
+            isinstance(ex, ServiceError)
+            and not isinstance(ex, (CircuitOpenError, DeadlineExceededError))
+            and ex.status in statuses
+        )
+    return retryable
+
+
+def client_timeout(timeout=None):
+    """Returns the ClientTimeout to use for the requests
+
+    Args:
+        timeout: a ClientTimeout, the total seconds or None for the
+            HTTP_TIMEOUT_* defaults
+    """
+    if isinstance(timeout, ClientTimeout):
+        return timeout
+    return ClientTimeout(
+        total=defaults.HTTP_TIMEOUT_TOTAL if timeout is None else timeout,
+        connect=defaults.HTTP_TIMEOUT_CONNECT,
+        sock_read=defaults.HTTP_TIMEOUT_READ,
+    )
+
 
 class HTTPHandler:
-    """Handles HTTP operations"""
+    """Handles HTTP operations
+
+    The requests failing with a status in `retry_on` are retried with
+    `retry_policy` (exponential back-off with full jitter by default).
+
+    With `circuit_breaker` (CIRCUIT_BREAKER_ENABLED by default) the calls
+    to a host whose breaker is open fail immediately with
+    CircuitOpenError. Connection errors, timeouts and 5xx responses count
+    as failures.
 
-    def __init__(self, identity=None, retry_on=None, headers=None, log=None):
+    `timeout` (seconds or ClientTimeout, HTTP_TIMEOUT_* by default) can be
+    overridden per call. When a deadline is known (`deadline` argument, or
+    the deadline of the RequestScope used as identity) every attempt only
+    gets the time left, the deadline is forwarded in DEADLINE_HEADER and
+    DeadlineExceededError is raised once it is reached.
+    """
+
+    def __init__(
+        self,
+        identity=None,
+        retry_on=None,
+        headers=None,
+        log=None,
+        session=None,
+        retry_policy=None,
+        circuit_breaker=None,
+        timeout=None,
+        deadline=None,
+        cache=None,
+        coalesce=False,
+        vary=response_cache.VARY_HEADERS,
+    ):
+        self.session = session
+        self.cache = response_cache.default_cache() if cache is True else cache
+        self.coalesce = coalesce
+        self.vary = vary
+        self.timeout = client_timeout(timeout)
+        self.deadline = deadline
+        if circuit_breaker is None:
+            circuit_breaker = defaults.CIRCUIT_BREAKER_ENABLED
+        self.circuit_breaker = circuit_breaker
         if retry_on is None:
             self.retry_on = [503]
         else:
             self.retry_on = retry_on
+        self.retry_policy = retry_policy or RetryPolicy(
+            retry_on=retry_on_status(self.retry_on)
+        )
         self.headers = {}
         if headers is None:
             headers = {}
@@ -47,189 +168,254 @@ class HTTPHandler:
         self.log_requests = log if log is not None else defaults.INTERNAL_REQUESTS_LOG_ALL
 
     async def post(self, url, params, error_handlers=None, retry=3, **kwargs):
-        retry_on = kwargs.get("retry_on") or self.retry_on
-        headers = self._prepare_headers(kwargs.get("headers", {}))
-        log_params = [
-            defaults.SERVICE_NAME,
-            url,
-            "POST",
-            headers.get("Authorization"),
-            json.dumps(params),
-            json.dumps(self.identity.trace_header()) if self.identity else ""
-        ]
-
-        try:
-            async with ClientSession() as session:
-                async with session.post(
-                    url, headers=headers, json=params, ssl=True
-                ) as resp:
-                    log_params.extend([resp.status, await resp.text()])
-                    if resp.status not in [200, 201]:
-                        if error_handlers and resp.status in error_handlers:
-                            await error_handlers[resp.status](resp)
-                        await self._handle_http_errors(resp)
-                    return await resp.json()
-        except ServiceError as ex:
-            # Retry
-            if retry > 0 and ex.status in retry_on:
-                return await self.post(
-                    url, params, error_handlers=None, retry=retry - 1, **kwargs
-                )
-            else:
-                raise
-        finally:
-            if self.log_requests:
-                self.log_request(
-                    *log_params
-                )
+        return await self._request(
+            "POST", url, params, error_handlers, retry, (200, 201), **kwargs
+        )
 
     async def patch(self, url, params, error_handlers=None, retry=3, **kwargs):
-        retry_on = kwargs.get("retry_on") or self.retry_on
-        headers = self._prepare_headers(kwargs.get("headers", {}))
-        log_params = [
-            defaults.SERVICE_NAME,
-            url,
-            "PATCH",
-            headers.get("Authorization"),
-            json.dumps(params),
-            json.dumps(self.identity.trace_header()) if self.identity else ""
-        ]
-
-        try:
-            async with ClientSession() as session:
-                async with session.patch(
-                    url, headers=headers, json=params, ssl=True
-                ) as resp:
-                    log_params.extend([resp.status, await resp.text()])
-                    if resp.status not in [200]:
-                        if error_handlers and resp.status in error_handlers:
-                            await error_handlers[resp.status](resp)
-                        await self._handle_http_errors(resp)
-
-                    return await resp.json()
-        except ServiceError as ex:
-            # Retry
-            if retry > 0 and ex.status in retry_on:
-                return await self.patch(
-                    url, params, error_handlers=None, retry=retry - 1, **kwargs
-                )
-            else:
-                raise
-        finally:
-            if self.log_requests:
-                self.log_request(
-                    *log_params
-                )
+        return await self._request(
+            "PATCH", url, params, error_handlers, retry, (200,), **kwargs
+        )
 
     async def put(self, url, params, error_handlers=None, retry=3, **kwargs):
-        retry_on = kwargs.get("retry_on") or self.retry_on
-        headers = self._prepare_headers(kwargs.get("headers", {}))
-        log_params = [
-            defaults.SERVICE_NAME,
-            url,
-            "PUT",
-            headers.get("Authorization"),
-            json.dumps(params),
-            json.dumps(self.identity.trace_header()) if self.identity else ""
-        ]
-
-        try:
-            async with ClientSession() as session:
-                async with session.put(
-                    url, headers=headers, json=params, ssl=True
-                ) as resp:
-                    log_params.extend([resp.status, await resp.text()])
-                    if resp.status not in [200]:
-                        if error_handlers and resp.status in error_handlers:
-                            await error_handlers[resp.status](resp)
-                        await self._handle_http_errors(resp)
-
-                    return await resp.json()
-        except ServiceError as ex:
-            # Retry
-            if retry > 0 and ex.status in retry_on:
-                return await self.put(
-                    url, params, error_handlers=None, retry=retry - 1, **kwargs
-                )
-            else:
-                raise
-        finally:
-            if self.log_requests:
-                self.log_request(
-                    *log_params
-                )
+        return await self._request(
+            "PUT", url, params, error_handlers, retry, (200,), **kwargs
+        )
 
     async def delete(self, url, error_handlers=None, retry=3, **kwargs):
-        retry_on = kwargs.get("retry_on") or self.retry_on
+        return await self._request(
+            "DELETE", url, None, error_handlers, retry, (200,), **kwargs
+        )
+
+    async def get(self, url, error_handlers=None, retry=3, **kwargs):
+        if self.cache is None and not self.coalesce:
+            return await self._request(
+                "GET", url, None, error_handlers, retry, (200,), **kwargs
+            )
         headers = self._prepare_headers(kwargs.get("headers", {}))
-        log_params = [
-            defaults.SERVICE_NAME,
-            url,
-            "DELETE",
-            headers.get("Authorization"),
-            "",
-            json.dumps(self.identity.trace_header()) if self.identity else ""
-        ]
+        key = response_cache.cache_key(url, headers, self.vary)
+        entry = None
+        if self.cache is not None:
+            entry = self.cache.get(key)
+            if entry is not None and entry.is_fresh():
+                return loads(entry.body)
 
-        try:
-            async with ClientSession() as session:
-                async with session.delete(url, headers=headers, ssl=True) as resp:
-                    log_params.extend([resp.status, await resp.text()])
-                    if resp.status not in [200]:
-                        if error_handlers and resp.status in error_handlers:
-                            await error_handlers[resp.status](resp)
-                        await self._handle_http_errors(resp)
-
-                    return await resp.json()
-        except ServiceError as ex:
-            # Retry
-            if retry > 0 and ex.status in retry_on:
-                return await self.delete(
-                    url, error_handlers=None, retry=retry - 1, **kwargs
-                )
+        async def fetch():
+            if entry is None:
+                statuses, overrides = (200,), {}
             else:
-                raise
-        finally:
-            if self.log_requests:
-                self.log_request(
-                    *log_params
-                )
+                statuses, overrides = (200, 304), entry.validators()
+            status, resp_headers, body = await self._request(
+                "GET",
+                url,
+                None,
+                error_handlers,
+                retry,
+                statuses,
+                response_hook=_read_response,
+                **{**kwargs, "headers": {**kwargs.get("headers", {}), **overrides}}
+            )
+            if status == 304:
+                self.cache.revalidate(key, entry, resp_headers)
+                return entry.body
+            if self.cache is not None:
+                self.cache.set(key, body, resp_headers)
+            return body
 
-    async def get(self, url, error_handlers=None, retry=3, **kwargs):
-        retry_on = kwargs.get("retry_on") or self.retry_on
+        if self.coalesce:
+            body = await response_cache.get_single_flight().do(key, fetch)
+        else:
+            body = await fetch()
+        return loads(body)
+
+    async def gather(
+        self, requests, concurrency=None, timeout=None, deadline=None, **kwargs
+    ):
+        """Send many requests with bounded concurrency
+
+        A failed request does not fail the others: its exception
+        (usually a ServiceError) is returned in place of its result.
+
+            results = await handler.gather(
+                [f"{url}/shops/{shop_id}" for shop_id in shop_ids]
+            )
+
+        Args:
+            requests: urls to GET, or `(method, url)` and
+                `(method, url, params)` tuples
+            concurrency: requests in flight at the same time
+                (HTTP_GATHER_CONCURRENCY)
+            timeout: seconds for the whole batch
+            deadline: `time.monotonic()` at which the batch stops; the
+                requests not done by then return DeadlineExceededError
+            kwargs: arguments of every request (headers, retry, ...)
+
+        Returns:
+            the results or exceptions, in the order of the requests
+        """
+        requests = [_unpack_request(request) for request in requests]
+        deadlines = [deadline, self._deadline()]
+        if timeout is not None:
+            deadlines.append(monotonic() + timeout)
+        deadlines = [d for d in deadlines if d is not None]
+        if deadlines:
+            kwargs["deadline"] = min(deadlines)
+        results = [None] * len(requests)
+        pending = iter(enumerate(requests))
+
+        async def worker():
+            for index, (method, url, params) in pending:
+                try:
+                    if params is None and method in ("GET", "DELETE"):
+                        call = getattr(self, method.lower())(url, **kwargs)
+                    else:
+                        call = getattr(self, method.lower())(url, params, **kwargs)
+                    results[index] = await call
+                except Exception as ex:
+                    results[index] = ex
+
+        concurrency = concurrency or defaults.HTTP_GATHER_CONCURRENCY
+        await asyncio.gather(
+            *(worker() for _ in range(min(concurrency, len(requests))))
+        )
+        return results
+
+    async def _request(
+        self,
+        method,
+        url,
+        params,
+        error_handlers,
+        retry,
+        statuses,
+        response_hook=None,
+        **kwargs
+    ):
+        """Sends the request, retrying with the retry policy
+
+        The error handlers are only called for the first attempt and every
+        attempt is logged. Returns the parsed JSON body, or what
+        `response_hook(resp, body)` returns for the successful response.
+
+        The request body is encoded once for all the attempts. The response
+        body is read once as bytes and parsed from them; it is only
+        decoded for the errors, and for the log when it is enabled.
+
+        When the current request is traced, the call is a child span named
+        after the method, host and URL template (`url_template` kwarg, or
+        the path with its ids replaced by `{id}`) and the attempts send the
+        propagation headers of that span.
+        """
+        retry_if = None
+        if kwargs.get("retry_on"):
+            retry_if = retry_on_status(kwargs["retry_on"])
+        timeout = self.timeout
+        if kwargs.get("timeout") is not None:
+            timeout = client_timeout(kwargs["timeout"])
+        deadline = self._deadline(kwargs.get("deadline"))
         headers = self._prepare_headers(kwargs.get("headers", {}))
-        log_params = [
-            defaults.SERVICE_NAME,
-            url,
-            "GET",
-            headers.get("Authorization"),
-            "",
-            json.dumps(self.identity.trace_header()) if self.identity else ""
-        ]
+        data = None
+        if params is not None:
+            data = dumps(params)
+            if not any(name.lower() == "content-type" for name in headers):
+                headers["Content-Type"] = "application/json"
+        handlers = error_handlers
+        breaker = self.get_circuit_breaker(url)
+        target = URL(url)
+        template = kwargs.get("url_template") or url_template(target.path)
+        attempts = sent = received = 0
+        last_status = None
 
-        try:
-            async with ClientSession() as session:
-                async with session.get(url, headers=headers, ssl=True) as resp:
-                    log_params.extend([resp.status, await resp.text()])
-                    if resp.status != 200:
-                        if error_handlers and resp.status in error_handlers:
-                            await error_handlers[resp.status](resp)
-                        await self._handle_http_errors(resp)
-
-                    return await resp.json()
-        except ServiceError as ex:
-            # Retry
-            if retry > 0 and ex.status in retry_on:
-                return await self.get(
-                    url, error_handlers=None, retry=retry - 1, **kwargs
-                )
-            else:
+        async def attempt():
+            nonlocal handlers, attempts, sent, received, last_status
+            attempt_timeout, attempt_headers = timeout, headers
+            clipped = False
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceededError(504, json.dumps({
+                        "message": "Deadline exceeded",
+                    }))
+                attempt_headers = {
+                    **headers,
+                    defaults.DEADLINE_HEADER: str(int(remaining * 1000)),
+                }
+                if timeout.total is None or remaining < timeout.total:
+                    attempt_timeout = _with_total(timeout, remaining)
+                    clipped = True
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(503, json.dumps({
+                    "message": "Service unavailable (circuit open)",
+                    "retry_after": breaker.retry_after(),
+                }))
+            success = status = body = None
+            attempts += 1
+            sent += len(data) if data is not None else 0
+            started = monotonic()
+            try:
+                async with self._session().request(
+                    method,
+                    url,
+                    headers=attempt_headers,
+                    data=data,
+                    timeout=attempt_timeout,
+                    ssl=True,
+                ) as resp:
+                    status = last_status = resp.status
+                    success = status < 500
+                    body = await resp.read()
+                    received += len(body)
+                    if status not in statuses:
+                        if handlers and status in handlers:
+                            await handlers[status](resp)
+                        await self._handle_http_errors(resp, _decode(resp, body))
+                    if response_hook is not None:
+                        return await response_hook(resp, body)
+                    return _parse_json(resp, body)
+            except asyncio.TimeoutError as ex:
+                if not clipped:
+                    success = False
+                    raise
+                # The caller's budget ran out, not a failure of the host
+                raise DeadlineExceededError(504, json.dumps({
+                    "message": "Deadline exceeded",
+                })) from ex
+            except ClientError:
+                if success is None:
+                    success = False
                 raise
-        finally:
-            if self.log_requests:
-                self.log_request(
-                    *log_params
+            finally:
+                handlers = None
+                metrics.CLIENT_DURATION.labels(
+                    method, target.host, status or "error"
+                ).observe(monotonic() - started)
+                if breaker is not None:
+                    self._record(breaker, success)
+                if self.log_requests:
+                    self.log_request(
+                        *self._log_params(url, method, headers, data, status, body)
+                    )
+
+        with child_span(f"{method} {target.host}{template}") as span:
+            # Replaces the trace header of the identity
+            headers.update(propagation_headers(span))
+            try:
+                return await self.retry_policy.call_async(
+                    attempt, max_retries=retry, retry_if=retry_if, deadline=deadline
                 )
+            finally:
+                if attempts > 1:
+                    metrics.CLIENT_RETRIES.labels(target.host).inc(attempts - 1)
+                if span is not None:
+                    span.add_attribute(HTTP_METHOD, method)
+                    span.add_attribute(HTTP_HOST, target.host)
+                    span.add_attribute(HTTP_ROUTE, template)
+                    span.add_attribute(HTTP_URL, url)
+                    span.add_attribute(HTTP_RETRY_COUNT, max(attempts - 1, 0))
+                    span.add_attribute(HTTP_REQUEST_SIZE, sent)
+                    span.add_attribute(HTTP_RESPONSE_SIZE, received)
+                    if last_status is not None:
+                        span.add_attribute(HTTP_STATUS_CODE, last_status)
 
     def log_request(
             self,
@@ -243,6 +429,10 @@ class HTTPHandler:
             response_body: str = None):  # pragma: no coverage
         """Logs the request/response
 
+        The row is enqueued in `internal_requests_log` and published in the
+        background, so this call never waits for Pub/Sub. Rows that do not
+        fit in the queue are counted in `internal_requests_log.dropped`.
+
         :param origin_service: Service sender, defaults to None
         :type origin_service: str, optional
         :param path: URL, defaults to None
@@ -260,29 +450,66 @@ class HTTPHandler:
         :param response_body: JSON string, defaults to None
         :type response_body: str, optional
         """
-        try:
-            logme(
-                defaults.INTERNAL_REQUESTS_DATASET,
-                defaults.INTERNAL_REQUESTS_TABLE,
-                [
-                    (origin_service, path, method, auth, request_body, int(time()), request_tags, response_status_code, response_body)
-                ]
-            )
-        except Exception as ex:
-            logging.warning(f"Could not log request: {str(ex)}")
+        internal_requests_log.put(
+            (origin_service, path, method, auth, request_body, int(time()), request_tags, response_status_code, response_body)
+        )
+
+    def _log_params(self, url, method, headers, data, status, body):
+        """Returns the log_request arguments, truncating the bodies"""
+        return [
+            defaults.SERVICE_NAME,
+            url,
+            method,
+            headers.get("Authorization"),
+            _log_body(data) if data is not None else "",
+            json.dumps(self.identity.trace_header()) if self.identity else "",
+            status,
+            _log_body(body) if body is not None else None,
+        ]
 
     def get_trace_header(self, headers=None):
         headers = headers or self.headers
 
 
+    def _deadline(self, deadline=None):
+        """Returns the deadline of the call, the handler or the identity"""
+        if deadline is not None:
+            return deadline
+        if self.deadline is not None:
+            return self.deadline
+        return getattr(self.identity, "deadline", None)
+
+    def get_circuit_breaker(self, url):
+        """Returns the circuit breaker of the host of the url, or None when
+        the circuit breaker is disabled
+        """
+        if not self.circuit_breaker:
+            return None
+        url = URL(url)
+        return breakers.get_breaker(f"{url.host}:{url.port}")
+
+    @staticmethod
+    def _record(breaker, success):
+        if success is None:
+            breaker.release()
+        elif success:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    def _session(self):
+        """Returns the injected session or the shared one of the running loop"""
+        if self.session is not None:
+            return self.session
+        return get_session()
+
     def _prepare_headers(self, overrides):
-        headers = self.headers
-        headers.update(overrides)
-        return headers
+        return {**self.headers, **overrides}
 
-    async def _handle_http_errors(self, resp):
+    async def _handle_http_errors(self, resp, response_text=None):
         """Handles HTTP errors"""
-        response_text = await resp.text()
+        if response_text is None:
+            response_text = await resp.text()
         if resp.status == 400:
             raise InvalidDataError(resp.status, response_text)
         elif resp.status == 401:
@@ -300,3 +527,104 @@ class HTTPHandler:
         else:
             logging.error("Unexpected response code: %s", resp.status)
             raise UnexpectedError(resp.status, response_text)
+
+
+def dumps(obj) -> bytes:
+    """Encode a request body as UTF-8 JSON
+
+    Uses orjson when it is installed (unless HTTP_JSON_BACKEND is "json")
+    and falls back to the standard library for the values orjson rejects
+    or would change (NaN and Infinity, written as null by orjson), so the
+    bodies carry the same values as with the standard library.
+    """
+    if orjson is not None and defaults.HTTP_JSON_BACKEND != "json":
+        try:
+            data = orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass
+        else:
+            if b"null" not in data or not has_non_finite(obj):
+                return data
+    return json.dumps(obj).encode("utf-8")
+
+
+def loads(body):
+    """Parse a JSON response body, None when it is empty
+
+    Uses orjson when it is installed (unless HTTP_JSON_BACKEND is "json").
+    """
+    body = body.strip()
+    if not body:
+        return None
+    if orjson is not None and defaults.HTTP_JSON_BACKEND != "json":
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # e.g. NaN: let the standard library accept it or raise its error
+            pass
+    return json.loads(body)
+
+
+def url_template(path):
+    """Returns the path with its id segments replaced by `{id}`
+
+        url_template("/shops/123/items") == "/shops/{id}/items"
+    """
+    return "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in path.split("/")
+    )
+
+
+def _unpack_request(request):
+    """Returns the method, url and params of a gather request"""
+    if isinstance(request, str):
+        return "GET", request, None
+    method, url, *params = request
+    method = method.upper()
+    if method not in _METHODS:
+        raise ValueError(f"Unsupported method: {method}")
+    return method, url, params[0] if params else None
+
+
+def _parse_json(resp, body):
+    """Same as ClientResponse.json, without decoding the body"""
+    _check_content_type(resp)
+    return loads(body)
+
+
+def _check_content_type(resp):
+    if not _JSON_CONTENT_TYPE.match(resp.content_type):
+        raise ContentTypeError(
+            resp.request_info,
+            resp.history,
+            status=resp.status,
+            message=f"Attempt to decode JSON with unexpected mimetype: {resp.content_type}",
+            headers=resp.headers,
+        )
+
+
+def _decode(resp, body):
+    return body.decode(resp.charset or "utf-8", errors="replace")
+
+
+def _log_body(body):
+    limit = defaults.INTERNAL_REQUESTS_LOG_MAX_BODY
+    if limit and len(body) > limit:
+        return body[:limit].decode("utf-8", errors="ignore") + TRUNCATED
+    return body.decode("utf-8", errors="replace")
+
+
+async def _read_response(resp, body):
+    if resp.status != 304:
+        _check_content_type(resp)
+    return resp.status, resp.headers, body
+
+
+def _with_total(timeout, total):
+    return ClientTimeout(
+        total=total,
+        connect=timeout.connect,
+        sock_read=timeout.sock_read,
+        sock_connect=timeout.sock_connect,
+    )
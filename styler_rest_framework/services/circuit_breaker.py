@@ -0,0 +1,188 @@
+""" Per-host circuit breakers for the outbound calls
+
+    HTTPHandler asks the breaker of the target host before each attempt.
+While the breaker is open the call fails immediately with
+CircuitOpenError instead of waiting for a dependency that is down:
+
+    closed --(failure rate over threshold)--> open
+    open --(cool-down elapsed)--> half-open
+    half-open --(probes succeed)--> closed
+    half-open --(a probe fails)--> open
+
+The breakers are shared by all the handlers of the process and their
+state can be read with `states()` and `CircuitBreaker.stats()`.
+"""
+
+from collections import deque
+import time
+
+from styler_rest_framework.config import defaults
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+_breakers = {}
+_breaker_options = {}
+
+
+class CircuitBreaker:
+    """Circuit breaker based on the failure rate of the last calls
+
+    Args:
+        failure_rate: rate of failed calls (0 to 1) that opens the circuit
+        minimum_calls: calls needed in the window before the rate is used,
+            at most `window`
+        window: number of most recent calls used to compute the rate
+        cool_down: seconds the circuit stays open before probing again
+        half_open_calls: probes allowed while half-open
+
+    Attributes:
+        state: CLOSED, OPEN or HALF_OPEN
+        rejected: calls refused while the circuit was open
+        opened: number of times the circuit was opened
+    """
+
+    def __init__(
+        self,
+        failure_rate=None,
+        minimum_calls=None,
+        window=None,
+        cool_down=None,
+        half_open_calls=1,
+    ):
+        window = window or defaults.CIRCUIT_BREAKER_WINDOW
+        self.failure_rate = failure_rate or defaults.CIRCUIT_BREAKER_FAILURE_RATE
+        # The window never holds more calls, so a higher minimum would
+        # keep the circuit closed forever
+        self.minimum_calls = min(
+            minimum_calls or defaults.CIRCUIT_BREAKER_MINIMUM_CALLS, window
+        )
+        self.cool_down = (
+            defaults.CIRCUIT_BREAKER_COOL_DOWN if cool_down is None else cool_down
+        )
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.rejected = 0
+        self.opened = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0
+        self._probes = 0
+        self._probe_successes = 0
+
+    def allow(self):
+        """Returns True if a call can be sent now
+
+        Every allowed call must be followed by `record_success`,
+        `record_failure` or `release`.
+        """
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.cool_down:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        return True
+
+    def retry_after(self):
+        """Seconds before the open circuit lets a probe through"""
+        if self.state != OPEN:
+            return 0
+        return max(0, self.cool_down - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        """Record a call that succeeded"""
+        if self.state == HALF_OPEN:
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._close()
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        """Record a call that failed"""
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) < self.minimum_calls:
+            return
+        failures = self._outcomes.count(False)
+        if failures / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def release(self):
+        """Release an allowed call whose outcome is unknown (cancelled)"""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def stats(self):
+        """Returns the state and counters of the breaker"""
+        failures = self._outcomes.count(False)
+        return {
+            "state": self.state,
+            "calls": len(self._outcomes),
+            "failures": failures,
+            "failure_rate": failures / len(self._outcomes) if self._outcomes else 0,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+    def _open(self):
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def _close(self):
+        self.state = CLOSED
+        self._outcomes.clear()
+
+
+def configure(
+    failure_rate: float = None,
+    minimum_calls: int = None,
+    window: int = None,
+    cool_down: float = None,
+    half_open_calls: int = None,
+) -> None:
+    """Override the settings of the breakers
+
+    Only the breakers created after this call are affected.
+    """
+    options = {
+        "failure_rate": failure_rate,
+        "minimum_calls": minimum_calls,
+        "window": window,
+        "cool_down": cool_down,
+        "half_open_calls": half_open_calls,
+    }
+    _breaker_options.update(
+        {k: v for k, v in options.items() if v is not None}
+    )
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    """Returns the breaker of the host, created on the first call"""
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = CircuitBreaker(**_breaker_options)
+        _breakers[host] = breaker
+    return breaker
+
+
+def states() -> dict:
+    """Returns the state of the breaker of every host"""
+    return {host: breaker.state for host, breaker in _breakers.items()}
+
+
+def reset() -> None:
+    """Forget all the breakers"""
+    _breakers.clear()
@@ -0,0 +1,237 @@
+""" Response cache and request coalescing for HTTPHandler.get
+
+    ResponseCache keeps the body of GET responses, for the time allowed
+by their Cache-Control header, and revalidates the stale ones having an
+ETag or Last-Modified with a conditional request.
+
+SingleFlight collapses the concurrent identical GETs into one upstream
+call whose response is shared by all the callers.
+
+Both are keyed by the URL and the headers that change the response
+(`Authorization` and `Accept-Language` by default):
+
+    handler = HTTPHandler(identity, cache=True, coalesce=True)
+"""
+
+from collections import OrderedDict
+import asyncio
+import time
+import weakref
+
+from styler_rest_framework.config import defaults
+
+
+VARY_HEADERS = ("Authorization", "Accept-Language")
+_REFRESHED_HEADERS = ("Cache-Control", "Age", "ETag", "Last-Modified")
+
+_default_cache = None
+_single_flights = weakref.WeakKeyDictionary()
+
+
+class CacheEntry:
+    """Cached response body with its freshness, validators and the
+    Cache-Control header it was stored with
+    """
+
+    __slots__ = ("body", "expires", "etag", "last_modified", "cache_control")
+
+    def __init__(self, body, expires, etag=None, last_modified=None, cache_control=None):
+        self.body = body
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cache_control = cache_control
+
+    def is_fresh(self):
+        return time.monotonic() < self.expires
+
+    def validators(self):
+        """Returns the headers of a conditional request for the entry"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """LRU cache of the GET response bodies
+
+    The lifetime of an entry is the `max-age` of the Cache-Control
+    response header (minus `Age`), or `default_ttl` without it. Responses
+    with `no-store` are never kept, and responses that cannot be cached
+    for some time are only kept when they can be revalidated.
+
+    Args:
+        max_size: maximum number of responses kept
+        default_ttl: lifetime of the responses without max-age, in seconds
+
+    Attributes:
+        hits: lookups answered from the cache
+        misses: lookups that required a request
+        revalidated: stale entries confirmed by a 304 response
+    """
+
+    def __init__(self, max_size=None, default_ttl=None):
+        self.max_size = max_size or defaults.HTTP_CACHE_MAX_SIZE
+        self.default_ttl = (
+            defaults.HTTP_CACHE_DEFAULT_TTL if default_ttl is None else default_ttl
+        )
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the entry of the key, fresh or stale, or None
+
+        Only the fresh entries count as hits.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        if entry.is_fresh():
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def set(self, key, body, headers):
+        """Store the body of a response if its headers allow it"""
+        entry = self._entry(body, headers)
+        if entry is None:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def revalidate(self, key, entry, headers):
+        """Refresh a stale entry after a 304 response
+
+        The headers of the 304 response update the stored ones (RFC 9111
+        4.3.4): without Cache-Control, the stored max-age applies again.
+        """
+        self.revalidated += 1
+        refreshed = {
+            "Cache-Control": entry.cache_control,
+            "ETag": entry.etag,
+            "Last-Modified": entry.last_modified,
+        }
+        for name in _REFRESHED_HEADERS:
+            if headers.get(name):
+                refreshed[name] = headers[name]
+        self.set(key, entry.body, refreshed)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        """Returns the counters of the cache"""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+        }
+
+    def _entry(self, body, headers):
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        if "no-store" in directives:
+            return None
+        ttl = self.default_ttl
+        if "no-cache" in directives:
+            ttl = 0
+        elif "max-age" in directives:
+            try:
+                ttl = int(directives["max-age"]) - int(headers.get("Age") or 0)
+            except ValueError:
+                ttl = 0
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if ttl <= 0 and not etag and not last_modified:
+            return None
+        return CacheEntry(
+            body,
+            time.monotonic() + max(ttl, 0),
+            etag,
+            last_modified,
+            headers.get("Cache-Control"),
+        )
+
+
+class SingleFlight:
+    """Shares the result of a running call with the identical calls
+
+    Attributes:
+        coalesced: calls answered by another call in flight
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, func):
+        """Await `func()`, or the call already running for the key
+
+        The shared call keeps running if the caller that started it is
+        cancelled.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._done(key, done))
+        return await asyncio.shield(future)
+
+    def _done(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # Retrieved even when every caller was cancelled
+            future.exception()
+
+
+def cache_key(url, headers, vary=VARY_HEADERS):
+    """Returns the key of a GET request"""
+    return (url, *(headers.get(name) for name in vary))
+
+
+def parse_cache_control(value):
+    """Returns the directives of a Cache-Control header as a dict"""
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def default_cache():
+    """Returns the ResponseCache shared by the handlers"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+
+def get_single_flight():
+    """Returns the SingleFlight of the running event loop"""
+    loop = asyncio.get_running_loop()
+    single_flight = _single_flights.get(loop)
+    if single_flight is None:
+        single_flight = SingleFlight()
+        _single_flights[loop] = single_flight
+    return single_flight
@@ -0,0 +1,97 @@
+""" Shared HTTP client sessions
+
+    Keeps one long-lived aiohttp ClientSession per event loop so the
+outbound calls made by HTTPHandler reuse the same connection pool
+(keep-alive, DNS cache and TLS sessions) instead of opening a new one
+for every request.
+
+    A loop that is closed without awaiting `close_session` can no longer
+run the close of its session; such sessions are dropped on the next
+`get_session`, so their loop and connection pool can be freed.
+"""
+
+import asyncio
+import weakref
+
+from aiohttp import ClientSession, TCPConnector
+from styler_rest_framework.config import defaults
+
+
+_sessions = weakref.WeakKeyDictionary()
+_connector_options = {}
+
+
+def configure(
+    limit: int = None,
+    limit_per_host: int = None,
+    ttl_dns_cache: int = None,
+    keepalive_timeout: float = None,
+) -> None:
+    """Override the connection pool settings
+
+    Only the sessions created after this call are affected.
+
+    Args:
+        limit: total number of simultaneous connections
+        limit_per_host: simultaneous connections to the same endpoint
+        ttl_dns_cache: seconds to keep resolved DNS entries
+        keepalive_timeout: seconds to keep idle connections open
+    """
+    options = {
+        "limit": limit,
+        "limit_per_host": limit_per_host,
+        "ttl_dns_cache": ttl_dns_cache,
+        "keepalive_timeout": keepalive_timeout,
+    }
+    _connector_options.update(
+        {k: v for k, v in options.items() if v is not None}
+    )
+
+
+def get_session() -> ClientSession:
+    """Returns the shared session of the running event loop
+
+    The session is created on the first call. Must be called from
+    within a coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        _drop_closed_loops()
+        session = ClientSession(connector=_create_connector())
+        _sessions[loop] = session
+    return session
+
+
+async def open_session(*args) -> None:
+    """Startup hook: creates the shared session ahead of the first call
+
+    Accepts and ignores positional arguments so it can be registered
+    both as an aiohttp signal and as a FastAPI event handler.
+    """
+    get_session()
+
+
+async def close_session(*args) -> None:
+    """Shutdown hook: closes the shared session of the running loop"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def _drop_closed_loops() -> None:
+    # The session and its connector hold the loop, so the weak keys of
+    # the closed loops are never released on their own
+    for loop in [loop for loop in _sessions if loop.is_closed()]:
+        _sessions.pop(loop).detach()
+
+
+def _create_connector() -> TCPConnector:
+    options = {
+        "limit": defaults.HTTP_POOL_LIMIT,
+        "limit_per_host": defaults.HTTP_POOL_LIMIT_PER_HOST,
+        "ttl_dns_cache": defaults.HTTP_DNS_CACHE_TTL,
+        "keepalive_timeout": defaults.HTTP_KEEPALIVE_TIMEOUT,
+        **_connector_options,
+    }
+    return TCPConnector(use_dns_cache=True, **options)
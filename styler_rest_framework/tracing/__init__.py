@@ -1 +1,3 @@
 from styler_rest_framework.tracing.tracing import config_tracer  # NOQA
+from styler_rest_framework.tracing.tracing import AppTracer, MemoryExporter, RateLimitingSampler, create_sampler  # NOQA
+from styler_rest_framework.tracing.asgi import TracingMiddleware, config_asgi_tracer  # NOQA
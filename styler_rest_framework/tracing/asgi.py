@@ -0,0 +1,150 @@
+""" Tracing of the FastAPI (ASGI) apps
+
+    Same spans as the aiohttp middleware of `config_tracer`: the request
+span is named after the endpoint ("HTTP <method>" when no route matched)
+and carries the host, method, path, url, route template and status code.
+The propagation headers of the span are stored in
+`request.state.trace_header`, where `RequestScope.from_request` finds
+them, and the tracer is kept in the execution context so the HTTPHandler
+calls and the SQLAlchemy queries of the request are child spans.
+
+    app = FastAPI()
+    config_asgi_tracer(app, "my-project")
+"""
+
+import logging
+
+from starlette.datastructures import Headers, URL
+
+from styler_rest_framework.api.request_scope import TRACE_HEADER_KEY
+from styler_rest_framework.config import defaults
+from styler_rest_framework.middlewares.path_matcher import PathMatcher
+from styler_rest_framework.tracing.tracing import (
+    APP_TRACER_KEY,
+    HTTP_HOST,
+    HTTP_METHOD,
+    HTTP_PATH,
+    HTTP_ROUTE,
+    HTTP_URL,
+    AppTracer,
+)
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware tracing the requests not excluded
+
+    Install it with `config_asgi_tracer`, or with
+    `app.add_middleware(TracingMiddleware, app_tracer=...)`.
+
+    Args:
+        app: ASGI application
+        project_id: Google Cloud project of the traces
+        app_tracer: AppTracer to use (one is created otherwise)
+        excludes: paths not traced (TRACE_EXCLUDES by default)
+        excludes_regex: regex of the paths not traced
+        excludes_handlers: names of the endpoints whose request span is
+            not exported (TRACE_EXCLUDES_HANDLERS by default)
+    """
+
+    def __init__(
+        self,
+        app,
+        project_id=None,
+        app_tracer=None,
+        excludes=None,
+        excludes_regex=None,
+        excludes_handlers=None,
+    ):
+        self.app = app
+        self.app_tracer = app_tracer or AppTracer(project_id)
+        if excludes is None:
+            excludes = defaults.TRACE_EXCLUDES
+        if excludes_handlers is None:
+            excludes_handlers = defaults.TRACE_EXCLUDES_HANDLERS
+        self.excluded = PathMatcher(excludes, excludes_regex)
+        self.excluded_handlers = frozenset(excludes_handlers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.excluded.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        trace = None
+        try:
+            headers = Headers(scope=scope)
+            # Renamed after the endpoint once the request is routed
+            trace = self.app_tracer.start(headers, f"HTTP {scope['method']}")
+            if trace is not None:
+                trace.add_attribute(HTTP_HOST, headers.get("host", ""))
+                trace.add_attribute(HTTP_METHOD, scope["method"])
+                trace.add_attribute(HTTP_PATH, scope["path"])
+                trace.add_attribute(HTTP_URL, str(URL(scope=scope)))
+                # The state is kept in the scope, shared with the endpoint request
+                scope.setdefault("state", {})[TRACE_HEADER_KEY] = trace.headers
+        except:  # NOQA
+            logging.exception("Could not initialize the tracer")
+        if trace is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = None
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        except Exception:
+            status = status or 500
+            raise
+        finally:
+            route = scope.get("route")
+            name = getattr(scope.get("endpoint"), "__name__", None)
+            if route is not None:
+                template = _route_template(route)
+                trace.add_attribute(HTTP_ROUTE, template)
+                name = name or f"{scope['method']} {template}"
+            if name in self.excluded_handlers:
+                # The endpoint is only known once the request was routed
+                self.app_tracer.discard(trace)
+            else:
+                if name is not None:
+                    trace.set_name(name)
+                self.app_tracer.end(trace, status)
+
+
+def _route_template(route):
+    return getattr(route, "path_format", None) or route.path
+
+
+def config_asgi_tracer(
+    app,
+    project_id,
+    sampler=None,
+    sample_errors=None,
+    excludes=None,
+    excludes_regex=None,
+    exporter=None,
+    excludes_handlers=None,
+):
+    """Trace the requests of a FastAPI app
+
+    The AppTracer is stored in `app.state.app_tracer` and its transport
+    is flushed on shutdown. `exporter` replaces the Stackdriver exporter
+    (e.g. a MemoryExporter in tests).
+    """
+    app_tracer = AppTracer(
+        project_id, sampler=sampler, sample_errors=sample_errors, exporter=exporter
+    )
+    setattr(app.state, APP_TRACER_KEY, app_tracer)
+    app.router.add_event_handler("shutdown", app_tracer.close)
+    app.add_middleware(
+        TracingMiddleware,
+        app_tracer=app_tracer,
+        excludes=excludes,
+        excludes_regex=excludes_regex,
+        excludes_handlers=excludes_handlers,
+    )
+    return app_tracer
@@ -1,67 +1,289 @@
 import logging
+import threading
+import time
 
 from aiohttp import web
 from opencensus.common.transports.async_ import AsyncTransport
 from opencensus.ext.stackdriver import trace_exporter as stackdriver_exporter
-from opencensus.trace import attributes_helper
+from opencensus.trace import base_exporter, samplers
 from opencensus.trace.propagation import google_cloud_format
 import opencensus.trace.tracer
 
+from styler_rest_framework.api.request_scope import TRACE_HEADER_KEY
+from styler_rest_framework.config import defaults
+from styler_rest_framework.helpers.spans import (  # NOQA
+    HTTP_HOST,
+    HTTP_METHOD,
+    HTTP_PATH,
+    HTTP_ROUTE,
+    HTTP_STATUS_CODE,
+    HTTP_URL,
+)
+from styler_rest_framework.middlewares.path_matcher import PathMatcher
 
-HTTP_HOST = attributes_helper.COMMON_ATTRIBUTES["HTTP_HOST"]
-HTTP_METHOD = attributes_helper.COMMON_ATTRIBUTES["HTTP_METHOD"]
-HTTP_PATH = attributes_helper.COMMON_ATTRIBUTES["HTTP_PATH"]
-HTTP_ROUTE = attributes_helper.COMMON_ATTRIBUTES["HTTP_ROUTE"]
-HTTP_URL = attributes_helper.COMMON_ATTRIBUTES["HTTP_URL"]
-HTTP_STATUS_CODE = attributes_helper.COMMON_ATTRIBUTES["HTTP_STATUS_CODE"]
 
+APP_TRACER_KEY = "app_tracer"
 
-def initialize_tracer(project_id, context, propagator):
-    exporter = stackdriver_exporter.StackdriverExporter(
-        project_id=project_id, transport=AsyncTransport
-    )
-    tracer = opencensus.trace.tracer.Tracer(
-        span_context=context,
-        exporter=exporter,
-        propagator=propagator,
-        sampler=opencensus.trace.tracer.samplers.AlwaysOnSampler(),
-    )
 
-    return tracer
+class RateLimitingSampler(samplers.Sampler):
+    """Samples at most `traces_per_second` traces (token bucket)
+
+    Args:
+        traces_per_second: sampled traces per second, on average
+    """
+
+    def __init__(self, traces_per_second=None):
+        self.rate = traces_per_second or defaults.TRACE_RATE_LIMIT
+        self._tokens = self.rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def should_sample(self, span_context=None):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def create_sampler(name=None, rate=None):
+    """Returns the sampler named by TRACE_SAMPLER
+
+    Args:
+        name: "always_on", "always_off", "probability" or "rate_limited"
+        rate: probability (TRACE_SAMPLING_RATE) or traces per second
+            (TRACE_RATE_LIMIT)
+    """
+    name = name or defaults.TRACE_SAMPLER
+    if name == "always_on":
+        return samplers.AlwaysOnSampler()
+    if name == "always_off":
+        return samplers.AlwaysOffSampler()
+    if name == "probability":
+        return samplers.ProbabilitySampler(
+            defaults.TRACE_SAMPLING_RATE if rate is None else rate
+        )
+    if name == "rate_limited":
+        return RateLimitingSampler(rate)
+    raise ValueError(f"Unknown sampler: {name}")
+
+
+class _DiscardExporter(base_exporter.Exporter):
+    """Drops the spans of the requests that are not sampled"""
+
+    def emit(self, span_datas):
+        pass
+
+    def export(self, span_datas):
+        pass
+
+
+_DISCARD = _DiscardExporter()
+
+
+class MemoryExporter(base_exporter.Exporter):
+    """Keeps the exported spans in `spans`, to inspect them in tests"""
+
+    def __init__(self):
+        self.spans = []
+
+    def emit(self, span_datas):
+        self.spans.extend(span_datas)
+
+    def export(self, span_datas):
+        self.spans.extend(span_datas)
+
+
+class RequestTrace:
+    """Tracer of one request and its sampling decision"""
+
+    __slots__ = ("tracer", "sampled", "headers")
 
+    def __init__(self, tracer, sampled, headers):
+        self.tracer = tracer
+        self.sampled = sampled
+        self.headers = headers
+
+    def add_attribute(self, key, value):
+        self.tracer.add_attribute_to_current_span(key, value)
+
+    def set_name(self, name):
+        """Rename the request span (once the route is known)"""
+        self.tracer.current_span().name = name
+
+
+class AppTracer:
+    """Creates the tracers of the requests of an app
+
+    The Stackdriver exporter, and the worker thread of its AsyncTransport,
+    are created once, on the first sampled request, and shared by the
+    cheap per-request tracers.
+
+    With `sample_errors`, the requests that are not sampled are still
+    recorded and their span is exported when the response is a server
+    error, so errors are always traced.
+
+    Args:
+        project_id: Google Cloud project of the traces
+        sampler: opencensus sampler (see `create_sampler`)
+        sample_errors: also export the server errors (TRACE_SAMPLE_ERRORS)
+        exporter: exporter to use instead of Stackdriver
+    """
+
+    def __init__(self, project_id, sampler=None, sample_errors=None, exporter=None):
+        self.project_id = project_id
+        self.sampler = sampler or create_sampler()
+        self.sample_errors = (
+            defaults.TRACE_SAMPLE_ERRORS if sample_errors is None else sample_errors
+        )
+        self.propagator = google_cloud_format.GoogleCloudFormatPropagator()
+        self._exporter = exporter
+        self._lock = threading.Lock()
+
+    @property
+    def exporter(self):
+        if self._exporter is None:
+            with self._lock:
+                if self._exporter is None:
+                    self._exporter = stackdriver_exporter.StackdriverExporter(
+                        project_id=self.project_id, transport=AsyncTransport
+                    )
+        return self._exporter
+
+    def start(self, headers, name):
+        """Start the root span of a request, returns None when the request
+        is neither sampled nor recorded for errors
+        """
+        span_context = self.propagator.from_headers(headers)
+        sampled = self.sampler.should_sample(span_context)
+        if not sampled and not self.sample_errors:
+            return None
+        tracer = opencensus.trace.tracer.Tracer(
+            span_context=span_context,
+            exporter=self.exporter if sampled else _DISCARD,
+            propagator=self.propagator,
+            sampler=samplers.AlwaysOnSampler(),
+        )
+        # Downstream services follow the sampling decision, not the recording
+        span_context.trace_options.set_enabled(sampled)
+        span = tracer.start_span()
+        span.name = name
+        return RequestTrace(tracer, sampled, self.propagator.to_headers(span_context))
+
+    def end(self, trace, status=None):
+        """End the root span, exporting it if sampled or a server error"""
+        if status is not None:
+            trace.add_attribute(HTTP_STATUS_CODE, status)
+        if not trace.sampled and (status is None or status >= 500):
+            trace.tracer.tracer.exporter = self.exporter
+        trace.tracer.end_span()
+
+    def discard(self, trace):
+        """End the root span without exporting it"""
+        trace.tracer.tracer.exporter = _DISCARD
+        trace.tracer.end_span()
+
+    async def close(self, *args):
+        """Shutdown hook: exports the spans waiting in the transport
+
+        Accepts and ignores positional arguments so it can be registered
+        both as an aiohttp signal and as a FastAPI event handler.
+        """
+        if self._exporter is not None and hasattr(self._exporter, "transport"):
+            self._exporter.transport.flush()
+
+
+def trace_middleware(
+    project_id,
+    app_tracer=None,
+    excludes=None,
+    excludes_regex=None,
+    excludes_handlers=None,
+):
+    """Returns an aiohttp middleware tracing the requests
+
+    By default the handlers named `health_check` are not traced, wherever
+    their route is. To skip the health checks by path instead, set
+    TRACE_EXCLUDES (e.g. "/") and an empty TRACE_EXCLUDES_HANDLERS.
+
+    Args:
+        project_id: Google Cloud project of the traces
+        app_tracer: AppTracer to use (one is created otherwise)
+        excludes: paths not traced (TRACE_EXCLUDES by default)
+        excludes_regex: regex of the paths not traced
+        excludes_handlers: names of the handlers not traced
+            (TRACE_EXCLUDES_HANDLERS by default)
+    """
+    app_tracer = app_tracer or AppTracer(project_id)
+    if excludes is None:
+        excludes = defaults.TRACE_EXCLUDES
+    if excludes_handlers is None:
+        excludes_handlers = defaults.TRACE_EXCLUDES_HANDLERS
+    excluded = PathMatcher(excludes, excludes_regex)
+    excluded_handlers = frozenset(excludes_handlers)
 
-def trace_middleware(project_id):
     @web.middleware
     async def middleware(request, handler):
-        if handler.__name__ == "health_check":
+        if handler.__name__ in excluded_handlers or excluded.match(request.path):
             return await handler(request)
-        span = None
-        tracer = None
+        trace = None
         try:
-            propagator = google_cloud_format.GoogleCloudFormatPropagator()
-            span_context = propagator.from_headers(request.headers)
-            tracer = initialize_tracer(project_id, span_context, propagator)
-            span = tracer.start_span()
-            span.name = handler.__name__
-            tracer.add_attribute_to_current_span(HTTP_HOST, request.host)
-            tracer.add_attribute_to_current_span(HTTP_METHOD, request.method)
-            tracer.add_attribute_to_current_span(HTTP_PATH, request.path)
-            tracer.add_attribute_to_current_span(HTTP_URL, str(request.url))
-            request["trace_header"] = propagator.to_headers(span_context)
+            trace = app_tracer.start(request.headers, handler.__name__)
+            if trace is not None:
+                trace.add_attribute(HTTP_HOST, request.host)
+                trace.add_attribute(HTTP_METHOD, request.method)
+                trace.add_attribute(HTTP_PATH, request.path)
+                trace.add_attribute(HTTP_URL, str(request.url))
+                resource = request.match_info.route.resource
+                if resource is not None:
+                    trace.add_attribute(HTTP_ROUTE, resource.canonical)
+                request[TRACE_HEADER_KEY] = trace.headers
         except:  # NOQA
             logging.exception("Could not initialize the tracer")
 
+        status = None
         try:
             response = await handler(request)
-            if tracer:
-                tracer.add_attribute_to_current_span(HTTP_STATUS_CODE, response.status)
+            status = response.status
             return response
+        except web.HTTPException as ex:
+            status = ex.status
+            raise
         finally:
-            if tracer:
-                tracer.end_span()
+            if trace is not None:
+                app_tracer.end(trace, status)
 
     return middleware
 
 
-def config_tracer(app, project_id):
-    app.middlewares.append(trace_middleware(project_id))
+def config_tracer(
+    app,
+    project_id,
+    sampler=None,
+    sample_errors=None,
+    excludes=None,
+    excludes_regex=None,
+    exporter=None,
+    excludes_handlers=None,
+):
+    """Trace the requests of an aiohttp app
+
+    The AppTracer is stored in `app["app_tracer"]` and its transport is
+    flushed on cleanup. `exporter` replaces the Stackdriver exporter
+    (e.g. a MemoryExporter in tests). See `trace_middleware` for the
+    excluded routes.
+    """
+    app_tracer = AppTracer(
+        project_id, sampler=sampler, sample_errors=sample_errors, exporter=exporter
+    )
+    app[APP_TRACER_KEY] = app_tracer
+    app.on_cleanup.append(app_tracer.close)
+    app.middlewares.append(
+        trace_middleware(
+            project_id, app_tracer, excludes, excludes_regex, excludes_handlers
+        )
+    )
+    return app_tracer
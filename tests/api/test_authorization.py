@@ -1,5 +1,8 @@
+from types import SimpleNamespace
+from unittest.mock import Mock
 
 from styler_rest_framework.api.authorization import highest_role, authorize, Role
+from styler_rest_framework.api.request_scope import RequestScope
 
 
 class TestHighestRole:
@@ -75,3 +78,28 @@ class TestDecorator:
 
         response = await my_endpoint()
         assert response.status_code == 403
+
+    def test_identity_argument(self, token):
+
+        @authorize(Role.ADMIN)
+        def my_endpoint(scope):
+            return None
+
+        staff = RequestScope(authorization=f'Bearer {token(staff=True)}')
+        admin = RequestScope(authorization=f'Bearer {token(admin=True)}')
+
+        assert my_endpoint(scope=staff).status_code == 403
+        assert my_endpoint(scope=admin) is None
+
+    async def test_identity_stored_in_request(self, token):
+
+        @authorize(Role.ADMIN)
+        async def my_endpoint(request, authorization):
+            return None
+
+        admin = RequestScope(authorization=f'Bearer {token(admin=True)}')
+        request = Mock()
+        request.state = SimpleNamespace(identity=admin)
+
+        response = await my_endpoint(request=request, authorization='Bearer invalid')
+        assert response is None
@@ -1,12 +1,17 @@
 """ Tests for request_scope module
 """
 
-from unittest.mock import Mock
+from types import SimpleNamespace
+import pickle
+from unittest.mock import Mock, patch
 
+from fastapi import HTTPException
 from styler_rest_framework.api.request_scope import (
     Identity,
     RequestScope,
+    get_request_scope,
     get_token,
+    parse_deadline,
 )
 import pytest
 
@@ -25,6 +30,13 @@ class TestIdentity:
 
         assert isinstance(idem, Identity)
 
+    @patch('styler_rest_framework.api.request_scope.jwt.decode')
+    def test_decoded(self, mocked_decode):
+        idem = Identity('token', decoded={'user_id': '1234'})
+
+        assert idem.user_id() == '1234'
+        mocked_decode.assert_not_called()
+
     def test_token(self, token):
         original_token = token()
         idem = Identity(original_token)
@@ -140,6 +152,42 @@ class TestIdentity:
 
         assert set(data.keys()) == expected_keys
 
+    def test_highest_role(self, token, empty_token):
+        assert Identity(token(sysadmin=True, staff=True)).highest_role() == 4
+        assert Identity(token(admin=True)).highest_role() == 2
+        assert Identity(token(staff=True)).highest_role() == 1
+        assert Identity(empty_token).highest_role() == 0
+
+    def test_has_shop(self, token, empty_token):
+        idem = Identity(token(shops=['12345', '33442']))
+
+        assert idem.has_shop('12345')
+        assert not idem.has_shop('99999')
+        assert not Identity(empty_token).has_shop('12345')
+
+    def test_has_organization(self, token, empty_token):
+        idem = Identity(token(organizations=['33333']))
+
+        assert idem.has_organization('33333')
+        assert not idem.has_organization('44444')
+        assert not Identity(empty_token).has_organization('33333')
+
+    def test_slots(self, token):
+        idem = Identity(token())
+
+        with pytest.raises(AttributeError):
+            idem.other = 'value'
+
+    def test_pickle(self, token):
+        idem = RequestScope(f'Bearer {token(admin=True, shops=["12345"])}', 'en')
+
+        restored = pickle.loads(pickle.dumps(idem))
+
+        assert restored.data() == idem.data()
+        assert restored.localization() == 'en'
+        assert restored.is_admin()
+        assert restored.has_shop('12345')
+
 
 class TestGetToken:
     """ Tests for get_token
@@ -270,6 +318,38 @@ class TestTraceHeader:
         assert trace_header == {}
 
 
+class TestDeadline:
+    """ Tests for the deadline
+    """
+    @patch('styler_rest_framework.api.request_scope.time.monotonic', return_value=100)
+    def test_from_headers(self, _, auth):
+        req_scope = RequestScope.from_headers({
+            'Authorization': auth,
+            'X-Request-Timeout-Ms': '1500',
+        })
+
+        assert req_scope.deadline == 101.5
+        assert req_scope.remaining_time() == 1.5
+
+    def test_no_deadline(self, auth):
+        req_scope = RequestScope.from_headers({'Authorization': auth})
+
+        assert req_scope.deadline is None
+        assert req_scope.remaining_time() is None
+
+    @pytest.mark.parametrize('value', [None, '', 'abc'])
+    def test_parse_invalid(self, value):
+        assert parse_deadline(value) is None
+
+    def test_pickle_drops_deadline(self, auth):
+        req_scope = RequestScope(authorization=auth, deadline=100)
+
+        loaded = pickle.loads(pickle.dumps(req_scope))
+
+        assert loaded.deadline is None
+        assert loaded.token() == req_scope.token()
+
+
 class MockHeaders:
     def __init__(self, auth, locale, header=None):
         self.locale = locale
@@ -297,3 +377,68 @@ class TestFromRequest:
 
         assert req_scope.localization() == 'en'
         assert req_scope.trace_header() == {'aa': '1234'}
+
+    def test_reuse_stored_identity(self, auth):
+        identity = RequestScope(authorization=auth)
+        request = Mock()
+        request.state = SimpleNamespace(identity=identity)
+
+        req_scope = RequestScope.from_request(request)
+
+        assert req_scope is identity
+
+    def test_reuse_stored_identity_aiohttp(self, auth):
+        identity = RequestScope(authorization=auth)
+        request = {'identity': identity}
+
+        req_scope = RequestScope.from_request(request)
+
+        assert req_scope is identity
+
+    def test_stored_trace_header(self, auth):
+        identity = RequestScope(authorization=auth, trace={'aa': '1234'})
+        request = Mock()
+        request.state = SimpleNamespace(identity=identity, trace_header={'bb': '5678'})
+
+        req_scope = RequestScope.from_request(request)
+
+        assert req_scope.trace_header() == {'bb': '5678'}
+
+    def test_stored_trace_header_aiohttp(self, auth):
+        request = {'trace_header': {'bb': '5678'}}
+        request = Mock(get=request.get, state=None)
+        request.headers = MockHeaders(auth=auth, locale='en', header={'aa': '1234'})
+
+        req_scope = RequestScope.from_request(request)
+
+        assert req_scope.trace_header() == {'bb': '5678'}
+
+
+class TestGetRequestScope:
+    """ Tests for the get_request_scope dependency
+    """
+    def test_stored_identity(self, auth):
+        identity = RequestScope(authorization=auth)
+        request = Mock()
+        request.state = SimpleNamespace(identity=identity)
+
+        assert get_request_scope(request) is identity
+
+    def test_from_headers(self, auth):
+        request = Mock()
+        request.state = SimpleNamespace()
+        request.headers = MockHeaders(auth=auth, locale='en')
+
+        req_scope = get_request_scope(request)
+
+        assert req_scope.localization() == 'en'
+
+    def test_unauthorized(self):
+        request = Mock()
+        request.state = SimpleNamespace()
+        request.headers = MockHeaders(auth=None, locale='en')
+
+        with pytest.raises(HTTPException) as expected:
+            get_request_scope(request)
+
+        assert expected.value.status_code == 401
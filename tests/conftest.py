@@ -5,6 +5,8 @@ import pytest
 import jwt
 
 from styler_rest_framework.datasource import firestore
+from styler_rest_framework.metrics import metrics
+from styler_rest_framework.services import circuit_breaker, internal_requests_log, session
 
 
 @pytest.fixture
@@ -12,6 +14,28 @@ def event_loop(loop):
     return loop
 
 
+@pytest.fixture(autouse=True)
+def circuit_breakers():
+    """Start every test with closed circuits"""
+    yield
+    circuit_breaker.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start every test without recorded metrics"""
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+async def http_session(loop):
+    """Close the shared HTTP session at the end of the test"""
+    yield session.get_session()
+    await internal_requests_log.close()
+    await session.close_session()
+
+
 @pytest.fixture
 def token():
     def generate(
@@ -316,6 +316,15 @@ class TestGetIdentity:
 
         assert isinstance(identity, RequestScope)
 
+    def test_reuse_stored_identity(self):
+        stored = RequestScope(authorization=f'Bearer {self.custom_token}')
+        request = {'identity': stored}
+        contr = BaseController()
+
+        identity = contr.get_identity(request)
+
+        assert identity is stored
+
     def test_invalid_jwt(self):
         request = Mock()
         request.headers.get.return_value = 'Bearer aa.aa.aa'
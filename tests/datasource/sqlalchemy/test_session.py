@@ -3,16 +3,29 @@
 from unittest.mock import patch
 
 from styler_rest_framework.datasource.sqlalchemy import session
+from styler_rest_framework.metrics import metrics
 
 
 class TestGetSession:
     """ Tests for get_session
     """
+    @patch('styler_rest_framework.datasource.sqlalchemy.session.trace_engine')
     @patch('styler_rest_framework.datasource.sqlalchemy.session.sessionmaker')
     @patch('styler_rest_framework.datasource.sqlalchemy.session.create_engine')
-    def test_get_session(self, create_engine_mocked, sessionmaker_mocked):
+    def test_get_session(self, create_engine_mocked, sessionmaker_mocked, trace_engine_mocked):
         session_instance = session.get_session('uri')
         next(session_instance)
 
         create_engine_mocked.assert_called_once()
         sessionmaker_mocked.assert_called_once()
+        trace_engine_mocked.assert_called_once_with(create_engine_mocked.return_value)
+
+    @patch('styler_rest_framework.datasource.sqlalchemy.session.trace_engine')
+    @patch('styler_rest_framework.datasource.sqlalchemy.session.sessionmaker')
+    @patch('styler_rest_framework.datasource.sqlalchemy.session.create_engine')
+    def test_session_duration(self, *_):
+        session_instance = session.get_session('uri')
+        next(session_instance)
+        session_instance.close()
+
+        assert sum(metrics.DB_SESSION_DURATION.labels().counts) == 1
@@ -0,0 +1,62 @@
+""" Tests for the SQLAlchemy child spans
+"""
+from opencensus.trace import samplers
+from opencensus.trace.tracer import Tracer
+import pytest
+import sqlalchemy
+
+from styler_rest_framework.datasource.sqlalchemy.tracing import (
+    DB_STATEMENT,
+    DB_SYSTEM,
+    trace_engine,
+)
+from styler_rest_framework.helpers.spans import ERROR_NAME
+from styler_rest_framework.tracing import MemoryExporter
+
+
+@pytest.fixture
+def engine():
+    return trace_engine(sqlalchemy.create_engine('sqlite://'))
+
+
+@pytest.fixture
+def exporter():
+    exporter = MemoryExporter()
+    tracer = Tracer(exporter=exporter, sampler=samplers.AlwaysOnSampler())
+    with tracer.span('request'):
+        yield exporter
+
+
+class TestTraceEngine:
+    """ Tests for trace_engine
+    """
+    def test_query_span(self, engine, exporter):
+        with engine.connect() as conn:
+            conn.execute(sqlalchemy.text('select 1'))
+
+        span = exporter.spans[0]
+        assert span.name == 'SQL SELECT'
+        assert span.attributes[DB_SYSTEM] == 'sqlite'
+        assert span.attributes[DB_STATEMENT] == 'select 1'
+
+    def test_error_span(self, engine, exporter):
+        with engine.connect() as conn:
+            with pytest.raises(sqlalchemy.exc.OperationalError):
+                conn.execute(sqlalchemy.text('SELECT * FROM missing'))
+            conn.execute(sqlalchemy.text('SELECT 1'))
+
+        assert [span.name for span in exporter.spans] == ['SQL SELECT', 'SQL SELECT']
+        assert exporter.spans[0].attributes[ERROR_NAME] == 'OperationalError'
+        assert ERROR_NAME not in exporter.spans[1].attributes
+
+    def test_trace_once(self, engine, exporter):
+        trace_engine(engine)
+
+        with engine.connect() as conn:
+            conn.execute(sqlalchemy.text('SELECT 1'))
+
+        assert len(exporter.spans) == 1
+
+    def test_not_traced(self, engine):
+        with engine.connect() as conn:
+            assert conn.execute(sqlalchemy.text('SELECT 1')).scalar() == 1
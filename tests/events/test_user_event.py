@@ -6,7 +6,7 @@ from unittest.mock import patch, Mock
 import json
 
 from styler_rest_framework.events import user_event
-from styler_rest_framework.api.request_scope import Identity
+from styler_rest_framework.api.request_scope import Identity, RequestScope
 
 
 class TestGetUserId:
@@ -99,7 +99,9 @@ class TestTrack:
         @user_event.track
         def do_something(a, b, c, d):
             return 'something'
-        iden = Identity(token(sysadmin=True, user_id='111'))
+        jwt_token = token(sysadmin=True, user_id='111')
+        decoded = {'user_id': '111', 'roles': ['sysadmin']}
+        iden = Identity(jwt_token, decoded=decoded)
 
         with patch(
             'styler_rest_framework.events.user_event.time.time',
@@ -115,7 +117,29 @@ class TestTrack:
                 0: 1234,
                 1: 'aaa',
                 'c': 'parameter c',
-                'd': json.dumps(iden.__dict__),
+                'd': json.dumps({'_token': jwt_token, '_decoded': decoded}),
                 'return': '"something"'
             }
         )
+
+    @patch('styler_rest_framework.events.user_event.handler')
+    def test_track_request_scope(self, mocked_handler, token):
+        @user_event.track
+        def do_something(scope):
+            return None
+        jwt_token = token(user_id='111')
+        decoded = {'user_id': '111'}
+        trace = {'X-Cloud-Trace-Context': 'abc/1;o=1'}
+        scope = RequestScope(
+            f'Bearer {jwt_token}', accept_language='en', trace=trace, decoded=decoded
+        )
+
+        do_something(scope)
+
+        data = mocked_handler.call_args.args[3]
+        assert data[0] == json.dumps({
+            'accept_language': 'en',
+            'trace': trace,
+            '_token': jwt_token,
+            '_decoded': decoded,
+        })
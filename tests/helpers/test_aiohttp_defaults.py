@@ -3,7 +3,11 @@
 
 from unittest.mock import Mock
 
+from aiohttp import web
+
 from styler_rest_framework.helpers import aiohttp_defaults
+from styler_rest_framework.pubsub.publishers import pubsub_handler
+from styler_rest_framework.services import internal_requests_log, session
 
 
 class TestAddMiddlewares:
@@ -27,3 +31,43 @@ class TestAddMiddlewares:
         assert len(app.middlewares) == 2
         assert callable(app.middlewares[0])
         assert callable(app.middlewares[1])
+
+
+class TestAddHTTPSessionHooks:
+    def test_add_http_session_hooks(self):
+        app = Mock()
+        app.on_startup = []
+        app.on_cleanup = []
+
+        aiohttp_defaults.add_http_session_hooks(app)
+
+        assert app.on_startup == [session.open_session]
+        assert app.on_cleanup == [internal_requests_log.close, session.close_session]
+
+
+class TestAddPubSubHooks:
+    def test_add_pubsub_hooks(self):
+        app = Mock()
+        app.on_cleanup = []
+
+        aiohttp_defaults.add_pubsub_hooks(app)
+
+        assert app.on_cleanup == [pubsub_handler.close]
+
+
+class TestAddMetrics:
+    def test_add_metrics(self):
+        app = web.Application()
+
+        aiohttp_defaults.add_metrics(app)
+
+        assert len(app.middlewares) == 1
+        assert {r.resource.canonical for r in app.router.routes()} == {'/metrics'}
+
+    def test_add_metrics_not_exposed(self):
+        app = web.Application()
+
+        aiohttp_defaults.add_metrics(app, expose=False)
+
+        assert len(app.middlewares) == 1
+        assert list(app.router.routes()) == []
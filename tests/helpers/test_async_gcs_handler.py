@@ -0,0 +1,175 @@
+"""Tests for AsyncGCSHandler
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from unittest.mock import patch
+import asyncio
+
+from google.api_core.exceptions import NotFound, ServiceUnavailable
+import pytest
+
+from styler_rest_framework.helpers.async_gcs_handler import AsyncGCSHandler
+from styler_rest_framework.helpers.fake_gcs import FakeClient
+
+
+@pytest.fixture
+def client():
+    return FakeClient()
+
+
+@pytest.fixture
+def handler(client):
+    return AsyncGCSHandler("test_bucket_name", client=client, back_off=0)
+
+
+@pytest.fixture
+def bucket(client):
+    return client.bucket("test_bucket_name")
+
+
+class TestInit:
+    """Tests for the constructor"""
+
+    @patch("styler_rest_framework.helpers.async_gcs_handler.storage.Client", autospec=True)
+    def test_default_client(self, mock_gcs):
+        handler = AsyncGCSHandler("test_bucket_name")
+
+        mock_gcs.return_value.bucket.assert_called_once_with("test_bucket_name")
+        mock_gcs.return_value.get_bucket.assert_not_called()
+        assert handler.bucket is mock_gcs.return_value.bucket.return_value
+
+    async def test_context_manager(self, client):
+        async with AsyncGCSHandler("test_bucket_name", client=client) as handler:
+            await handler.put_as_string("a.txt", b"a", "text/plain")
+
+        assert handler._executor._shutdown
+
+    async def test_keep_given_executor(self, client):
+        executor = ThreadPoolExecutor(max_workers=1)
+        handler = AsyncGCSHandler("test_bucket_name", client=client, executor=executor)
+
+        await handler.close()
+
+        assert not executor._shutdown
+        executor.shutdown()
+
+
+class TestOperations:
+    """Tests for the storage operations"""
+
+    async def test_get_files_from_folder(self, handler, bucket):
+        bucket.blob("folder/a.txt").upload_from_string("a")
+        bucket.blob("folder/b.txt").upload_from_string("b")
+        bucket.blob("other/c.txt").upload_from_string("c")
+
+        result = await handler.get_files_from_folder("folder/")
+
+        assert [blob.name for blob in result] == ["folder/a.txt", "folder/b.txt"]
+
+    async def test_download_file_as_string(self, handler, bucket, csv_blob_from_gcs):
+        bucket.blob("file.csv").upload_from_string(csv_blob_from_gcs)
+
+        result = await handler.download_file_as_string("file.csv")
+
+        assert result == csv_blob_from_gcs
+
+    async def test_download_file_as_string_with_formatter(
+        self, handler, bucket, csv_blob_from_gcs
+    ):
+        bucket.blob("file.csv").upload_from_string(csv_blob_from_gcs)
+
+        result = await handler.download_file_as_string_with_formatter("file.csv")
+
+        assert result == ["header1,header2", "row1-1,row1-2"]
+
+    async def test_download_file_as_stream(self, handler, bucket, csv_blob_from_gcs):
+        bucket.blob("file.csv").upload_from_string(csv_blob_from_gcs)
+
+        result = await handler.download_file_as_stream("file.csv")
+
+        assert isinstance(result, StringIO)
+        assert result.read() == "header1,header2\nrow1-1,row1-2"
+
+    async def test_upload_file(self, handler, bucket):
+        await handler.upload_file(BytesIO(b"content"), "file.txt")
+
+        assert bucket.blob("file.txt").download_as_bytes() == b"content"
+
+    async def test_put_as_string(self, handler, bucket):
+        await handler.put_as_string("file.txt", b"content", "text/plain")
+
+        assert bucket.blob("file.txt").download_as_bytes() == b"content"
+        assert bucket.blob("file.txt").content_type == "text/plain"
+
+    async def test_rename_file(self, handler, bucket):
+        bucket.blob("old.txt").upload_from_string("content")
+
+        await handler.rename_file("old.txt", "new.txt")
+
+        assert not bucket.blob("old.txt").exists()
+        assert bucket.blob("new.txt").download_as_bytes() == b"content"
+
+    async def test_delete_file(self, handler, bucket):
+        bucket.blob("file.txt").upload_from_string("content")
+
+        await handler.delete_file("file.txt")
+
+        assert not bucket.blob("file.txt").exists()
+
+    async def test_is_exist(self, handler, bucket):
+        bucket.blob("file.txt").upload_from_string("content")
+
+        assert await handler.is_exist("file.txt")
+        assert not await handler.is_exist("other.txt")
+
+    async def test_not_found(self, handler):
+        with pytest.raises(NotFound):
+            await handler.download_file_as_string("missing.txt")
+
+
+class TestRetry:
+    """Tests for the retries"""
+
+    async def test_retry_succeed(self, handler, bucket):
+        bucket.blob("file.txt").upload_from_string("content")
+        bucket.fail(ServiceUnavailable("service unavailable"))
+
+        result = await handler.download_file_as_string("file.txt")
+
+        assert result == b"content"
+        assert bucket.calls["download"] == 2
+
+    async def test_retry_upload_from_the_start(self, handler, bucket):
+        file_obj = BytesIO(b"skip:hello world")
+        file_obj.seek(5)
+        bucket.fail(ServiceUnavailable("service unavailable"))
+
+        await handler.upload_file(file_obj, "file.txt")
+
+        assert bucket.blob("file.txt").download_as_bytes() == b"hello world"
+        assert bucket.calls["upload"] == 2
+
+    async def test_retry_failed(self, handler, bucket):
+        bucket.fail(*[ServiceUnavailable("service unavailable")] * 4)
+
+        with pytest.raises(ServiceUnavailable):
+            await handler.is_exist("file.txt")
+        assert bucket.calls["exists"] == 4
+
+    @patch("styler_rest_framework.helpers.retry.RetryPolicy.delay", return_value=0.05)
+    async def test_back_off_does_not_block_the_loop(self, _, client, bucket):
+        handler = AsyncGCSHandler("test_bucket_name", client=client)
+        bucket.fail(ServiceUnavailable("service unavailable"))
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        await handler.is_exist("file.txt")
+        task.cancel()
+
+        assert ticks >= 5
@@ -3,12 +3,22 @@
 
 from unittest.mock import Mock
 
+from fastapi import FastAPI
+
 from styler_rest_framework.helpers import fastapi_defaults
+from styler_rest_framework.pubsub.publishers import pubsub_handler
+from styler_rest_framework.services import internal_requests_log, session
+from styler_rest_framework.metrics.asgi import MetricsMiddleware
+from styler_rest_framework.tracing import MemoryExporter, TracingMiddleware
 
 
 class MockFastAPI:
     def __init__(self):
         self.middleware_func = None
+        self.event_handlers = {}
+
+    def add_event_handler(self, event_type, func):
+        self.event_handlers.setdefault(event_type, []).append(func)
 
     def middleware(self, middleware_type):
         def decorator(func):
@@ -25,6 +35,16 @@ class TestAddMiddlewares:
         assert app.middleware_func is not None
         assert callable(app.middleware_func)
 
+    def test_add_http_session_hooks(self):
+        app = MockFastAPI()
+
+        fastapi_defaults.add_middlewares(app)
+
+        assert app.event_handlers["startup"] == [session.open_session]
+        assert app.event_handlers["shutdown"] == [
+            internal_requests_log.close, session.close_session, pubsub_handler.close
+        ]
+
     def test_add_middlewares_with_custom_error_handler(self):
         app = MockFastAPI()
         error_handler = Mock()
@@ -33,3 +53,25 @@ class TestAddMiddlewares:
 
         assert app.middleware_func is not None
         assert callable(app.middleware_func)
+
+
+class TestAddTracing:
+    def test_add_tracing(self):
+        app = FastAPI()
+        exporter = MemoryExporter()
+
+        app_tracer = fastapi_defaults.add_tracing(app, 'MyProject', exporter=exporter)
+
+        assert app.user_middleware[0].cls is TracingMiddleware
+        assert app.router.on_shutdown == [app_tracer.close]
+        assert app_tracer.exporter is exporter
+
+
+class TestAddMetrics:
+    def test_add_metrics(self):
+        app = FastAPI()
+
+        fastapi_defaults.add_metrics(app)
+
+        assert app.user_middleware[0].cls is MetricsMiddleware
+        assert [route.path for route in app.routes][-1] == '/metrics'
@@ -1,10 +1,13 @@
 """Tests for GCSHandler
 """
+from io import BytesIO
 from unittest.mock import MagicMock, patch
 import pytest
 
-from google.api_core.exceptions import ServiceUnavailable
+from google.api_core.exceptions import NotFound, ServiceUnavailable
+from google.cloud.storage.retry import DEFAULT_RETRY
 
+from styler_rest_framework.helpers.fake_gcs import FakeClient
 from styler_rest_framework.helpers.gcs_handler import GCSHandler
 
 
@@ -479,3 +482,325 @@ class TestIsExist:
         with pytest.raises(ServiceUnavailable) as expected:
             test_handler.is_exist("test_file_name")
             assert expected.value.errors == "service unavailable"
+
+
+class TestFakeClient:
+    """Tests for GCSHandler with the in-memory client"""
+
+    def test_given_client(self):
+        test_handler = GCSHandler("test_bucket_name", client=FakeClient())
+
+        test_handler.put_as_string("folder/file.txt", b"content", "text/plain")
+
+        assert test_handler.is_exist("folder/file.txt")
+        assert test_handler.download_file_as_string("folder/file.txt") == b"content"
+        assert [b.name for b in test_handler.get_files_from_folder("folder")] == [
+            "folder/file.txt"
+        ]
+
+
+@pytest.fixture
+def fake_handler():
+    return GCSHandler("test_bucket_name", client=FakeClient(), back_off=0)
+
+
+class TestOpenFile:
+    """Tests for function open_file"""
+
+    def test_read_in_chunks(self, fake_handler):
+        data = bytes(range(256)) * 40
+        fake_handler.put_as_string("file.bin", data, "application/octet-stream")
+
+        with fake_handler.open_file("file.bin", chunk_size=1024) as stream:
+            chunks = iter(lambda: stream.read(100), b"")
+            result = b"".join(chunks)
+
+        assert result == data
+        assert fake_handler.bucket.calls["download"] == 10
+
+    def test_seek(self, fake_handler):
+        fake_handler.put_as_string("file.txt", b"0123456789", "text/plain")
+
+        with fake_handler.open_file("file.txt", chunk_size=4) as stream:
+            stream.seek(6)
+            assert stream.read() == b"6789"
+            stream.seek(-3, 2)
+            assert stream.read(2) == b"78"
+
+    def test_empty(self, fake_handler):
+        fake_handler.put_as_string("empty.txt", b"", "text/plain")
+
+        with fake_handler.open_file("empty.txt") as stream:
+            assert stream.read() == b""
+
+    def test_retry_chunk(self, fake_handler):
+        fake_handler.put_as_string("file.txt", b"0123456789", "text/plain")
+
+        with fake_handler.open_file("file.txt", chunk_size=4) as stream:
+            assert stream.read(4) == b"0123"
+            fake_handler.bucket.fail(ServiceUnavailable("service unavailable"))
+            assert stream.read() == b"456789"
+
+    def test_not_found(self, fake_handler):
+        with pytest.raises(NotFound):
+            fake_handler.open_file("missing.txt").read()
+
+
+class TestIterLines:
+    """Tests for function iter_lines"""
+
+    def test_lines(self, fake_handler, csv_blob_from_gcs):
+        fake_handler.put_as_string("file.csv", csv_blob_from_gcs, "text/csv")
+
+        result = list(fake_handler.iter_lines("file.csv", chunk_size=4))
+
+        assert result == ["header1,header2", "row1-1,row1-2"]
+
+    def test_multibyte_across_chunks(self, fake_handler):
+        text = "名前,住所\r\n東京都,渋谷区\r\n"
+        fake_handler.put_as_string("file.csv", text.encode("utf-8"), "text/csv")
+
+        result = list(fake_handler.iter_lines("file.csv", chunk_size=5))
+
+        assert result == ["名前,住所", "東京都,渋谷区"]
+
+    def test_lazy(self, fake_handler):
+        fake_handler.put_as_string("file.txt", b"a\n" * 1000, "text/plain")
+
+        lines = fake_handler.iter_lines("file.txt", chunk_size=16)
+        next(lines)
+
+        assert fake_handler.bucket.calls["download"] < 10
+
+
+class TestDownloadMany:
+    """Tests for function download_many"""
+
+    def test_contents(self, fake_handler):
+        fake_handler.put_as_string("a.txt", b"a", "text/plain")
+        fake_handler.put_as_string("b.txt", b"b", "text/plain")
+
+        results = fake_handler.download_many(["b.txt", "missing.txt", "a.txt"])
+
+        assert [r.name for r in results] == ["b.txt", "missing.txt", "a.txt"]
+        assert [r.result for r in results] == [b"b", None, b"a"]
+        assert [r.ok for r in results] == [True, False, True]
+        assert isinstance(results[1].error, NotFound)
+
+    def test_destination_dir(self, fake_handler, tmp_path):
+        fake_handler.put_as_string("folder/a.txt", b"a", "text/plain")
+
+        results = fake_handler.download_many(["folder/a.txt"], destination_dir=str(tmp_path))
+
+        assert results[0].result == str(tmp_path / "folder" / "a.txt")
+        assert (tmp_path / "folder" / "a.txt").read_bytes() == b"a"
+
+
+class TestUploadMany:
+    """Tests for function upload_many"""
+
+    def test_upload(self, fake_handler):
+        results = fake_handler.upload_many(
+            [("a.txt", b"a"), ("b.txt", "b"), ("c.txt", BytesIO(b"c"))],
+            content_type="text/plain",
+        )
+
+        assert all(r.ok for r in results)
+        assert fake_handler.download_file_as_string("a.txt") == b"a"
+        assert fake_handler.download_file_as_string("b.txt") == b"b"
+        assert fake_handler.download_file_as_string("c.txt") == b"c"
+        assert fake_handler.bucket.blob("a.txt").content_type == "text/plain"
+
+    def test_retry(self, fake_handler):
+        fake_handler.bucket.fail(ServiceUnavailable("service unavailable"))
+
+        results = fake_handler.upload_many({"a.txt": b"a"})
+
+        assert results[0].ok
+        assert fake_handler.bucket.calls["upload"] == 2
+
+
+class TestDeletePrefix:
+    """Tests for function delete_prefix"""
+
+    def test_batches(self, fake_handler):
+        fake_handler.upload_many({f"folder/{i}.txt": b"x" for i in range(150)})
+        fake_handler.put_as_string("other.txt", b"x", "text/plain")
+
+        results = fake_handler.delete_prefix("folder/")
+
+        assert len(results) == 150
+        assert all(r.ok for r in results)
+        assert fake_handler.bucket.calls["batch"] == 2
+        assert "delete" not in fake_handler.bucket.calls
+        assert [b.name for b in fake_handler.get_files_from_folder("")] == ["other.txt"]
+
+    def test_empty(self, fake_handler):
+        assert fake_handler.delete_prefix("folder/") == []
+
+    @patch("styler_rest_framework.helpers.gcs_handler.GCSHandler._list")
+    def test_blob_already_deleted(self, mock_list, fake_handler):
+        mock_list.return_value = [MagicMock(), MagicMock()]
+        mock_list.return_value[0].name = "a.txt"
+        mock_list.return_value[1].name = "b.txt"
+        fake_handler.put_as_string("a.txt", b"x", "text/plain")
+
+        results = fake_handler.delete_prefix("")
+
+        assert all(r.ok for r in results)
+        assert not fake_handler.is_exist("a.txt")
+        assert fake_handler.bucket.calls["delete"] == 2
+
+    def test_batch_failed(self, fake_handler):
+        fake_handler.put_as_string("a.txt", b"x", "text/plain")
+        fake_handler.put_as_string("b.txt", b"x", "text/plain")
+        blobs = list(fake_handler.get_files_from_folder(""))
+        fake_handler.bucket.fail(ServiceUnavailable("service unavailable"))
+
+        with patch.object(fake_handler, "_list", return_value=blobs):
+            results = fake_handler.delete_prefix("", retry=0)
+
+        assert all(r.ok for r in results)
+        assert list(fake_handler.get_files_from_folder("")) == []
+        assert fake_handler.bucket.calls["delete"] == 2
+
+    def test_delete_failed(self, fake_handler):
+        fake_handler.put_as_string("a.txt", b"x", "text/plain")
+        blobs = list(fake_handler.get_files_from_folder(""))
+        fake_handler.bucket.fail(*[ServiceUnavailable("service unavailable")] * 2)
+
+        with patch.object(fake_handler, "_list", return_value=blobs):
+            results = fake_handler.delete_prefix("", retry=0)
+
+        assert isinstance(results[0].error, ServiceUnavailable)
+        assert fake_handler.is_exist("a.txt")
+
+
+class TestCopyPrefix:
+    """Tests for function copy_prefix"""
+
+    def test_same_bucket(self, fake_handler):
+        fake_handler.upload_many({"src/a.txt": b"a", "src/sub/b.txt": b"b"})
+
+        results = fake_handler.copy_prefix("src/", "dst/")
+
+        assert [r.result for r in results] == ["dst/a.txt", "dst/sub/b.txt"]
+        assert fake_handler.download_file_as_string("dst/sub/b.txt") == b"b"
+        assert fake_handler.is_exist("src/a.txt")
+
+    def test_other_bucket(self, fake_handler):
+        fake_handler.put_as_string("src/a.txt", b"a", "text/plain")
+
+        fake_handler.copy_prefix("src/", "backup/", destination_bucket="other")
+
+        other = fake_handler.client.bucket("other")
+        assert other.blob("backup/a.txt").download_as_bytes() == b"a"
+
+
+class TestResumableUpload:
+    """Tests for the resumable and composite uploads"""
+
+    def test_small_file_single_request(self, fake_handler):
+        fake_handler.upload_file(BytesIO(b"x" * 10), "file.bin", chunk_size=16)
+
+        assert fake_handler.bucket.calls["upload"] == 1
+        assert "create_session" not in fake_handler.bucket.calls
+
+    def test_chunks(self, fake_handler):
+        data = bytes(range(256)) * 10
+
+        fake_handler.upload_file(
+            BytesIO(data), "file.bin", content_type="application/x-test", chunk_size=1000
+        )
+
+        assert fake_handler.download_file_as_string("file.bin") == data
+        assert fake_handler.bucket.blob("file.bin").content_type == "application/x-test"
+        assert fake_handler.bucket.calls["upload_chunk"] == 3
+
+    def test_from_current_position(self, fake_handler):
+        stream = BytesIO(b"header" + b"x" * 100)
+        stream.read(6)
+
+        fake_handler.upload_file(stream, "file.bin", chunk_size=16)
+
+        assert fake_handler.download_file_as_string("file.bin") == b"x" * 100
+
+    def test_retry_failed_chunk(self, fake_handler):
+        data = b"a" * 1000 + b"b" * 1000 + b"c" * 500
+        bucket = fake_handler.bucket
+        original_call = bucket._call
+
+        def flaky_call(operation):
+            original_call(operation)
+            if operation == "upload_chunk" and bucket.calls[operation] == 2:
+                raise ConnectionError("connection reset")
+
+        with patch.object(bucket, "_call", side_effect=flaky_call):
+            fake_handler.upload_file(BytesIO(data), "file.bin", chunk_size=1000)
+
+        assert fake_handler.download_file_as_string("file.bin") == data
+        assert bucket.calls["create_session"] == 1
+        assert bucket.calls["upload_chunk"] == 4
+
+    def test_client_upload(self, fake_handler):
+        stream = BytesIO(b"x" * 100)
+
+        with patch.object(fake_handler.bucket, "blob") as mock_blob:
+            fake_handler.upload_file(
+                stream, "file.bin", content_type="text/csv", chunk_size=16
+            )
+
+        mock_blob.assert_called_once_with("file.bin", chunk_size=16)
+        mock_blob.return_value.upload_from_file.assert_called_once_with(
+            stream, size=100, content_type="text/csv", retry=DEFAULT_RETRY
+        )
+
+    def test_retry_disabled(self, fake_handler):
+        fake_handler.bucket.fail(ServiceUnavailable("service unavailable"))
+
+        with pytest.raises(ServiceUnavailable):
+            fake_handler.upload_file(BytesIO(b"x" * 100), "file.bin", chunk_size=16, retry=0)
+
+    @patch("styler_rest_framework.helpers.gcs_handler.defaults.GCS_UPLOAD_CHUNK_SIZE", 16)
+    def test_put_as_string(self, fake_handler):
+        fake_handler.put_as_string("file.txt", "あ" * 20, "text/plain")
+
+        assert fake_handler.download_file_as_string("file.txt") == ("あ" * 20).encode("utf-8")
+        assert fake_handler.bucket.calls["upload_chunk"] == 4
+
+    @patch("styler_rest_framework.helpers.gcs_handler.defaults.GCS_COMPOSITE_THRESHOLD", 1000)
+    def test_composite(self, fake_handler, tmp_path):
+        data = bytes(range(256)) * 20
+        path = tmp_path / "export.bin"
+        path.write_bytes(data)
+
+        with open(path, "rb") as file_obj:
+            fake_handler.upload_file(
+                file_obj, "export.bin", content_type="text/csv", chunk_size=256, composite=True
+            )
+
+        assert fake_handler.download_file_as_string("export.bin") == data
+        assert fake_handler.bucket.blob("export.bin").content_type == "text/csv"
+        assert fake_handler.bucket.calls["compose"] == 1
+        assert fake_handler.bucket.calls["create_session"] == 8
+        assert [b.name for b in fake_handler.get_files_from_folder("")] == ["export.bin"]
+
+    @patch("styler_rest_framework.helpers.gcs_handler.defaults.GCS_COMPOSITE_THRESHOLD", 1000)
+    def test_composite_part_failed(self, fake_handler, tmp_path):
+        path = tmp_path / "export.bin"
+        path.write_bytes(b"x" * 2000)
+
+        with patch.object(
+            fake_handler, "_resumable_upload", side_effect=[None, ValueError("part error")] * 4
+        ):
+            with open(path, "rb") as file_obj, pytest.raises(ValueError):
+                fake_handler.upload_file(file_obj, "export.bin", chunk_size=256, composite=True)
+
+        assert "compose" not in fake_handler.bucket.calls
+
+    @patch("styler_rest_framework.helpers.gcs_handler.defaults.GCS_COMPOSITE_THRESHOLD", 1000)
+    def test_composite_needs_local_file(self, fake_handler):
+        fake_handler.upload_file(BytesIO(b"x" * 2000), "file.bin", chunk_size=256, composite=True)
+
+        assert "compose" not in fake_handler.bucket.calls
+        assert fake_handler.download_file_as_string("file.bin") == b"x" * 2000
@@ -0,0 +1,29 @@
+""" Tests for json_values
+"""
+import pytest
+
+from styler_rest_framework.helpers.json_values import has_non_finite
+
+
+class Holder:
+    def __init__(self, value):
+        self.value = value
+
+
+class TestHasNonFinite:
+    """ Tests for has_non_finite
+    """
+    @pytest.mark.parametrize('value', [
+        float('nan'),
+        {'a': [1, float('inf')]},
+        ({'a': -float('inf')},),
+        Holder({'b': float('nan')}),
+    ])
+    def test_non_finite(self, value):
+        assert has_non_finite(value)
+
+    @pytest.mark.parametrize('value', [
+        1.5, None, 'NaN', {'a': [1, None, 'x']}, Holder(2.0), 2 ** 70,
+    ])
+    def test_finite(self, value):
+        assert not has_non_finite(value)
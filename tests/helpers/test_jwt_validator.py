@@ -0,0 +1,238 @@
+"""Tests for jwt_validator
+"""
+from datetime import datetime, timedelta
+from time import time
+from unittest.mock import AsyncMock
+import asyncio
+
+from aiohttp import web
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+import jwt
+import pytest
+
+from styler_rest_framework.helpers import jwt_validator
+from styler_rest_framework.helpers.jwt_validator import (
+    JWKSCache,
+    TokenCache,
+    validate_async,
+)
+
+
+@pytest.fixture
+def key_pair():
+    """Generate a private key and its self signed x509 certificate"""
+    def generate():
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'test')])
+        now = datetime.utcnow()
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1))
+            .not_valid_after(now + timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        pem = cert.public_bytes(serialization.Encoding.PEM).decode('utf-8')
+        return key, pem
+
+    return generate
+
+
+def signed_token(key, kid, env='development'):
+    now = int(time())
+    return jwt.encode(
+        {
+            'aud': f'facy-{env}',
+            'iss': f'https://securetoken.google.com/facy-{env}',
+            'iat': now - 10,
+            'auth_time': now - 10,
+            'exp': now + 3600,
+            'user_id': '1234',
+        },
+        key,
+        algorithm='RS256',
+        headers={'kid': kid},
+    )
+
+
+@pytest.fixture
+async def jwks_server(aiohttp_server, key_pair):
+    """Local stub of the x509 certificates endpoint"""
+    key, pem = key_pair()
+    state = {'requests': 0, 'certificates': {'kid1': pem}}
+
+    async def certificates(request):
+        state['requests'] += 1
+        return web.json_response(
+            state['certificates'],
+            headers={'Expires': 'Thu, 01 Jan 2099 00:00:00 GMT'},
+        )
+
+    app = web.Application()
+    app.router.add_get('/certs', certificates)
+    server = await aiohttp_server(app)
+    state['url'] = str(server.make_url('/certs'))
+    state['key'] = key
+    return state
+
+
+class TestValidateAsync:
+    """Tests for validate_async against a stub server
+    """
+    async def test_valid_token(self, jwks_server, http_session):
+        cache = JWKSCache(jwks_server['url'])
+        token = signed_token(jwks_server['key'], 'kid1')
+
+        data = await validate_async(token, 'development', jwks_server['url'], cache=cache)
+
+        assert data['user_id'] == '1234'
+        assert jwks_server['requests'] == 1
+
+    async def test_keys_are_reused(self, jwks_server, http_session):
+        cache = JWKSCache(jwks_server['url'])
+        token = signed_token(jwks_server['key'], 'kid1')
+
+        for _ in range(3):
+            await validate_async(token, 'development', jwks_server['url'], cache=cache)
+
+        assert jwks_server['requests'] == 1
+
+    async def test_invalid_signature(self, jwks_server, key_pair, http_session):
+        cache = JWKSCache(jwks_server['url'])
+        other_key, _ = key_pair()
+        token = signed_token(other_key, 'kid1')
+
+        data = await validate_async(token, 'development', jwks_server['url'], cache=cache)
+
+        assert data is None
+
+    async def test_invalid_audience(self, jwks_server, http_session):
+        cache = JWKSCache(jwks_server['url'])
+        token = signed_token(jwks_server['key'], 'kid1', env='production')
+
+        data = await validate_async(token, 'development', jwks_server['url'], cache=cache)
+
+        assert data is None
+
+    async def test_token_cache(self, jwks_server, http_session):
+        cache = JWKSCache(jwks_server['url'])
+        token_cache = TokenCache()
+        token = signed_token(jwks_server['key'], 'kid1')
+
+        first = await validate_async(
+            token, 'development', jwks_server['url'], cache=cache, token_cache=token_cache
+        )
+        second = await validate_async(
+            token, 'development', jwks_server['url'], cache=cache, token_cache=token_cache
+        )
+
+        assert first is second
+        assert token_cache.hits == 1
+        assert token_cache.misses == 1
+
+    async def test_unknown_kid(self, jwks_server, http_session):
+        cache = JWKSCache(jwks_server['url'])
+        token = signed_token(jwks_server['key'], 'unknown')
+
+        data = await validate_async(token, 'development', jwks_server['url'], cache=cache)
+
+        assert data is None
+
+
+class TestJWKSCache:
+    """Tests for JWKSCache
+    """
+    async def test_concurrent_refreshes(self, key_pair):
+        _, pem = key_pair()
+
+        async def fetcher(url):
+            await asyncio.sleep(0.01)
+            return {'kid1': pem}, time() + 3600
+
+        fetcher = AsyncMock(side_effect=fetcher)
+        cache = JWKSCache('url', fetcher=fetcher)
+
+        keys = await asyncio.gather(*[cache.get_key('kid1') for _ in range(5)])
+
+        fetcher.assert_called_once_with('url')
+        assert all(key is keys[0] for key in keys)
+
+    async def test_stale_while_revalidate(self, key_pair):
+        _, pem = key_pair()
+        _, new_pem = key_pair()
+        fetcher = AsyncMock(return_value=({'kid1': new_pem}, time() + 3600))
+        cache = JWKSCache('url', fetcher=fetcher, refresh_margin=600)
+        cache.update({'kid1': pem}, time() + 60)
+        stale_key = cache.get_key_nowait('kid1')
+
+        key = await cache.get_key('kid1')
+        await asyncio.sleep(0)
+
+        assert key is stale_key
+        fetcher.assert_called_once()
+        assert cache.get_key_nowait('kid1') is not stale_key
+        assert not cache.is_stale()
+
+    async def test_keep_keys_when_refresh_fails(self, key_pair):
+        _, pem = key_pair()
+        fetcher = AsyncMock(side_effect=ValueError('unavailable'))
+        cache = JWKSCache('url', fetcher=fetcher)
+        cache.update({'kid1': pem}, time() - 1)
+
+        key = await cache.get_key('kid1')
+
+        assert key is not None
+        fetcher.assert_called_once()
+
+    async def test_unknown_kid_refresh_is_throttled(self, key_pair):
+        _, pem = key_pair()
+        fetcher = AsyncMock(return_value=({'kid1': pem}, time() + 3600))
+        cache = JWKSCache('url', fetcher=fetcher)
+
+        await cache.get_key('kid1')
+        assert await cache.get_key('other') is None
+        assert await cache.get_key('other') is None
+
+        fetcher.assert_called_once()
+
+
+class TestTokenCache:
+    """Tests for TokenCache
+    """
+    def test_miss_and_hit(self):
+        cache = TokenCache()
+
+        assert cache.get('token') is None
+        cache.set('token', {'exp': time() + 60})
+
+        assert cache.get('token') == {'exp': pytest.approx(time() + 60, abs=1)}
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_expire_with_token(self):
+        cache = TokenCache()
+        cache.set('token', {'exp': time() - 1})
+
+        assert cache.get('token') is None
+        assert len(cache) == 0
+
+    def test_evict_least_recently_used(self):
+        cache = TokenCache(max_size=2)
+        for token in ('t1', 't2'):
+            cache.set(token, {'exp': time() + 60})
+
+        cache.get('t1')
+        cache.set('t3', {'exp': time() + 60})
+
+        assert cache.get('t2') is None
+        assert cache.get('t1') is not None
+        assert cache.get('t3') is not None
+
+
+def test_parse_expires():
+    assert jwt_validator.parse_expires('Thu, 01 Jan 1970 00:01:00 GMT') == 60
@@ -0,0 +1,133 @@
+"""Tests for logme
+"""
+from unittest.mock import patch
+import asyncio
+import threading
+
+from styler_rest_framework.helpers.logme import LogMeQueue
+from styler_rest_framework.metrics import metrics
+
+
+class TestLogMeQueue:
+    """Tests for LogMeQueue
+    """
+    @patch('styler_rest_framework.helpers.logme.logme')
+    async def test_flush_in_batches(self, mocked_logme):
+        queue = LogMeQueue('dataset', 'table', batch_size=2, flush_interval=60)
+        for i in range(3):
+            queue.put((i,))
+
+        await queue.close()
+
+        assert mocked_logme.call_count == 2
+        mocked_logme.assert_any_call('dataset', 'table', [(0,), (1,)])
+        mocked_logme.assert_any_call('dataset', 'table', [(2,)])
+        assert queue.published == 3
+        assert len(queue) == 0
+        batches = metrics.LOGME_BATCH_SIZE.labels()
+        assert batches.sum == 3
+        assert sum(batches.counts) == 2
+
+    @patch('styler_rest_framework.helpers.logme.logme')
+    async def test_size_trigger(self, mocked_logme):
+        queue = LogMeQueue('dataset', 'table', batch_size=2, flush_interval=60)
+
+        queue.put((1,))
+        queue.put((2,))
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+
+        mocked_logme.assert_called_once_with('dataset', 'table', [(1,), (2,)])
+        await queue.close()
+
+    @patch('styler_rest_framework.helpers.logme.logme')
+    async def test_time_trigger(self, mocked_logme):
+        queue = LogMeQueue('dataset', 'table', batch_size=10, flush_interval=0.01)
+
+        queue.put((1,))
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+
+        mocked_logme.assert_called_once_with('dataset', 'table', [(1,)])
+        await queue.close()
+
+    @patch('styler_rest_framework.helpers.logme.logme')
+    async def test_several_loops(self, mocked_logme):
+        queue = LogMeQueue('dataset', 'table', batch_size=2, flush_interval=60)
+        other = asyncio.new_event_loop()
+        thread = threading.Thread(target=other.run_forever)
+        thread.start()
+
+        async def put(row):
+            queue.put(row)
+
+        try:
+            queue.put((1,))
+            asyncio.run_coroutine_threadsafe(put((2,)), other).result(1)
+            queue.put((3,))
+            asyncio.run_coroutine_threadsafe(put((4,)), other).result(1)
+            for _ in range(10):
+                await asyncio.sleep(0.01)
+
+            assert len(queue._flushers) == 2
+            assert not any(task.done() for task, _ in queue._flushers.values())
+            asyncio.run_coroutine_threadsafe(queue.close(), other).result(1)
+        finally:
+            other.call_soon_threadsafe(other.stop)
+            thread.join()
+            other.close()
+        await queue.close()
+
+        assert queue.published == 4
+        assert len(queue._flushers) == 0
+
+    @patch('styler_rest_framework.helpers.logme.logme')
+    def test_drop_closed_loops(self, mocked_logme):
+        queue = LogMeQueue('dataset', 'table', batch_size=10, flush_interval=60)
+
+        async def put(row):
+            queue.put(row)
+
+        for number in range(3):
+            asyncio.run(put((number,)))
+
+        async def put_and_close(row):
+            queue.put(row)
+            assert len(queue._flushers) == 1
+            await queue.close()
+
+        asyncio.run(put_and_close((3,)))
+
+        assert queue.published == 4
+        assert len(queue._flushers) == 0
+
+    @patch('styler_rest_framework.helpers.logme.logme')
+    def test_drop_newest(self, mocked_logme):
+        queue = LogMeQueue('dataset', 'table', max_size=2)
+
+        results = [queue.put((i,)) for i in range(3)]
+
+        assert results == [True, True, False]
+        assert queue.dropped == 1
+        assert list(queue._rows) == [(0,), (1,)]
+        mocked_logme.assert_not_called()
+
+    def test_drop_oldest(self):
+        queue = LogMeQueue('dataset', 'table', max_size=2, drop_oldest=True)
+
+        results = [queue.put((i,)) for i in range(3)]
+
+        assert results == [True, True, True]
+        assert queue.dropped == 1
+        assert list(queue._rows) == [(1,), (2,)]
+
+    @patch('styler_rest_framework.helpers.logme.logme')
+    async def test_publish_error(self, mocked_logme):
+        mocked_logme.side_effect = ValueError('Something went wrong')
+        queue = LogMeQueue('dataset', 'table')
+        queue.put((1,))
+
+        await queue.close()
+
+        assert queue.failed == 1
+        assert queue.published == 0
@@ -0,0 +1,169 @@
+"""Tests for the retry policy
+"""
+from unittest.mock import Mock, patch
+
+import pytest
+
+from styler_rest_framework.helpers.retry import RetryBudget, RetryPolicy
+
+
+class TestDelay:
+    """Tests for the back-off delays"""
+
+    def test_full_jitter_bounds(self):
+        policy = RetryPolicy(base_delay=1, max_delay=10)
+
+        for retry, cap in [(0, 1), (1, 2), (2, 4), (3, 8), (4, 10), (10, 10)]:
+            delays = [policy.delay(retry) for _ in range(200)]
+            assert all(0 <= delay <= cap for delay in delays)
+            assert max(delays) > cap / 2
+
+    @patch("styler_rest_framework.helpers.retry.random.uniform")
+    def test_uses_cap_as_upper_bound(self, mock_uniform):
+        policy = RetryPolicy(base_delay=0.5, max_delay=3, multiplier=3)
+
+        policy.delay(2)
+
+        mock_uniform.assert_called_once_with(0, 3)
+
+
+@patch("styler_rest_framework.helpers.retry.time.sleep")
+class TestCall:
+    """Tests for the sync calls"""
+
+    def test_success(self, mock_sleep):
+        policy = RetryPolicy()
+
+        assert policy.call(lambda a, b: a + b, 1, b=2) == 3
+        assert policy.attempts == 1
+        mock_sleep.assert_not_called()
+
+    def test_retry_then_succeed(self, mock_sleep):
+        func = Mock(side_effect=[ValueError(), ValueError(), "ok"])
+        policy = RetryPolicy(base_delay=1)
+
+        assert policy.call(func) == "ok"
+        assert policy.attempts == 3
+        assert policy.retries == 2
+        assert policy.give_ups == 0
+        assert mock_sleep.call_count == 2
+
+    def test_give_up_after_max_retries(self, mock_sleep):
+        func = Mock(side_effect=ValueError())
+        policy = RetryPolicy(max_retries=2)
+
+        with pytest.raises(ValueError):
+            policy.call(func)
+        assert func.call_count == 3
+        assert policy.give_ups == 1
+
+    def test_max_retries_override(self, mock_sleep):
+        func = Mock(side_effect=ValueError())
+        policy = RetryPolicy(max_retries=2)
+
+        with pytest.raises(ValueError):
+            policy.call(func, max_retries=0)
+        assert func.call_count == 1
+
+    def test_not_retryable_type(self, mock_sleep):
+        func = Mock(side_effect=KeyError())
+        policy = RetryPolicy(retry_on=(ValueError,))
+
+        with pytest.raises(KeyError):
+            policy.call(func)
+        assert func.call_count == 1
+        assert policy.give_ups == 0
+
+    def test_predicate(self, mock_sleep):
+        func = Mock(side_effect=[ValueError("retry"), ValueError("stop")])
+        policy = RetryPolicy(retry_on=lambda ex: str(ex) == "retry")
+
+        with pytest.raises(ValueError, match="stop"):
+            policy.call(func)
+        assert func.call_count == 2
+
+    def test_retry_if_override(self, mock_sleep):
+        func = Mock(side_effect=[KeyError(), "ok"])
+        policy = RetryPolicy(retry_on=(ValueError,))
+
+        assert policy.call(func, retry_if=lambda ex: isinstance(ex, KeyError)) == "ok"
+
+    def test_max_elapsed(self, mock_sleep):
+        func = Mock(side_effect=ValueError())
+        policy = RetryPolicy(max_retries=10, base_delay=5, max_elapsed=1)
+
+        with patch("styler_rest_framework.helpers.retry.random.uniform", return_value=2):
+            with pytest.raises(ValueError):
+                policy.call(func)
+        assert func.call_count == 1
+        assert policy.give_ups == 1
+
+    def test_deadline(self, mock_sleep):
+        func = Mock(side_effect=ValueError())
+        policy = RetryPolicy(max_retries=10, base_delay=1)
+
+        with patch("styler_rest_framework.helpers.retry.time.monotonic", return_value=100):
+            with patch("styler_rest_framework.helpers.retry.random.uniform", return_value=0.5):
+                with pytest.raises(ValueError):
+                    policy.call(func, deadline=100.4)
+        assert func.call_count == 1
+        assert policy.give_ups == 1
+
+    def test_budget(self, mock_sleep):
+        budget = RetryBudget(max_retries=2)
+        policy = RetryPolicy(max_retries=5, budget=budget)
+
+        with pytest.raises(ValueError):
+            policy.call(Mock(side_effect=ValueError()))
+        assert policy.retries == 2
+
+        # The budget is shared, the next call does not retry
+        func = Mock(side_effect=ValueError())
+        with pytest.raises(ValueError):
+            policy.call(func)
+        assert func.call_count == 1
+
+
+class TestRetryBudget:
+    """Tests for the retry budget"""
+
+    def test_window(self):
+        budget = RetryBudget(max_retries=1, window=10)
+
+        with patch("styler_rest_framework.helpers.retry.time.monotonic", return_value=100):
+            assert budget.acquire()
+            assert not budget.acquire()
+        with patch("styler_rest_framework.helpers.retry.time.monotonic", return_value=111):
+            assert budget.acquire()
+
+
+class TestCallAsync:
+    """Tests for the async calls"""
+
+    @patch("styler_rest_framework.helpers.retry.asyncio.sleep")
+    async def test_retry_then_succeed(self, mock_sleep):
+        calls = []
+
+        async def func(value):
+            calls.append(value)
+            if len(calls) < 3:
+                raise ValueError()
+            return value
+
+        policy = RetryPolicy(base_delay=1)
+
+        assert await policy.call_async(func, "ok") == "ok"
+        assert policy.attempts == 3
+        assert mock_sleep.await_count == 2
+        assert all(0 <= c.args[0] <= 2 for c in mock_sleep.await_args_list)
+
+    async def test_give_up(self):
+        async def func():
+            raise ValueError()
+
+        policy = RetryPolicy(max_retries=1, base_delay=0)
+
+        with pytest.raises(ValueError):
+            await policy.call_async(func)
+        assert policy.attempts == 2
+        assert policy.give_ups == 1
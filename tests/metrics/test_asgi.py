@@ -0,0 +1,71 @@
+""" Tests for the ASGI metrics middleware
+"""
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+import pytest
+
+from styler_rest_framework.metrics import metrics
+from styler_rest_framework.metrics.asgi import config_asgi_metrics
+
+
+@pytest.fixture
+def create_client():
+    def create(**kwargs):
+        app = FastAPI()
+        config_asgi_metrics(app, **kwargs)
+
+        @app.get('/items/{item_id}')
+        async def item(item_id: int):
+            assert metrics.REQUESTS_IN_FLIGHT.labels().value == 1
+            return {}
+
+        @app.get('/error')
+        async def error():
+            raise HTTPException(status_code=503)
+
+        @app.get('/crash')
+        async def crash():
+            raise RuntimeError('crash')
+
+        return TestClient(app, raise_server_exceptions=False)
+    return create
+
+
+class TestMiddleware:
+    """ Tests for the metrics middleware
+    """
+    def test_request_duration(self, create_client):
+        client = create_client()
+
+        client.get('/items/1')
+        client.get('/items/2')
+        client.get('/error')
+        client.get('/crash')
+        client.get('/missing')
+
+        durations = metrics.REQUEST_DURATION
+        assert sum(durations.labels('GET', '/items/{item_id}', 200).counts) == 2
+        assert sum(durations.labels('GET', '/error', 503).counts) == 1
+        assert sum(durations.labels('GET', '/crash', 500).counts) == 1
+        assert sum(durations.labels('GET', 'unmatched', 404).counts) == 1
+        assert metrics.REQUESTS_IN_FLIGHT.labels().value == 0
+
+    def test_expose(self, create_client):
+        client = create_client()
+        client.get('/items/1')
+
+        resp = client.get('/metrics')
+
+        assert resp.status_code == 200
+        assert resp.headers['Content-Type'] == metrics.CONTENT_TYPE
+        assert (
+            'http_server_request_duration_seconds_count'
+            '{method="GET",route="/items/{item_id}",status="200"} 1\n'
+        ) in resp.text
+        assert 'route="/metrics"' not in resp.text
+
+    def test_not_exposed(self, create_client):
+        client = create_client(expose=False)
+
+        assert client.get('/metrics').status_code == 404
@@ -0,0 +1,131 @@
+""" Tests for the metrics
+"""
+
+import pytest
+
+from styler_rest_framework.metrics import Counter, Gauge, Histogram, expose
+from styler_rest_framework.metrics import metrics
+from styler_rest_framework.services import circuit_breaker
+
+
+class TestCounter:
+    """ Tests for Counter
+    """
+    def test_labels(self):
+        counter = Counter('requests_total', 'Requests', ['route'], register=False)
+
+        counter.labels('/items').inc()
+        counter.labels('/items').inc(2)
+        counter.labels('/shops').inc()
+
+        assert counter.expose() == '\n'.join([
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{route="/items"} 3',
+            'requests_total{route="/shops"} 1',
+        ])
+
+    def test_bound_labels(self):
+        counter = Counter('requests_total', 'Requests', ['route'], register=False)
+
+        assert counter.labels('/items') is counter.labels('/items')
+
+    def test_without_labels(self):
+        counter = Counter('requests_total', 'Requests', register=False)
+
+        counter.inc()
+
+        assert counter.expose().endswith('\nrequests_total 1')
+
+    def test_wrong_labels(self):
+        counter = Counter('requests_total', 'Requests', ['route'], register=False)
+
+        with pytest.raises(ValueError):
+            counter.labels('/items', 200)
+
+    def test_escape(self):
+        counter = Counter('requests_total', 'Requests\nall', ['route'], register=False)
+
+        counter.labels('a"b\\c\nd').inc()
+
+        assert counter.expose() == '\n'.join([
+            '# HELP requests_total Requests\\nall',
+            '# TYPE requests_total counter',
+            'requests_total{route="a\\"b\\\\c\\nd"} 1',
+        ])
+
+
+class TestGauge:
+    """ Tests for Gauge
+    """
+    def test_gauge(self):
+        gauge = Gauge('in_flight', 'In flight', register=False)
+
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        assert gauge.expose().endswith('\nin_flight 1')
+        gauge.set(0.5)
+        assert gauge.expose().endswith('\nin_flight 0.5')
+
+
+class TestHistogram:
+    """ Tests for Histogram
+    """
+    def test_histogram(self):
+        histogram = Histogram(
+            'duration_seconds', 'Duration', ['status'], buckets=[0.1, 1], register=False
+        )
+
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.labels(200).observe(value)
+
+        assert histogram.expose() == '\n'.join([
+            '# HELP duration_seconds Duration',
+            '# TYPE duration_seconds histogram',
+            'duration_seconds_bucket{status="200",le="0.1"} 2',
+            'duration_seconds_bucket{status="200",le="1"} 3',
+            'duration_seconds_bucket{status="200",le="+Inf"} 4',
+            'duration_seconds_sum{status="200"} 3.65',
+            'duration_seconds_count{status="200"} 4',
+        ])
+
+    def test_default_buckets(self):
+        histogram = Histogram('duration_seconds', 'Duration', register=False)
+
+        assert histogram.buckets == tuple(sorted(metrics.defaults.METRICS_BUCKETS))
+
+
+class TestExpose:
+    """ Tests for expose
+    """
+    def test_framework_metrics(self):
+        metrics.REQUEST_DURATION.labels('GET', '/items', 200).observe(0.01)
+
+        text = expose()
+
+        assert '# TYPE http_server_request_duration_seconds histogram\n' in text
+        assert (
+            'http_server_request_duration_seconds_count'
+            '{method="GET",route="/items",status="200"} 1\n'
+        ) in text
+        assert text.endswith('\n')
+
+    def test_reset(self):
+        metrics.CLIENT_RETRIES.labels('some.url').inc()
+
+        metrics.reset()
+
+        assert 'http_client_retries_total{' not in expose()
+
+    def test_circuit_breakers(self):
+        breaker = circuit_breaker.get_breaker('some.url:443')
+        breaker._open()
+        breaker.allow()
+
+        text = expose()
+
+        assert 'http_client_circuit_state{host="some.url:443"} 2\n' in text
+        assert 'http_client_circuit_opened_total{host="some.url:443"} 1\n' in text
+        assert 'http_client_circuit_rejected_total{host="some.url:443"} 1\n' in text
@@ -0,0 +1,68 @@
+""" Tests for the aiohttp metrics middleware
+"""
+
+from aiohttp import web
+import pytest
+
+from styler_rest_framework.metrics import metrics
+from styler_rest_framework.metrics.middleware import config_metrics
+
+
+@pytest.fixture
+def create_client(aiohttp_client):
+    async def create(**kwargs):
+        app = web.Application()
+        config_metrics(app, **kwargs)
+
+        async def item(request):
+            assert metrics.REQUESTS_IN_FLIGHT.labels().value == 1
+            return web.json_response({})
+
+        async def error(request):
+            raise web.HTTPServiceUnavailable()
+
+        app.router.add_get('/items/{item_id}', item)
+        app.router.add_get('/error', error)
+        return await aiohttp_client(app)
+    return create
+
+
+class TestMiddleware:
+    """ Tests for the metrics middleware
+    """
+    async def test_request_duration(self, create_client):
+        client = await create_client()
+
+        await client.get('/items/1')
+        await client.get('/items/2')
+        await client.get('/error')
+        await client.get('/missing')
+
+        durations = metrics.REQUEST_DURATION
+        assert sum(durations.labels('GET', '/items/{item_id}', 200).counts) == 2
+        assert sum(durations.labels('GET', '/error', 503).counts) == 1
+        assert sum(durations.labels('GET', 'unmatched', 404).counts) == 1
+        assert metrics.REQUESTS_IN_FLIGHT.labels().value == 0
+
+    async def test_expose(self, create_client):
+        client = await create_client()
+        await client.get('/items/1')
+
+        resp = await client.get('/metrics')
+
+        assert resp.status == 200
+        assert resp.headers['Content-Type'] == metrics.CONTENT_TYPE
+        text = await resp.text()
+        assert (
+            'http_server_request_duration_seconds_count'
+            '{method="GET",route="/items/{item_id}",status="200"} 1\n'
+        ) in text
+        # The metrics endpoint is not measured
+        assert 'route="/metrics"' not in text
+
+    async def test_not_exposed(self, create_client):
+        client = await create_client(expose=False)
+
+        resp = await client.get('/metrics')
+
+        assert resp.status == 404
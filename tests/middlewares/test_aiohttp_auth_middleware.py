@@ -2,10 +2,12 @@
 """
 
 from json.decoder import JSONDecodeError
-from unittest.mock import AsyncMock, Mock, patch
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 import asyncio
 
 from aiohttp.web import HTTPException
+from multidict import CIMultiDict
+from styler_rest_framework.api.request_scope import RequestScope
 from styler_rest_framework.middlewares.aiohttp.auth_middleware import add_auth_middleware
 import pytest
 
@@ -17,9 +19,9 @@ def test_generator():
     assert callable(mid)
 
 
-@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate', Mock(return_value=True))
+@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '111'}))
 def test_normal_flow():
-    request = Mock()
+    request = MagicMock()
     request.path = '/some/path'
     request.headers = Mock()
     request.headers.get.return_value = 'bearer token'
@@ -31,7 +33,7 @@ def test_normal_flow():
     assert resp == 'response'
 
 
-@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate', Mock(return_value=False))
+@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate_async', AsyncMock(return_value=False))
 def test_exclude_path():
     request = Mock()
     request.path = '/some/path'
@@ -52,7 +54,7 @@ cases = [
     ('/path/1234/something', False),
 ]
 @pytest.mark.parametrize('path, expected', cases)
-@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate', Mock(return_value=False))
+@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate_async', AsyncMock(return_value=False))
 def test_exclude_regex_path(path, expected):
     request = Mock()
     request.path = path
@@ -66,7 +68,7 @@ def test_exclude_regex_path(path, expected):
     assert expected == (resp == 'response')
 
 
-@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate', Mock(return_value=False))
+@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate_async', AsyncMock(return_value=False))
 def test_missing_jwt():
     request = Mock()
     request.path = '/some/path'
@@ -80,7 +82,7 @@ def test_missing_jwt():
     assert resp.status == 401
 
 
-@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate', Mock(return_value=False))
+@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate_async', AsyncMock(return_value=False))
 def test_invalid_jwt():
     request = Mock()
     request.path = '/some/path'
@@ -94,9 +96,9 @@ def test_invalid_jwt():
     assert resp.status == 401
 
 
-@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate', Mock(return_value=True))
+@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '111'}))
 def test_pass_exceptions():
-    request = Mock()
+    request = MagicMock()
     request.path = '/some/path'
     request.headers = Mock()
     request.headers.get.return_value = 'bearer token'
@@ -107,9 +109,9 @@ def test_pass_exceptions():
         _ = asyncio.run(middleware(request, handler))
 
 
-@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate', Mock(return_value=True))
+@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '111'}))
 def test_pass_http_exceptions():
-    request = Mock()
+    request = MagicMock()
     request.path = '/some/path'
     request.headers = Mock()
     request.headers.get.return_value = 'bearer token'
@@ -118,3 +120,42 @@ def test_pass_http_exceptions():
 
     with pytest.raises(HTTPException):
         _ = asyncio.run(middleware(request, handler))
+
+
+class MockRequest(dict):
+    def __init__(self, path, headers):
+        super().__init__()
+        self.path = path
+        self.headers = headers
+
+
+@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '1234'}))
+def test_store_jwt_data_and_identity():
+    request = MockRequest('/some/path', CIMultiDict({'Authorization': 'Bearer token'}))
+    handler = AsyncMock(return_value='response')
+    middleware = add_auth_middleware(Mock(), 'development')
+
+    asyncio.run(middleware(request, handler))
+
+    assert request['jwt_data'] == {'user_id': '1234'}
+    assert isinstance(request['identity'], RequestScope)
+    assert request['identity'].user_id() == '1234'
+    assert request['identity'].token() == 'token'
+
+
+@patch('styler_rest_framework.middlewares.aiohttp.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '1234'}))
+def test_no_identity_without_bearer():
+    request = MockRequest('/some/path', CIMultiDict({'Authorization': 'token'}))
+    handler = AsyncMock(return_value='response')
+    middleware = add_auth_middleware(Mock(), 'development')
+
+    resp = asyncio.run(middleware(request, handler))
+
+    assert resp == 'response'
+    assert 'identity' not in request
+
+
+def test_token_cache_size():
+    middleware = add_auth_middleware(Mock(), 'development', token_cache_size=10)
+
+    assert middleware.token_cache.max_size == 10
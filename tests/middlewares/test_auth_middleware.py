@@ -2,9 +2,11 @@
 """
 from unittest.mock import Mock, patch, AsyncMock
 
+from styler_rest_framework.api.request_scope import RequestScope
 from styler_rest_framework.middlewares.fastapi import auth_middleware
-from fastapi import HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
 import pytest
 
 
@@ -33,7 +35,7 @@ class TestAddAuthMiddleware:
 class TestValidateJWTException:
     """ Tests for validating JWT
     """
-    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate', Mock(return_value=True))
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '111'}))
     async def test_valid_jwt(self):
         app = MockFastAPI()
         auth_middleware.add_auth_middleware(app, 'development')
@@ -45,7 +47,21 @@ class TestValidateJWTException:
 
         call_next.assert_called_once()
 
-    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate', Mock(return_value=True))
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '1234'}))
+    async def test_store_jwt_data(self):
+        app = MockFastAPI()
+        auth_middleware.add_auth_middleware(app, 'development')
+        call_next = AsyncMock()
+        request = Mock()
+        request.headers.get.return_value = 'Bearer some_jwt'
+
+        _ = await app.middleware_func(request, call_next)
+
+        assert request.state.jwt_data == {'user_id': '1234'}
+        assert isinstance(request.state.identity, RequestScope)
+        assert request.state.identity.user_id() == '1234'
+
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '111'}))
     async def test_valid_jwt_without_bearer(self):
         app = MockFastAPI()
         auth_middleware.add_auth_middleware(app, 'development')
@@ -57,7 +73,7 @@ class TestValidateJWTException:
 
         call_next.assert_called_once()
 
-    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate', Mock(return_value=True))
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '111'}))
     async def test_missing_jwt(self):
         app = MockFastAPI()
         auth_middleware.add_auth_middleware(app, 'development')
@@ -71,7 +87,7 @@ class TestValidateJWTException:
         assert isinstance(response, JSONResponse)
         assert response.status_code == 401
 
-    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate', Mock(return_value=False))
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value=False))
     async def test_invalid_jwt(self):
         app = MockFastAPI()
         auth_middleware.add_auth_middleware(app, 'development')
@@ -85,7 +101,7 @@ class TestValidateJWTException:
         assert isinstance(response, JSONResponse)
         assert response.status_code == 401
 
-    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate', Mock(return_value=False))
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value=False))
     async def test_exclude_path(self):
         app = MockFastAPI()
         auth_middleware.add_auth_middleware(app, 'development', excludes=['/some/path'])
@@ -108,7 +124,7 @@ class TestValidateJWTException:
         ('/path/1234/something', False),
     ]
     @pytest.mark.parametrize('path, expected', cases)
-    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate', Mock(return_value=False))
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value=False))
     async def test_exclude_regex_path(self, path, expected):
         app = MockFastAPI()
         auth_middleware.add_auth_middleware(app, 'development', excludes_regex=['^/some/path/(\w|\d|-)+/something/?$'])
@@ -123,3 +139,73 @@ class TestValidateJWTException:
             call_next.assert_called_once()
         else:
             assert response.status_code == 401
+
+
+def asgi_app(**kwargs):
+    app = FastAPI()
+    token_cache = auth_middleware.add_auth_middleware(app, 'development', asgi=True, **kwargs)
+
+    @app.get('/identity')
+    def identity(request: Request):
+        return {
+            'jwt_data': request.state.jwt_data,
+            'user_id': request.state.identity.user_id(),
+        }
+
+    @app.get('/public')
+    def public():
+        return {'public': True}
+
+    return app, token_cache
+
+
+class TestAuthMiddleware:
+    """ Tests for the pure ASGI AuthMiddleware
+    """
+    def test_add_asgi_middleware(self):
+        app, token_cache = asgi_app()
+
+        assert app.user_middleware[0].cls is auth_middleware.AuthMiddleware
+        assert app.user_middleware[0].kwargs['token_cache'] is token_cache
+
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '1234'}))
+    def test_valid_jwt(self):
+        app, _ = asgi_app()
+
+        response = TestClient(app).get('/identity', headers={'Authorization': 'Bearer some_jwt'})
+
+        assert response.status_code == 200
+        assert response.json() == {'jwt_data': {'user_id': '1234'}, 'user_id': '1234'}
+
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value={'user_id': '1234'}))
+    def test_missing_jwt(self):
+        app, _ = asgi_app()
+
+        response = TestClient(app).get('/identity')
+
+        assert response.status_code == 401
+        assert response.json() == {'error': 'Missing JWT token'}
+
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value=None))
+    def test_invalid_jwt(self):
+        app, _ = asgi_app()
+
+        response = TestClient(app).get('/identity', headers={'Authorization': 'Bearer some_jwt'})
+
+        assert response.status_code == 401
+        assert response.json() == {'error': 'Invalid JWT token'}
+
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value=None))
+    def test_exclude_path(self):
+        client = TestClient(asgi_app(excludes=['/public'])[0])
+
+        assert client.get('/public').status_code == 200
+        assert client.get('/identity').status_code == 401
+
+    @patch('styler_rest_framework.middlewares.fastapi.auth_middleware.validate_async', AsyncMock(return_value=None))
+    def test_exclude_regex_path(self):
+        app, _ = asgi_app(excludes_regex=['^/pub'])
+
+        response = TestClient(app).get('/public')
+
+        assert response.status_code == 200
@@ -3,8 +3,9 @@
 from unittest.mock import Mock, patch, AsyncMock
 
 from styler_rest_framework.middlewares.fastapi import exception_middleware
-from fastapi import HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
 import pytest
 
 
@@ -79,3 +80,66 @@ class TestHandleException:
 
         assert isinstance(response, JSONResponse)
         assert response.status_code == 200
+
+
+def asgi_app(**kwargs):
+    app = FastAPI()
+    exception_middleware.add_exception_middleware(app, asgi=True, **kwargs)
+
+    @app.get('/ok')
+    def ok():
+        return {'ok': True}
+
+    @app.get('/error')
+    def error():
+        raise Exception('Error')
+
+    @app.get('/http-error')
+    def http_error():
+        raise HTTPException(status_code=400, detail='Bad request')
+
+    @app.get('/stream')
+    def stream():
+        return StreamingResponse(iter([b'a', b'b', b'c']))
+
+    return app
+
+
+class TestExceptionMiddleware:
+    """ Tests for the pure ASGI ExceptionMiddleware
+    """
+    def test_add_asgi_middleware(self):
+        app = asgi_app()
+
+        assert app.user_middleware[0].cls is exception_middleware.ExceptionMiddleware
+
+    def test_no_exception(self):
+        response = TestClient(asgi_app()).get('/ok')
+
+        assert response.status_code == 200
+        assert response.json() == {'ok': True}
+
+    def test_streaming_response(self):
+        response = TestClient(asgi_app()).get('/stream')
+
+        assert response.content == b'abc'
+
+    @patch('logging.exception')
+    def test_handle_exception(self, logging_mocked):
+        error_handler = Mock()
+        app = asgi_app(error_handler=error_handler, generic_message='Oops', status_code=503)
+
+        response = TestClient(app).get('/error')
+
+        assert response.status_code == 503
+        assert response.json() == {'error': 'Oops'}
+        logging_mocked.assert_called_once()
+        request, ex = error_handler.call_args[0]
+        assert request.url.path == '/error'
+        assert str(ex) == 'Error'
+
+    def test_http_exception(self):
+        response = TestClient(asgi_app()).get('/http-error')
+
+        assert response.status_code == 400
+        assert response.json() == {'detail': 'Bad request'}
@@ -0,0 +1,68 @@
+from styler_rest_framework.middlewares.path_matcher import PathMatcher
+import re
+import pytest
+
+
+class TestPathMatcher:
+    def test_empty(self):
+        matcher = PathMatcher()
+
+        assert not matcher.match('/')
+        assert not matcher.match('/some/path')
+
+    def test_exact_paths(self):
+        matcher = PathMatcher(['/health', '/webhook'])
+
+        assert matcher.match('/health')
+        assert matcher.match('/webhook')
+        assert not matcher.match('/health/')
+        assert not matcher.match('/other')
+
+    @pytest.mark.parametrize('path,expected', [
+        ('/some/path/f1225763-3eef-4067-b1ab-17d99b126eab', True),
+        ('/some/path/f1225763-3eef-4067-b1ab-17d99b126eab/something', True),
+        ('/public/file.txt', True),
+        ('/prefix/public/file.txt', False),
+        ('/other', False),
+    ])
+    def test_patterns(self, path, expected):
+        matcher = PathMatcher(patterns=[
+            r'/some/path/[0-9a-f\-]{36}',
+            r'/public/.*',
+        ])
+
+        assert matcher.match(path) is expected
+
+    def test_paths_and_patterns(self):
+        matcher = PathMatcher(['/health'], [r'/hooks/\w+$'])
+
+        assert matcher.match('/health')
+        assert matcher.match('/hooks/stripe')
+        assert not matcher.match('/hooks/stripe/1')
+
+    def test_alternation_is_isolated(self):
+        matcher = PathMatcher(patterns=[r'/a$|/b$', r'/c$'])
+
+        assert matcher.match('/b')
+        assert matcher.match('/c')
+        assert not matcher.match('/bc')
+
+    @pytest.mark.parametrize('patterns,path', [
+        ([r'/(a)\1', r'/(b)\1'], '/bb'),
+        ([r'/(?P<id>\d+)$', r'/x/(?P<id>\d+)$'], '/x/1'),
+        ([r'/lower', r'(?i)/upper'], '/UPPER'),
+    ])
+    def test_patterns_not_combinable(self, patterns, path):
+        matcher = PathMatcher(patterns=patterns)
+
+        assert matcher.match(path)
+        assert not matcher.match('/nothing')
+
+    def test_inline_flags_are_isolated(self):
+        matcher = PathMatcher(patterns=[r'(?i)^/webhook', r'^/public'])
+
+        assert matcher.match('/WEBHOOK/stripe')
+        assert matcher.match('/public/file.txt')
+        assert not matcher.match('/PUBLIC/admin')
+        assert not matcher._regex.flags & re.IGNORECASE
+        assert len(matcher._fallback) == 1
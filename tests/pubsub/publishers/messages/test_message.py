@@ -0,0 +1,89 @@
+""" Tests for the base message encoding
+"""
+
+from datetime import date, datetime, time, timezone
+from unittest.mock import patch
+from uuid import UUID
+import json
+
+from styler_rest_framework.pubsub.publishers import messages
+from styler_rest_framework.pubsub.publishers.messages import Message
+import pytest
+
+
+class Nested:
+    def __init__(self):
+        self.value = '値'
+
+
+class MockMessage(Message):
+    def __init__(self, arg):
+        self.name = 'MockMessage'
+        self.arg = arg
+
+
+class TestEncoded:
+    """ Tests for Message.encoded
+    """
+    def test_compact(self):
+        msg = MockMessage({'a': [1, 2], 'b': None})
+
+        assert msg.encoded() == b'{"name":"MockMessage","arg":{"a":[1,2],"b":null}}'
+
+    @pytest.mark.parametrize('backend', ['auto', 'json'])
+    def test_same_bytes_for_every_backend(self, backend):
+        msg = MockMessage({0: 'zero', 'nested': Nested(), 'tuple': (1, 'x')})
+
+        with patch.object(messages.defaults, 'PUBSUB_JSON_BACKEND', backend):
+            data = msg.encoded()
+
+        assert data == (
+            '{"name":"MockMessage","arg":{"0":"zero",'
+            '"nested":{"value":"値"},"tuple":[1,"x"]}}'
+        ).encode('utf-8')
+
+    @pytest.mark.parametrize('value', [
+        {'a': [1, 2.5, None, True], 'b': '値\u2028'},
+        {0: 'zero', 'nested': Nested(), 'tuple': (1, 'x')},
+        {'date': date(2020, 1, 2), 'time': time(3, 4, 5)},
+        {'datetime': datetime(2020, 1, 2, 3, 4, 5, 6000, tzinfo=timezone.utc)},
+        {'uuid': UUID('12345678-1234-5678-1234-567812345678')},
+        {'nan': float('nan'), 'inf': [float('inf'), None]},
+        {'nested': Nested(), 'value': -float('inf')},
+        {'big': 2 ** 70},
+    ])
+    def test_backends_parity(self, value):
+        msg = MockMessage(value)
+
+        with patch.object(messages.defaults, 'PUBSUB_JSON_BACKEND', 'json'):
+            expected = msg.encoded()
+        with patch.object(messages.defaults, 'PUBSUB_JSON_BACKEND', 'auto'):
+            data = msg.encoded()
+
+        assert data == expected
+
+    def test_non_finite_numbers(self):
+        data = MockMessage({'value': float('nan')}).encoded()
+
+        assert data == b'{"name":"MockMessage","arg":{"value":NaN}}'
+
+    def test_fallback_for_big_integers(self):
+        msg = MockMessage({'big': 2 ** 70})
+
+        assert json.loads(msg.encoded())['arg']['big'] == 2 ** 70
+
+
+class TestCompression:
+    """ Tests for compress and decompress
+    """
+    def test_round_trip(self):
+        data = MockMessage({'a': 'b' * 100}).encoded()
+
+        compressed = messages.compress(data)
+
+        assert len(compressed) < len(data)
+        assert messages.decompress(compressed, {'content_encoding': 'gzip'}) == data
+
+    def test_not_compressed(self):
+        assert messages.decompress(b'data', {'version': '1'}) == b'data'
+        assert messages.decompress(b'data') == b'data'
@@ -1,12 +1,17 @@
 """ Tests for the shops publisher
 """
 
+from concurrent import futures
 from unittest.mock import Mock, patch
+import asyncio
+import gzip
 
 from styler_rest_framework.pubsub.publishers import (
     pubsub_handler as handler,
+    async_publisher_for_message,
     publisher_for_message,
 )
+from styler_rest_framework.metrics import metrics
 from styler_rest_framework.pubsub.publishers.messages import (
     Message
 )
@@ -41,6 +46,103 @@ class TestGetCallback:
         mocked_logging.assert_called_once()
 
 
+@pytest.fixture
+def publisher_client():
+    with patch.object(handler.pubsub_v1, 'PublisherClient') as mocked_client:
+        mocked_client.return_value.publish.side_effect = (
+            lambda *args, **kwargs: futures.Future()
+        )
+        yield mocked_client
+    handler._publishers.clear()
+    handler._batch_settings.clear()
+    handler._pending.clear()
+
+
+class TestGetPublisher:
+    """ Tests for get_publisher
+    """
+    def test_reuse_client(self, publisher_client):
+        first = handler.get_publisher('my-topic')
+        second = handler.get_publisher('my-topic')
+
+        assert first is second
+        publisher_client.assert_called_once()
+
+    def test_client_per_topic(self, publisher_client):
+        handler.get_publisher('my-topic')
+        handler.get_publisher('other-topic')
+
+        assert publisher_client.call_count == 2
+
+    def test_batch_settings(self, publisher_client):
+        handler.configure_batching('my-topic', max_messages=5, max_latency=1)
+
+        handler.get_publisher('my-topic')
+
+        settings = publisher_client.call_args.kwargs['batch_settings']
+        assert settings.max_messages == 5
+        assert settings.max_latency == 1
+
+
+class TestPublishMessage:
+    """ Tests for publish_message
+    """
+    def test_fire_and_forget(self, publisher_client):
+        api_future = handler.publish_message('my-topic', b'data', wait=False)
+
+        assert not api_future.done()
+        assert api_future in handler._pending
+        api_future.set_result('message-id')
+        assert api_future not in handler._pending
+
+    async def test_publish_message_async(self, publisher_client):
+        async def resolve():
+            api_future = next(iter(handler._pending))
+            api_future.set_result('message-id')
+
+        task = asyncio.ensure_future(
+            handler.publish_message_async('my-topic', b'data')
+        )
+        await asyncio.sleep(0)
+        await resolve()
+
+        assert await task == 'message-id'
+
+    def test_compress(self, publisher_client):
+        handler.publish_message('my-topic', b'data', wait=False, compress=True)
+
+        kwargs = publisher_client.return_value.publish.call_args.kwargs
+        assert kwargs['content_encoding'] == 'gzip'
+        assert gzip.decompress(kwargs['data']) == b'data'
+
+    def test_flush(self, publisher_client):
+        api_future = handler.publish_message('my-topic', b'data', wait=False)
+
+        assert not handler.flush(timeout=0.01)
+        api_future.set_result('message-id')
+        assert handler.flush(timeout=0.01)
+
+    def test_publish_latency(self, publisher_client):
+        sent = handler.publish_message('projects/p/topics/my-topic', b'data', wait=False)
+        failed = handler.publish_message('projects/p/topics/my-topic', b'data', wait=False)
+
+        sent.set_result('message-id')
+        with patch('logging.error'):
+            failed.set_exception(RuntimeError('unavailable'))
+
+        assert metrics.PUBSUB_PUBLISH_DURATION.labels('my-topic', 'ok').counts[-1] == 0
+        assert sum(metrics.PUBSUB_PUBLISH_DURATION.labels('my-topic', 'ok').counts) == 1
+        assert sum(metrics.PUBSUB_PUBLISH_DURATION.labels('my-topic', 'error').counts) == 1
+
+    def test_shutdown(self, publisher_client):
+        client = handler.get_publisher('my-topic')
+
+        handler.shutdown()
+
+        client.stop.assert_called_once()
+        assert handler._publishers == {}
+
+
 class MockMessage(Message):
     def __init__(self, some_data):
         self.name = 'MockMessage'
@@ -57,3 +159,21 @@ class TestPublisher:
         func({'aaa': 123})
 
         mocked_publisher.assert_called_once()
+
+    @patch('styler_rest_framework.pubsub.publishers.publish_message')
+    def test_publisher_without_wait(self, mocked_publisher):
+        func = publisher_for_message(MockMessage, 'my-topic', wait=False)
+
+        result = func({'aaa': 123})
+
+        assert result == mocked_publisher.return_value
+        assert mocked_publisher.call_args.kwargs['wait'] is False
+
+    @patch('styler_rest_framework.pubsub.publishers.publish_message_async')
+    async def test_async_publisher_for_message(self, mocked_publisher):
+        mocked_publisher.return_value = 'message-id'
+        func = async_publisher_for_message(MockMessage, 'my-topic')
+
+        result = await func({'aaa': 123})
+
+        assert result == 'message-id'
@@ -0,0 +1,182 @@
+""" Tests for the async message router
+"""
+
+from unittest.mock import Mock
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from styler_rest_framework.pubsub import AsyncMessageRouter
+
+
+def create_message(name='my_msg', arg=None):
+    message = Mock()
+    message.data = json.dumps({'name': name, 'arg': arg or {'aaa': 'bbb'}}).encode('utf-8')
+    message.attributes = {}
+    return message
+
+
+@pytest.fixture
+def error_handler():
+    return Mock()
+
+
+@pytest.fixture
+def router(error_handler):
+    router = AsyncMessageRouter(error_handler=error_handler)
+    yield router
+    router.stop(timeout=1)
+
+
+class TestAddRoute:
+    """ Tests for add_route
+    """
+    def test_add_route(self, router):
+        router.add_route('my_msg', Mock(), max_concurrency=5)
+
+        assert 'my_msg' in router._routes
+        assert router._limits['my_msg'] == 5
+
+    def test_default_concurrency(self):
+        router = AsyncMessageRouter(error_handler=Mock(), max_concurrency=7)
+
+        router.add_route('my_msg', Mock())
+
+        assert router._limits['my_msg'] == 7
+
+
+class TestHandleMessage:
+    """ Tests for handle_message
+    """
+    def test_coroutine_handler(self, router, error_handler):
+        threads = []
+
+        async def handler(arg):
+            threads.append(threading.current_thread())
+            assert arg == {'aaa': 'bbb'}
+
+        router.add_route('my_msg', handler)
+        message = create_message()
+
+        router.handle_message(message).result(timeout=1)
+
+        assert threads[0].name == 'message-router'
+        message.ack.assert_called_once()
+        message.nack.assert_not_called()
+        error_handler.assert_not_called()
+        assert router.acked == 1
+
+    def test_function_handler(self, router):
+        handler = Mock()
+        router.add_route('my_msg', handler)
+        message = create_message()
+
+        router.handle_message(message).result(timeout=1)
+
+        handler.assert_called_once_with({'aaa': 'bbb'})
+        message.ack.assert_called_once()
+
+    def test_handler_error(self, router, error_handler):
+        async def handler(arg):
+            raise ValueError('failed')
+
+        router.add_route('my_msg', handler)
+        message = create_message()
+
+        router.handle_message(message).result(timeout=1)
+
+        message.nack.assert_called_once()
+        message.ack.assert_not_called()
+        error_handler.assert_called_once()
+        assert router.nacked == 1
+
+    def test_invalid_envelope(self, router, error_handler):
+        message = create_message()
+        message.data = json.dumps({'aaa': 'bbb'})
+
+        router.handle_message(message).result(timeout=1)
+
+        message.nack.assert_called_once()
+        error_handler.assert_called_once()
+
+    def test_unknown_route(self, router, error_handler):
+        message = create_message(name='other')
+
+        router.handle_message(message).result(timeout=1)
+
+        message.ack.assert_called_once()
+        error_handler.assert_not_called()
+
+    def test_concurrency_per_route(self, router):
+        in_flight = {'slow': 0, 'max': 0}
+
+        async def slow(arg):
+            in_flight['slow'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['slow'])
+            await asyncio.sleep(0.02)
+            in_flight['slow'] -= 1
+
+        router.add_route('slow', slow, max_concurrency=3)
+        router.add_route('fast', Mock())
+        messages = [create_message('slow') for _ in range(10)]
+
+        for message in messages:
+            router.handle_message(message)
+        fast = create_message('fast')
+        router.handle_message(fast).result(timeout=1)
+
+        assert router.stop(timeout=2)
+        assert in_flight['max'] == 3
+        assert all(message.ack.call_count == 1 for message in messages)
+        fast.ack.assert_called_once()
+
+    def test_concurrent_messages(self, router):
+        async def handler(arg):
+            await asyncio.sleep(0.1)
+
+        router.add_route('my_msg', handler)
+        start = time.monotonic()
+
+        for _ in range(50):
+            router.handle_message(create_message())
+
+        assert router.stop(timeout=2)
+        assert time.monotonic() - start < 1
+        assert router.acked == 50
+
+
+class TestFlowControl:
+    """ Tests for the subscriber integration
+    """
+    def test_flow_control(self, router):
+        router.add_route('first', Mock(), max_concurrency=10)
+        router.add_route('second', Mock(), max_concurrency=20)
+
+        flow_control = router.flow_control(max_bytes=1000)
+
+        assert flow_control.max_messages == 30
+        assert flow_control.max_bytes == 1000
+
+    def test_subscribe(self, router):
+        subscriber = Mock()
+        router.add_route('my_msg', Mock(), max_concurrency=10)
+
+        result = router.subscribe('projects/p/subscriptions/s', subscriber=subscriber)
+
+        assert result is subscriber.subscribe.return_value
+        kwargs = subscriber.subscribe.call_args.kwargs
+        assert kwargs['callback'] == router.handle_message
+        assert kwargs['flow_control'].max_messages == 10
+        assert router._thread.is_alive()
+
+    def test_stop(self, router):
+        loop = router.start()
+        thread = router._thread
+
+        assert router.stop()
+
+        assert loop.is_closed()
+        assert not thread.is_alive()
@@ -1,6 +1,7 @@
 """ Tests for the shops publisher
 """
 
+import gzip
 import json
 from unittest.mock import Mock
 
@@ -71,3 +72,35 @@ class TestHandleMessage:
 
         error_handler.assert_not_called()
         msg_handler.assert_not_called()
+
+    def test_handle_compressed_message(self):
+        message = Mock()
+        message.data = gzip.compress(
+            json.dumps({'name': 'my_msg', 'arg': {'aaa': 'bbb'}}).encode('utf-8')
+        )
+        message.attributes = {'version': '1', 'content_encoding': 'gzip'}
+        error_handler = Mock()
+        router = MessageRouter(error_handler=error_handler)
+        msg_handler = Mock()
+        router.add_route('my_msg', msg_handler)
+
+        router.handle_message(message)
+
+        error_handler.assert_not_called()
+        msg_handler.assert_called_once_with({'aaa': 'bbb'})
+        message.ack.assert_called_once()
+
+    def test_handle_non_finite_numbers(self):
+        message = Mock()
+        message.data = json.dumps({'name': 'my_msg', 'arg': {'value': float('nan')}}, indent=4)
+        message.attributes = {}
+        error_handler = Mock()
+        router = MessageRouter(error_handler=error_handler)
+        msg_handler = Mock()
+        router.add_route('my_msg', msg_handler)
+
+        router.handle_message(message)
+
+        error_handler.assert_not_called()
+        msg_handler.assert_called_once()
+        message.ack.assert_called_once()
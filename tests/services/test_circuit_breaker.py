@@ -0,0 +1,125 @@
+""" Tests for the circuit breakers
+"""
+
+from unittest.mock import patch
+
+from styler_rest_framework.services import circuit_breaker
+from styler_rest_framework.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+)
+import pytest
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker(
+        failure_rate=0.5, minimum_calls=4, window=10, cool_down=30
+    )
+
+
+def calls(breaker, *outcomes):
+    for outcome in outcomes:
+        assert breaker.allow()
+        if outcome:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+
+class TestCircuitBreaker:
+    """ Tests for CircuitBreaker
+    """
+    def test_stays_closed_under_minimum_calls(self, breaker):
+        calls(breaker, False, False, False)
+
+        assert breaker.state == CLOSED
+
+    def test_stays_closed_under_failure_rate(self, breaker):
+        calls(breaker, True, True, False, True, False, True)
+
+        assert breaker.state == CLOSED
+        assert breaker.stats()["failure_rate"] == pytest.approx(1 / 3)
+
+    def test_opens_over_failure_rate(self, breaker):
+        calls(breaker, True, False, True, False)
+
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        assert breaker.stats()["rejected"] == 1
+        assert breaker.stats()["opened"] == 1
+
+    def test_window_forgets_old_calls(self):
+        breaker = CircuitBreaker(failure_rate=0.5, minimum_calls=4, window=4)
+        calls(breaker, False, False, True, True, True, True, False)
+
+        assert breaker.state == CLOSED
+
+    def test_minimum_calls_capped_by_window(self):
+        breaker = CircuitBreaker(failure_rate=0.5, minimum_calls=10, window=4)
+        calls(breaker, True, False, True, False)
+
+        assert breaker.minimum_calls == 4
+        assert breaker.state == OPEN
+
+    def test_half_open_after_cool_down(self, breaker):
+        with patch("styler_rest_framework.services.circuit_breaker.time.monotonic", return_value=100):
+            calls(breaker, False, False, False, False)
+        with patch("styler_rest_framework.services.circuit_breaker.time.monotonic", return_value=120):
+            assert not breaker.allow()
+            assert breaker.retry_after() == 10
+        with patch("styler_rest_framework.services.circuit_breaker.time.monotonic", return_value=131):
+            assert breaker.allow()
+            assert breaker.state == HALF_OPEN
+            # Only one probe at a time
+            assert not breaker.allow()
+
+    def test_probe_success_closes(self, breaker):
+        calls(breaker, False, False, False, False)
+        breaker.cool_down = 0
+
+        calls(breaker, True)
+
+        assert breaker.state == CLOSED
+        assert breaker.stats()["calls"] == 0
+
+    def test_probe_failure_opens(self, breaker):
+        calls(breaker, False, False, False, False)
+        breaker.cool_down = 0
+
+        calls(breaker, False)
+
+        assert breaker.state == OPEN
+        assert breaker.stats()["opened"] == 2
+
+    def test_release_probe(self, breaker):
+        calls(breaker, False, False, False, False)
+        breaker.cool_down = 0
+        assert breaker.allow()
+
+        breaker.release()
+
+        assert breaker.allow()
+
+
+class TestRegistry:
+    """ Tests for the per-host breakers
+    """
+    def test_one_breaker_per_host(self):
+        breaker = circuit_breaker.get_breaker("a.url:443")
+
+        assert circuit_breaker.get_breaker("a.url:443") is breaker
+        assert circuit_breaker.get_breaker("b.url:443") is not breaker
+        assert circuit_breaker.states() == {
+            "a.url:443": CLOSED, "b.url:443": CLOSED
+        }
+
+    def test_configure(self):
+        with patch.dict(circuit_breaker._breaker_options):
+            circuit_breaker.configure(minimum_calls=2, cool_down=5)
+            breaker = circuit_breaker.get_breaker("a.url:443")
+
+        assert breaker.minimum_calls == 2
+        assert breaker.cool_down == 5
@@ -1,13 +1,48 @@
 """ Tests for HTTP handler
 """
 
-from unittest.mock import Mock
+from datetime import date
+from time import monotonic
+from unittest.mock import Mock, patch
+import asyncio
 import json
+import math
 
-from styler_rest_framework.services import HTTPHandler
+from aiohttp import ClientTimeout, ContentTypeError
+from opencensus.trace import samplers
+from opencensus.trace.propagation.google_cloud_format import GoogleCloudFormatPropagator
+from opencensus.trace.tracer import Tracer
+
+from styler_rest_framework.helpers.retry import RetryPolicy
+from styler_rest_framework.helpers.spans import (
+    ERROR_NAME,
+    HTTP_METHOD,
+    HTTP_REQUEST_SIZE,
+    HTTP_RESPONSE_SIZE,
+    HTTP_RETRY_COUNT,
+    HTTP_ROUTE,
+    HTTP_STATUS_CODE,
+    HTTP_URL,
+)
+from styler_rest_framework.config import defaults
+from styler_rest_framework.metrics import metrics
+from styler_rest_framework.services import (
+    TRUNCATED,
+    HTTPHandler,
+    circuit_breaker,
+    dumps,
+    loads,
+    response_cache,
+    retry_on_status,
+    url_template,
+)
+from styler_rest_framework.services.response_cache import ResponseCache
+from styler_rest_framework.tracing import MemoryExporter
 from styler_rest_framework.exceptions.services import (
     AuthenticationError,
     AuthorizationError,
+    CircuitOpenError,
+    DeadlineExceededError,
     InternalServerError,
     InvalidDataError,
     NotFoundError,
@@ -18,6 +53,9 @@ from styler_rest_framework.exceptions.services import (
 import pytest
 
 
+pytestmark = pytest.mark.usefixtures("http_session")
+
+
 class IdentityMock:
     """ Mock an identity instance
     """
@@ -31,6 +69,31 @@ class IdentityMock:
         return 'ja'
 
 
+def add_response(aresponses, status=200, text='{"id": "1234"}', path='/resources',
+                 method=None, content_type='application/json', headers=None,
+                 delay=0, requests=None, in_flight=None):
+    """ Register the next response of https://some.url
+
+    Args:
+        method: expected method, any by default
+        requests: list receiving the (request, body) pairs
+        in_flight: dict counting the requests served 'now' and at 'max'
+    """
+    async def respond(request):
+        if requests is not None:
+            requests.append((request, await request.read()))
+        if in_flight is not None:
+            in_flight['now'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(delay)
+        if in_flight is not None:
+            in_flight['now'] -= 1
+        return aresponses.Response(
+            status=status, text=text, content_type=content_type, headers=headers
+        )
+    aresponses.add('some.url', path, method or aresponses.ANY, respond)
+
+
 class TestInit:
     """ Tests for init
     """
@@ -50,6 +113,12 @@ class TestInit:
         assert 'my-custom-header' in handler.headers
         assert handler.headers['my-custom-header'] == '1234'
 
+    def test_with_session(self):
+        session = Mock()
+        handler = HTTPHandler(identity=IdentityMock(), session=session)
+
+        assert handler._session() is session
+
 
 class TestPost:
     """ Test method post
@@ -411,3 +480,607 @@ class TestDelete:
                 'https://some.url/resources',
                 error_handlers={402: Mock(side_effect=ValueError())}
             )
+
+
+class TestRetry:
+    """ Tests for the retries
+    """
+    async def test_retry_then_succeed(self, aresponses):
+        for status in (503, 503, 200):
+            add_response(aresponses, status)
+        policy = RetryPolicy(base_delay=0, retry_on=retry_on_status([503]))
+        handler = HTTPHandler(IdentityMock(), retry_policy=policy)
+
+        result = await handler.get('https://some.url/resources')
+
+        assert result == {'id': '1234'}
+        assert policy.attempts == 3
+        assert policy.retries == 2
+
+    async def test_give_up(self, aresponses):
+        for status in (503, 503):
+            add_response(aresponses, status)
+        policy = RetryPolicy(base_delay=0, retry_on=retry_on_status([503]))
+        handler = HTTPHandler(IdentityMock(), retry_policy=policy)
+
+        with pytest.raises(UnexpectedError):
+            await handler.get('https://some.url/resources', retry=1)
+        assert policy.give_ups == 1
+
+    async def test_retry_on_override(self, aresponses):
+        for status in (500, 200):
+            add_response(aresponses, status)
+        policy = RetryPolicy(base_delay=0, retry_on=retry_on_status([503]))
+        handler = HTTPHandler(IdentityMock(), retry_policy=policy)
+
+        result = await handler.get(
+            'https://some.url/resources', retry_on=[500]
+        )
+
+        assert result == {'id': '1234'}
+
+    async def test_error_handler_only_on_first_attempt(self, aresponses):
+        for status in (503, 503):
+            add_response(aresponses, status)
+        error_handler = Mock(side_effect=lambda resp: asyncio.sleep(0))
+        handler = HTTPHandler(
+            IdentityMock(), retry_policy=RetryPolicy(base_delay=0)
+        )
+
+        with pytest.raises(UnexpectedError):
+            await handler.get(
+                'https://some.url/resources',
+                error_handlers={503: error_handler},
+                retry=1
+            )
+        error_handler.assert_called_once()
+
+    def test_default_policy(self):
+        handler = HTTPHandler(retry_on=[502])
+
+        assert handler.retry_policy.is_retryable(UnexpectedError(502, ''))
+        assert not handler.retry_policy.is_retryable(UnexpectedError(503, ''))
+        assert not handler.retry_policy.is_retryable(ValueError())
+
+
+class TestCircuitBreaker:
+    """ Tests for the circuit breaker
+    """
+    @pytest.fixture
+    def breaker(self):
+        breaker = circuit_breaker.get_breaker('some.url:443')
+        breaker.minimum_calls = 2
+        breaker.cool_down = 30
+        return breaker
+
+    async def test_fail_fast_while_open(self, aresponses, breaker):
+        for status in (500, 502):
+            add_response(aresponses, status)
+        handler = HTTPHandler(IdentityMock())
+
+        with pytest.raises(InternalServerError):
+            await handler.get('https://some.url/resources', retry=0)
+        with pytest.raises(UnexpectedError):
+            await handler.get('https://some.url/resources', retry=0)
+        assert breaker.state == 'open'
+
+        with pytest.raises(CircuitOpenError) as ex:
+            await handler.get('https://some.url/resources')
+        assert ex.value.status == 503
+        assert ex.value.json_body()['retry_after'] > 0
+        assert breaker.stats()['rejected'] == 1
+
+    async def test_client_errors_are_successes(self, aresponses, breaker):
+        for status in (404, 404):
+            add_response(aresponses, status)
+        handler = HTTPHandler(IdentityMock())
+
+        for _ in range(2):
+            with pytest.raises(NotFoundError):
+                await handler.get('https://some.url/resources')
+
+        assert breaker.state == 'closed'
+
+    async def test_open_circuit_is_not_retried(self, breaker):
+        breaker.record_failure()
+        breaker.record_failure()
+        policy = RetryPolicy(base_delay=0, retry_on=retry_on_status([503]))
+        handler = HTTPHandler(IdentityMock(), retry_policy=policy)
+
+        with pytest.raises(CircuitOpenError):
+            await handler.get('https://some.url/resources')
+        assert policy.attempts == 1
+
+    async def test_disabled(self, aresponses, breaker):
+        breaker.record_failure()
+        breaker.record_failure()
+        for status in (200,):
+            add_response(aresponses, status)
+        handler = HTTPHandler(IdentityMock(), circuit_breaker=False)
+
+        assert await handler.get('https://some.url/resources') == {'id': '1234'}
+
+
+class TestTimeouts:
+    """ Tests for the timeouts and deadlines
+    """
+    def test_default_timeout(self):
+        handler = HTTPHandler()
+
+        assert handler.timeout == ClientTimeout(total=30, connect=5, sock_read=15)
+
+    def test_custom_timeout(self):
+        timeout = ClientTimeout(total=1)
+
+        assert HTTPHandler(timeout=timeout).timeout is timeout
+        assert HTTPHandler(timeout=2).timeout.total == 2
+
+    async def test_per_call_timeout(self, aresponses):
+        add_response(aresponses, delay=0.5)
+        handler = HTTPHandler(IdentityMock())
+
+        with pytest.raises(asyncio.TimeoutError):
+            await handler.get('https://some.url/resources', timeout=0.05)
+        assert circuit_breaker.get_breaker('some.url:443').stats()['failures'] == 1
+
+    async def test_forward_deadline(self, aresponses):
+        requests = []
+        add_response(aresponses, requests=requests)
+        handler = HTTPHandler(IdentityMock(), deadline=monotonic() + 2)
+
+        await handler.get('https://some.url/resources')
+
+        remaining = int(requests[0][0].headers['X-Request-Timeout-Ms'])
+        assert 1000 < remaining <= 2000
+        assert 'X-Request-Timeout-Ms' not in handler.headers
+
+    async def test_deadline_of_identity(self, aresponses):
+        requests = []
+        add_response(aresponses, requests=requests)
+        identity = IdentityMock()
+        identity.deadline = monotonic() + 2
+
+        await HTTPHandler(identity).get('https://some.url/resources')
+
+        assert 'X-Request-Timeout-Ms' in requests[0][0].headers
+
+    async def test_deadline_exceeded_while_waiting(self, aresponses):
+        add_response(aresponses, delay=0.5)
+        handler = HTTPHandler(IdentityMock())
+
+        with pytest.raises(DeadlineExceededError) as ex:
+            await handler.get(
+                'https://some.url/resources', deadline=monotonic() + 0.05
+            )
+        assert ex.value.status == 504
+        # Not counted against the host
+        assert circuit_breaker.get_breaker('some.url:443').stats()['calls'] == 0
+
+    async def test_deadline_already_passed(self):
+        policy = RetryPolicy(base_delay=0)
+        handler = HTTPHandler(IdentityMock(), retry_policy=policy)
+
+        with pytest.raises(DeadlineExceededError):
+            await handler.get(
+                'https://some.url/resources', deadline=monotonic() - 1
+            )
+        assert policy.attempts == 1
+
+    async def test_no_retry_after_deadline(self, aresponses):
+        aresponses.add(
+            'some.url',
+            '/resources',
+            'GET',
+            aresponses.Response(status=503, text='')
+        )
+        policy = RetryPolicy(base_delay=10, retry_on=retry_on_status([503]))
+        policy.delay = Mock(return_value=6)
+        handler = HTTPHandler(IdentityMock(), retry_policy=policy)
+
+        with pytest.raises(UnexpectedError):
+            await handler.get(
+                'https://some.url/resources', deadline=monotonic() + 5
+            )
+        assert policy.attempts == 1
+        assert policy.give_ups == 1
+
+
+class TestCache:
+    """ Tests for the response cache and the request coalescing
+    """
+    async def test_cache_hit(self, aresponses):
+        add_response(aresponses, headers={'Cache-Control': 'max-age=60'})
+        cache = ResponseCache()
+        handler = HTTPHandler(IdentityMock(), cache=cache)
+
+        first = await handler.get('https://some.url/resources')
+        first['id'] = 'changed'
+        second = await handler.get('https://some.url/resources')
+
+        assert second == {'id': '1234'}
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    async def test_vary_on_authorization(self, aresponses):
+        add_response(aresponses, headers={'Cache-Control': 'max-age=60'})
+        add_response(aresponses, headers={'Cache-Control': 'max-age=60'})
+        cache = ResponseCache()
+
+        await HTTPHandler(IdentityMock(), cache=cache).get('https://some.url/resources')
+        await HTTPHandler(
+            IdentityMock(), cache=cache, headers={'Authorization': 'Bearer other'}
+        ).get('https://some.url/resources')
+
+        assert cache.misses == 2
+        assert len(cache) == 2
+
+    async def test_revalidate(self, aresponses):
+        requests = []
+        add_response(aresponses, headers={'ETag': '"v1"'}, requests=requests)
+        add_response(aresponses, status=304, text='', requests=requests)
+        cache = ResponseCache()
+        handler = HTTPHandler(IdentityMock(), cache=cache)
+
+        await handler.get('https://some.url/resources')
+        result = await handler.get('https://some.url/resources')
+
+        assert result == {'id': '1234'}
+        assert requests[1][0].headers['If-None-Match'] == '"v1"'
+        assert 'If-None-Match' not in handler.headers
+        assert cache.revalidated == 1
+
+    async def test_coalesce(self, aresponses):
+        requests = []
+        add_response(aresponses, requests=requests, delay=0.05)
+        handler = HTTPHandler(IdentityMock(), coalesce=True)
+
+        results = await asyncio.gather(
+            *[handler.get('https://some.url/resources') for _ in range(3)]
+        )
+
+        assert results == [{'id': '1234'}] * 3
+        assert len(requests) == 1
+        assert response_cache.get_single_flight().coalesced == 2
+
+    async def test_shared_cache(self):
+        handler = HTTPHandler(cache=True)
+
+        assert handler.cache is response_cache.default_cache()
+
+
+class TestBody:
+    """ Tests for the request and response bodies
+    """
+    async def test_send_json(self, aresponses):
+        requests = []
+        add_response(aresponses, requests=requests)
+        handler = HTTPHandler(IdentityMock(), log=False)
+
+        await handler.post('https://some.url/resources', {'name': 'ラベル'})
+
+        request, body = requests[0]
+        assert request.headers['Content-Type'] == 'application/json'
+        assert json.loads(body) == {'name': 'ラベル'}
+
+    async def test_empty_body(self, aresponses):
+        add_response(aresponses, text='')
+
+        assert await HTTPHandler(log=False).get('https://some.url/resources') is None
+
+    async def test_unexpected_content_type(self, aresponses):
+        add_response(aresponses, text='<html/>', content_type='text/html')
+
+        with pytest.raises(ContentTypeError):
+            await HTTPHandler(log=False).get('https://some.url/resources')
+
+    async def test_error_text(self, aresponses):
+        add_response(aresponses, status=404, text='{"error": "見つかりません"}')
+
+        with pytest.raises(NotFoundError) as ex:
+            await HTTPHandler(log=False).get('https://some.url/resources')
+        assert ex.value.json_body() == {'error': '見つかりません'}
+
+    async def test_read_once(self, aresponses):
+        add_response(aresponses, status=404)
+
+        with patch('aiohttp.ClientResponse.text') as mock_text:
+            with pytest.raises(NotFoundError):
+                await HTTPHandler().get('https://some.url/resources')
+        mock_text.assert_not_called()
+
+    async def test_log(self, aresponses):
+        add_response(aresponses)
+        handler = HTTPHandler(IdentityMock())
+        handler.log_request = Mock()
+
+        await handler.post('https://some.url/resources', {'name': 'something'})
+
+        args = handler.log_request.call_args.args
+        assert args[1:4] == (
+            'https://some.url/resources', 'POST', 'Bearer aaa.aaaaa.aaa'
+        )
+        assert json.loads(args[4]) == {'name': 'something'}
+        assert args[6:] == (200, '{"id": "1234"}')
+
+    async def test_log_truncated(self, aresponses):
+        add_response(aresponses, text=json.dumps({'id': 'あ' * 100}))
+        handler = HTTPHandler(IdentityMock())
+        handler.log_request = Mock()
+
+        with patch.object(defaults, 'INTERNAL_REQUESTS_LOG_MAX_BODY', 20):
+            await handler.get('https://some.url/resources')
+
+        response_body = handler.log_request.call_args.args[7]
+        assert response_body.endswith(TRUNCATED)
+        assert len(response_body.encode()) <= 20 + len(TRUNCATED)
+
+    async def test_no_log(self, aresponses):
+        add_response(aresponses)
+        handler = HTTPHandler(IdentityMock(), log=False)
+        handler.log_request = Mock()
+
+        with patch('styler_rest_framework.services.HTTPHandler._log_params') as mock_params:
+            await handler.post('https://some.url/resources', {'name': 'something'})
+
+        mock_params.assert_not_called()
+        handler.log_request.assert_not_called()
+
+
+class TestJSON:
+    """ Tests for dumps and loads
+    """
+    @pytest.mark.parametrize('backend', ['auto', 'json'])
+    def test_round_trip(self, backend):
+        data = {'name': 'ラベル', 'values': [1, 2.5, None, True]}
+
+        with patch.object(defaults, 'HTTP_JSON_BACKEND', backend):
+            assert loads(dumps(data)) == data
+
+    def test_non_str_keys(self):
+        assert loads(dumps({1: 'a'})) == {'1': 'a'}
+
+    @pytest.mark.parametrize('value', [
+        {'nan': float('nan'), 'values': [float('inf'), None]},
+        {'ok': 1.5, 'none': None},
+    ])
+    def test_backends_parity(self, value):
+        with patch.object(defaults, 'HTTP_JSON_BACKEND', 'json'):
+            expected = json.loads(dumps(value).decode())
+            expected_text = json.dumps(expected)
+
+        assert json.dumps(json.loads(dumps(value).decode())) == expected_text
+
+    @pytest.mark.parametrize('backend', ['auto', 'json'])
+    def test_dates_rejected(self, backend):
+        with patch.object(defaults, 'HTTP_JSON_BACKEND', backend):
+            with pytest.raises(TypeError):
+                dumps({'date': date(2020, 1, 2)})
+
+    def test_fallback(self):
+        assert loads(dumps({'big': 2 ** 70})) == {'big': 2 ** 70}
+        assert math.isnan(loads(b'{"a": NaN}')['a'])
+
+    def test_empty(self):
+        assert loads(b'  ') is None
+
+    def test_invalid(self):
+        with pytest.raises(json.JSONDecodeError):
+            loads(b'{')
+
+
+class TestGather:
+    """ Tests for gather
+    """
+    async def test_results_in_order(self, aresponses):
+        for item_id, method in (('1', 'GET'), ('2', 'POST'), ('3', 'DELETE')):
+            add_response(
+                aresponses, text=json.dumps({'id': item_id}),
+                path=f'/items/{item_id}', method=method
+            )
+        handler = HTTPHandler(IdentityMock(), log=False)
+
+        results = await handler.gather([
+            'https://some.url/items/1',
+            ('post', 'https://some.url/items/2', {'name': 'a'}),
+            ('DELETE', 'https://some.url/items/3'),
+        ])
+
+        assert results == [{'id': '1'}, {'id': '2'}, {'id': '3'}]
+
+    async def test_per_item_errors(self, aresponses):
+        add_response(aresponses, text=json.dumps({'id': '1'}), path='/items/1')
+        add_response(aresponses, status=404, text='{}', path='/items/missing')
+        add_response(aresponses, text=json.dumps({'id': '3'}), path='/items/3')
+        handler = HTTPHandler(IdentityMock(), log=False)
+
+        results = await handler.gather([
+            'https://some.url/items/1',
+            'https://some.url/items/missing',
+            'https://some.url/items/3',
+        ])
+
+        assert results[0] == {'id': '1'}
+        assert isinstance(results[1], NotFoundError)
+        assert results[2] == {'id': '3'}
+
+    async def test_bounded_concurrency(self, aresponses):
+        in_flight = {'now': 0, 'max': 0}
+        for i in range(12):
+            add_response(
+                aresponses, text=json.dumps({'id': str(i)}), path=f'/items/{i}',
+                delay=0.01, in_flight=in_flight
+            )
+        handler = HTTPHandler(IdentityMock(), log=False)
+
+        results = await handler.gather(
+            [f'https://some.url/items/{i}' for i in range(12)], concurrency=3
+        )
+
+        assert [result['id'] for result in results] == [str(i) for i in range(12)]
+        assert in_flight['max'] == 3
+
+    async def test_timeout(self, aresponses):
+        for i in range(4):
+            add_response(aresponses, path=f'/items/{i}', delay=0.2)
+        handler = HTTPHandler(IdentityMock(), log=False)
+
+        results = await handler.gather(
+            [f'https://some.url/items/{i}' for i in range(4)],
+            concurrency=2,
+            timeout=0.05,
+        )
+
+        assert all(isinstance(result, DeadlineExceededError) for result in results)
+
+    async def test_empty(self):
+        assert await HTTPHandler().gather([]) == []
+
+    async def test_unsupported_method(self):
+        with pytest.raises(ValueError):
+            await HTTPHandler().gather([('HEAD', 'https://some.url/items/1')])
+
+
+class TestTracing:
+    """ Tests for the child spans of the outbound calls
+    """
+    @pytest.fixture
+    def exporter(self):
+        exporter = MemoryExporter()
+        tracer = Tracer(
+            exporter=exporter,
+            sampler=samplers.AlwaysOnSampler(),
+            propagator=GoogleCloudFormatPropagator(),
+        )
+        with tracer.span('request'):
+            yield exporter
+
+    async def test_child_span(self, aresponses, exporter):
+        aresponses.add('some.url', '/shops/123', 'POST', aresponses.Response(
+            status=201, body='{"id": "1"}', content_type='application/json'))
+
+        await HTTPHandler(IdentityMock(), log=False).post(
+            'https://some.url/shops/123', {'name': 'shop'}
+        )
+
+        span = exporter.spans[0]
+        assert span.name == 'POST some.url/shops/{id}'
+        assert span.attributes[HTTP_METHOD] == 'POST'
+        assert span.attributes[HTTP_ROUTE] == '/shops/{id}'
+        assert span.attributes[HTTP_URL] == 'https://some.url/shops/123'
+        assert span.attributes[HTTP_STATUS_CODE] == 201
+        assert span.attributes[HTTP_RETRY_COUNT] == 0
+        assert span.attributes[HTTP_REQUEST_SIZE] == len(b'{"name":"shop"}')
+        assert span.attributes[HTTP_RESPONSE_SIZE] == len(b'{"id": "1"}')
+
+    async def test_url_template(self, aresponses, exporter):
+        aresponses.add('some.url', '/shops/main', 'GET', aresponses.Response(
+            status=200, body='{}', content_type='application/json'))
+
+        await HTTPHandler(IdentityMock(), log=False).get(
+            'https://some.url/shops/main', url_template='/shops/{shop_id}'
+        )
+
+        assert exporter.spans[0].attributes[HTTP_ROUTE] == '/shops/{shop_id}'
+
+    async def test_propagate_child_span(self, aresponses, exporter):
+        received = []
+
+        async def respond(request):
+            received.append(request.headers['X-Cloud-Trace-Context'])
+            return aresponses.Response(status=200, body='{}', content_type='application/json')
+
+        aresponses.add('some.url', '/resources', 'GET', respond, repeat=2)
+        identity = IdentityMock()
+        identity.trace_header = lambda: {'X-Cloud-Trace-Context': 'parent/1;o=1'}
+        handler = HTTPHandler(identity, log=False)
+
+        await handler.get('https://some.url/resources')
+        await handler.get('https://some.url/resources')
+
+        first, second = exporter.spans
+        assert received == [
+            f'{first.context.trace_id}/{int(first.span_id, 16)};o=1',
+            f'{second.context.trace_id}/{int(second.span_id, 16)};o=1',
+        ]
+
+    async def test_retry_count(self, aresponses, exporter):
+        aresponses.add('some.url', '/resources', 'GET', aresponses.Response(status=503))
+        aresponses.add('some.url', '/resources', 'GET', aresponses.Response(
+            status=200, body='{}', content_type='application/json'))
+        policy = RetryPolicy(retry_on=retry_on_status([503]), base_delay=0)
+
+        await HTTPHandler(IdentityMock(), log=False, retry_policy=policy).get(
+            'https://some.url/resources'
+        )
+
+        assert exporter.spans[0].attributes[HTTP_RETRY_COUNT] == 1
+        assert exporter.spans[0].attributes[HTTP_STATUS_CODE] == 200
+
+    async def test_error(self, aresponses, exporter):
+        aresponses.add('some.url', '/resources', 'GET', aresponses.Response(status=404))
+
+        with pytest.raises(NotFoundError):
+            await HTTPHandler(IdentityMock(), log=False).get('https://some.url/resources')
+
+        assert exporter.spans[0].attributes[HTTP_STATUS_CODE] == 404
+        assert exporter.spans[0].attributes[ERROR_NAME] == 'NotFoundError'
+
+    async def test_not_traced(self, aresponses):
+        async def respond(request):
+            return aresponses.Response(
+                status=200,
+                body=json.dumps(request.headers.get('X-Cloud-Trace-Context')),
+                content_type='application/json',
+            )
+
+        aresponses.add('some.url', '/resources', 'GET', respond)
+        identity = IdentityMock()
+        identity.trace_header = lambda: {'X-Cloud-Trace-Context': 'parent/1;o=1'}
+
+        result = await HTTPHandler(identity, log=False).get('https://some.url/resources')
+
+        assert result == 'parent/1;o=1'
+
+    @pytest.mark.parametrize('path, template', [
+        ('/shops/123/items', '/shops/{id}/items'),
+        ('/items/550e8400-e29b-41d4-a716-446655440000', '/items/{id}'),
+        ('/users/AbCdEfGhIjKlMnOpQr5t', '/users/{id}'),
+        ('/users/me', '/users/me'),
+        ('/reservation-settings', '/reservation-settings'),
+    ])
+    def test_url_template_from_path(self, path, template):
+        assert url_template(path) == template
+
+
+class TestMetrics:
+    """ Tests for the metrics of the outbound calls
+    """
+    async def test_duration_and_retries(self, aresponses):
+        aresponses.add('some.url', '/resources', 'GET', aresponses.Response(status=503))
+        aresponses.add('some.url', '/resources', 'GET', aresponses.Response(
+            status=200, body='{}', content_type='application/json'))
+        policy = RetryPolicy(retry_on=retry_on_status([503]), base_delay=0)
+
+        await HTTPHandler(IdentityMock(), log=False, retry_policy=policy).get(
+            'https://some.url/resources'
+        )
+
+        durations = metrics.CLIENT_DURATION
+        assert sum(durations.labels('GET', 'some.url', 503).counts) == 1
+        assert sum(durations.labels('GET', 'some.url', 200).counts) == 1
+        assert metrics.CLIENT_RETRIES.labels('some.url').value == 1
+
+    async def test_no_response(self, aresponses):
+        async def respond(request):
+            await asyncio.sleep(0.2)
+            return aresponses.Response(status=200)
+
+        aresponses.add('some.url', '/resources', 'GET', respond)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await HTTPHandler(IdentityMock(), log=False).get(
+                'https://some.url/resources', retry=0, timeout=0.02
+            )
+
+        assert sum(metrics.CLIENT_DURATION.labels('GET', 'some.url', 'error').counts) == 1
+        assert ('some.url',) not in metrics.CLIENT_RETRIES._values
@@ -0,0 +1,183 @@
+""" Tests for the response cache and the request coalescing
+"""
+
+from unittest.mock import patch
+import asyncio
+
+from styler_rest_framework.services.response_cache import (
+    ResponseCache,
+    SingleFlight,
+    cache_key,
+    parse_cache_control,
+)
+import pytest
+
+
+MONOTONIC = 'styler_rest_framework.services.response_cache.time.monotonic'
+
+
+class TestParseCacheControl:
+    """ Tests for parse_cache_control
+    """
+    def test_parse(self):
+        assert parse_cache_control('Private, max-age=60, no-cache="Set-Cookie"') == {
+            'private': None, 'max-age': '60', 'no-cache': 'Set-Cookie'
+        }
+
+    def test_none(self):
+        assert parse_cache_control(None) == {}
+
+
+class TestResponseCache:
+    """ Tests for ResponseCache
+    """
+    def test_max_age(self):
+        cache = ResponseCache()
+        with patch(MONOTONIC, return_value=100):
+            cache.set('key', '{}', {'Cache-Control': 'max-age=60', 'Age': '10'})
+            assert cache.get('key').expires == 150
+
+    def test_hit_and_miss(self):
+        cache = ResponseCache()
+        with patch(MONOTONIC, return_value=100):
+            assert cache.get('key') is None
+            cache.set('key', '{}', {'Cache-Control': 'max-age=60'})
+            assert cache.get('key').body == '{}'
+        with patch(MONOTONIC, return_value=200):
+            assert not cache.get('key').is_fresh()
+
+        assert cache.stats() == {
+            'size': 1, 'hits': 1, 'misses': 2, 'revalidated': 0
+        }
+
+    @pytest.mark.parametrize('headers', [
+        {},
+        {'Cache-Control': 'no-store, max-age=60'},
+        {'Cache-Control': 'max-age=0'},
+        {'Cache-Control': 'max-age=invalid'},
+    ])
+    def test_not_stored(self, headers):
+        cache = ResponseCache()
+
+        cache.set('key', '{}', headers)
+
+        assert len(cache) == 0
+
+    def test_default_ttl(self):
+        cache = ResponseCache(default_ttl=5)
+        with patch(MONOTONIC, return_value=100):
+            cache.set('key', '{}', {})
+
+        assert cache.get('key').expires == 105
+
+    def test_keep_stale_with_validator(self):
+        cache = ResponseCache()
+
+        cache.set('key', '{}', {'Cache-Control': 'no-cache', 'ETag': '"v1"'})
+
+        entry = cache.get('key')
+        assert not entry.is_fresh()
+        assert entry.validators() == {'If-None-Match': '"v1"'}
+
+    def test_revalidate(self):
+        cache = ResponseCache()
+        cache.set('key', '{}', {'ETag': '"v1"', 'Last-Modified': 'yesterday'})
+        entry = cache.get('key')
+
+        cache.revalidate('key', entry, {'Cache-Control': 'max-age=60'})
+
+        entry = cache.get('key')
+        assert entry.is_fresh()
+        assert entry.body == '{}'
+        assert entry.validators() == {
+            'If-None-Match': '"v1"', 'If-Modified-Since': 'yesterday'
+        }
+        assert cache.revalidated == 1
+
+    def test_revalidate_keeps_max_age(self):
+        cache = ResponseCache()
+        with patch(MONOTONIC, return_value=100):
+            cache.set('key', '{}', {'Cache-Control': 'max-age=60', 'ETag': '"v1"'})
+
+        with patch(MONOTONIC, return_value=200):
+            entry = cache.get('key')
+            assert not entry.is_fresh()
+            cache.revalidate('key', entry, {'ETag': '"v1"'})
+            entry = cache.get('key')
+
+            assert entry.is_fresh()
+        assert entry.expires == 260
+        assert entry.cache_control == 'max-age=60'
+
+    def test_lru(self):
+        cache = ResponseCache(max_size=2)
+        for key in ('a', 'b'):
+            cache.set(key, '{}', {'Cache-Control': 'max-age=60'})
+        cache.get('a')
+
+        cache.set('c', '{}', {'Cache-Control': 'max-age=60'})
+
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+
+
+class TestCacheKey:
+    """ Tests for cache_key
+    """
+    def test_vary_headers(self):
+        headers = {'Authorization': 'Bearer a', 'Accept-Language': 'ja', 'X': '1'}
+
+        assert cache_key('url', headers) == ('url', 'Bearer a', 'ja')
+        assert cache_key('url', headers, vary=('X',)) == ('url', '1')
+
+
+class TestSingleFlight:
+    """ Tests for SingleFlight
+    """
+    async def test_coalesce(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'result'
+
+        results = await asyncio.gather(
+            *[single_flight.do('key', fetch) for _ in range(5)]
+        )
+
+        assert results == ['result'] * 5
+        assert len(calls) == 1
+        assert single_flight.coalesced == 4
+        assert len(single_flight) == 0
+
+    async def test_share_error(self):
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError()
+
+        results = await asyncio.gather(
+            single_flight.do('key', fetch),
+            single_flight.do('key', fetch),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
+
+    async def test_leader_cancelled(self):
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return 'result'
+
+        leader = asyncio.ensure_future(single_flight.do('key', fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(single_flight.do('key', fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == 'result'
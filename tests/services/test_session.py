@@ -0,0 +1,86 @@
+""" Tests for the shared HTTP client session
+"""
+
+import asyncio
+
+from styler_rest_framework.services import session
+
+
+class TestGetSession:
+    """ Tests for get_session
+    """
+    async def test_reuse_session(self):
+        first = session.get_session()
+        second = session.get_session()
+
+        assert first is second
+        await session.close_session()
+
+    async def test_new_session_after_close(self):
+        first = session.get_session()
+        await session.close_session()
+
+        second = session.get_session()
+
+        assert first.closed
+        assert first is not second
+        await session.close_session()
+
+    def test_session_per_loop(self):
+        async def get():
+            current = session.get_session()
+            await session.close_session()
+            return current
+
+        first = asyncio.run(get())
+        second = asyncio.run(get())
+
+        assert first is not second
+
+    def test_drop_closed_loops(self):
+        async def get():
+            return session.get_session()
+
+        async def get_and_close():
+            session.get_session()
+            await session.close_session()
+
+        loops = [asyncio.new_event_loop() for _ in range(3)]
+        dropped = [loop.run_until_complete(get()) for loop in loops]
+        for loop in loops:
+            loop.close()
+
+        asyncio.run(get_and_close())
+
+        assert all(current.closed for current in dropped)
+        assert len(session._sessions) == 0
+
+
+class TestConfigure:
+    """ Tests for configure
+    """
+    async def test_connector_options(self):
+        session.configure(limit=7, limit_per_host=3)
+        try:
+            current = session.get_session()
+
+            assert current.connector.limit == 7
+            assert current.connector.limit_per_host == 3
+        finally:
+            session._connector_options.clear()
+            await session.close_session()
+
+
+class TestHooks:
+    """ Tests for the startup/shutdown hooks
+    """
+    async def test_open_and_close(self):
+        await session.open_session()
+        current = session.get_session()
+
+        await session.close_session()
+
+        assert current.closed
+
+    async def test_close_without_session(self):
+        await session.close_session()
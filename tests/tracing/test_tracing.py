@@ -1,9 +1,23 @@
 """ Tests for tracing
 """
 
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, Mock, patch
 
-from styler_rest_framework.tracing import config_tracer
+from aiohttp import web
+from opencensus.trace import samplers
+import pytest
+
+from styler_rest_framework.tracing import (
+    AppTracer,
+    MemoryExporter,
+    RateLimitingSampler,
+    config_tracer,
+    create_sampler,
+)
+from styler_rest_framework.tracing.tracing import HTTP_ROUTE, HTTP_STATUS_CODE
+
+
+TRACE_HEADER = 'X-Cloud-Trace-Context'
 
 
 def test_middleware():
@@ -12,3 +26,186 @@ def test_middleware():
     config_tracer(app, 'MyProject')
 
     app.middlewares.append.assert_called_once()
+    app.on_cleanup.append.assert_called_once()
+
+
+@pytest.fixture
+def exporter():
+    return MemoryExporter()
+
+
+@pytest.fixture
+def mock_exporter(exporter):
+    with patch(
+        'styler_rest_framework.tracing.tracing.stackdriver_exporter.StackdriverExporter',
+        return_value=exporter,
+    ) as mock_exporter:
+        yield mock_exporter
+
+
+@pytest.fixture
+def create_client(aiohttp_client, mock_exporter):
+    async def create(sampler, sample_errors=True, **kwargs):
+        app = web.Application()
+        config_tracer(
+            app, 'MyProject', sampler=sampler, sample_errors=sample_errors, **kwargs
+        )
+
+        async def health_check(request):
+            return web.json_response({})
+
+        async def items(request):
+            return web.json_response(request.get('trace_header'))
+
+        async def error(request):
+            raise web.HTTPInternalServerError()
+
+        app.router.add_get('/', health_check)
+        app.router.add_get('/items', items)
+        app.router.add_get('/items/{item_id}', items)
+        app.router.add_get('/error', error)
+        return await aiohttp_client(app)
+    return create
+
+
+class TestMiddleware:
+    """ Tests for the tracing middleware
+    """
+    async def test_trace_requests(self, create_client, exporter, mock_exporter):
+        client = await create_client(samplers.AlwaysOnSampler())
+
+        for _ in range(3):
+            resp = await client.get('/items')
+            assert resp.status == 200
+
+        # The exporter is created once
+        assert mock_exporter.call_count == 1
+        assert len(exporter.spans) == 3
+        assert exporter.spans[0].name == 'items'
+        assert exporter.spans[0].attributes[HTTP_STATUS_CODE] == 200
+
+    async def test_route_template(self, create_client, exporter):
+        client = await create_client(samplers.AlwaysOnSampler())
+
+        await client.get('/items/1')
+
+        assert exporter.spans[0].attributes[HTTP_ROUTE] == '/items/{item_id}'
+
+    async def test_propagate_sampling_decision(self, create_client):
+        client = await create_client(samplers.AlwaysOffSampler())
+
+        resp = await client.get('/items', headers={TRACE_HEADER: '0123456789abcdef0123456789abcdef/1;o=1'})
+
+        trace_header = (await resp.json())[TRACE_HEADER]
+        assert trace_header.startswith('0123456789abcdef0123456789abcdef/')
+        assert trace_header.endswith(';o=0')
+
+    async def test_excluded_route(self, create_client, exporter):
+        client = await create_client(samplers.AlwaysOnSampler())
+
+        await client.get('/')
+
+        assert exporter.spans == []
+
+    async def test_excludes(self, create_client, exporter):
+        client = await create_client(
+            samplers.AlwaysOnSampler(),
+            excludes=[],
+            excludes_regex=['/it'],
+            excludes_handlers=[],
+        )
+
+        await client.get('/')
+        await client.get('/items')
+
+        assert [span.name for span in exporter.spans] == ['health_check']
+
+    async def test_excluded_handler_on_any_path(self, aiohttp_client, exporter):
+        app = web.Application()
+        config_tracer(app, 'MyProject', sampler=samplers.AlwaysOnSampler(), exporter=exporter)
+
+        async def health_check(request):
+            return web.json_response({})
+
+        async def index(request):
+            return web.json_response({})
+
+        app.router.add_get('/', index)
+        app.router.add_get('/healthz', health_check)
+        client = await aiohttp_client(app)
+
+        await client.get('/')
+        await client.get('/healthz')
+
+        assert [span.name for span in exporter.spans] == ['index']
+
+    async def test_excluded_paths(self, create_client, exporter):
+        client = await create_client(
+            samplers.AlwaysOnSampler(), excludes=['/'], excludes_handlers=[]
+        )
+
+        await client.get('/')
+        await client.get('/items')
+
+        assert [span.name for span in exporter.spans] == ['items']
+
+    async def test_errors_always_exported(self, create_client, exporter):
+        client = await create_client(samplers.AlwaysOffSampler())
+
+        await client.get('/items')
+        resp = await client.get('/error')
+
+        assert resp.status == 500
+        assert [span.name for span in exporter.spans] == ['error']
+        assert exporter.spans[0].attributes[HTTP_STATUS_CODE] == 500
+
+    async def test_errors_not_sampled(self, create_client, exporter):
+        client = await create_client(samplers.AlwaysOffSampler(), sample_errors=False)
+
+        await client.get('/error')
+
+        assert exporter.spans == []
+
+
+class TestAppTracer:
+    """ Tests for AppTracer
+    """
+    async def test_close(self):
+        exporter = Mock()
+        app_tracer = AppTracer('MyProject', exporter=exporter)
+
+        await app_tracer.close()
+
+        exporter.transport.flush.assert_called_once()
+
+    async def test_close_without_exporter(self, mock_exporter):
+        await AppTracer('MyProject').close()
+
+        mock_exporter.assert_not_called()
+
+
+class TestSamplers:
+    """ Tests for the samplers
+    """
+    @pytest.mark.parametrize('name, sampler_class', [
+        ('always_on', samplers.AlwaysOnSampler),
+        ('always_off', samplers.AlwaysOffSampler),
+        ('probability', samplers.ProbabilitySampler),
+        ('rate_limited', RateLimitingSampler),
+    ])
+    def test_create_sampler(self, name, sampler_class):
+        assert isinstance(create_sampler(name), sampler_class)
+
+    def test_probability_rate(self):
+        assert create_sampler('probability', 0.5).rate == 0.5
+
+    def test_unknown_sampler(self):
+        with pytest.raises(ValueError):
+            create_sampler('sometimes')
+
+    def test_rate_limiting(self):
+        with patch('styler_rest_framework.tracing.tracing.time.monotonic', return_value=100):
+            sampler = RateLimitingSampler(2)
+            assert [sampler.should_sample() for _ in range(3)] == [True, True, False]
+        with patch('styler_rest_framework.tracing.tracing.time.monotonic', return_value=100.5):
+            assert [sampler.should_sample() for _ in range(2)] == [True, False]